@@ -12,6 +12,12 @@ from agenda_manager import AgendaManager
 from datetime import datetime
 from proveedor_editor import crear_editor_proveedor_mejorado
 
+# Cada cuánto se revisa si otro usuario cambió el archivo (ms)
+INTERVALO_VIGILANCIA_MS = 5000
+
+# Espera tras el último clic en la matriz antes de guardar (ms)
+DEMORA_GUARDADO_MS = 800
+
 
 class AgendaDialog:
     """Diálogo para gestionar la configuración de agenda de proveedores"""
@@ -26,6 +32,7 @@ class AgendaDialog:
         """
         self.parent = parent
         self.manager = AgendaManager()
+        self._guardado_programado = None  # after() del guardado diferido de la matriz
         
         # Colores del tema moderno (consistente con GUI principal)
         self.colors = theme_colors or {
@@ -48,6 +55,9 @@ class AgendaDialog:
         self.create_dialog()
         self.actualizar_fechas_calculadas()
         self.cargar_proveedores()
+        
+        # Revisar periódicamente si otro usuario modificó la agenda
+        self.dialog.after(INTERVALO_VIGILANCIA_MS, self.vigilar_cambios_externos)
     
     def create_dialog(self):
         """Crea la ventana del diálogo"""
@@ -68,6 +78,7 @@ class AgendaDialog:
         # Crear Toplevel independiente (compatible con customtkinter parent)
         self.dialog = tk.Toplevel()
         self.dialog.title("📅 Gestión de Agenda de Proveedores")
+        self.dialog.protocol("WM_DELETE_WINDOW", self.cerrar)
         
         # Adaptar altura a la pantalla del usuario
         screen_height = self.dialog.winfo_screenheight()
@@ -103,7 +114,7 @@ class AgendaDialog:
         close_btn = tk.Button(
             header_content,
             text="✕ Cerrar",
-            command=self.dialog.destroy,
+            command=self.cerrar,
             bg=self.colors['error'],        # Fondo rojo
             fg='#ffffff',                   # Texto blanco
             font=("Segoe UI", 12, "bold"),
@@ -237,6 +248,19 @@ class AgendaDialog:
             activebackground='#00b8d9'  # Hover effect
         ).pack(side='left', padx=(0, 20))
         
+        tk.Button(
+            calc_frame,
+            text="📆 Pronóstico",
+            command=self.abrir_pronostico,
+            bg=self.colors['secondary'],
+            fg='white',
+            font=('Segoe UI', 9, 'bold'),
+            relief='flat',
+            cursor='hand2',
+            padx=12,
+            pady=6
+        ).pack(side='right')
+        
         tk.Label(
             calc_frame,
             text="📦 Fecha Despacho:",
@@ -416,6 +440,9 @@ class AgendaDialog:
         except:
             pass
         
+        # Fechas de entrega de todos los proveedores (calendario precalculado)
+        tabla_entregas = self.manager.tabla_fechas_entrega(fecha_despacho) if fecha_despacho else {}
+        
         # Cargar proveedores
         proveedores = self.manager.obtener_todos_proveedores()
         for codigo, datos in proveedores.items():
@@ -431,7 +458,7 @@ class AgendaDialog:
             # Calcular fecha de entrega para este proveedor
             fecha_entrega_str = ''
             if fecha_despacho:
-                fecha_entrega = self.manager.calcular_fecha_entrega(codigo, fecha_despacho)
+                fecha_entrega = tabla_entregas.get(codigo)
                 if fecha_entrega:
                     fecha_entrega_str = fecha_entrega.strftime("%d-%m-%Y")
                 elif datos.get('fecha_manual'):
@@ -477,6 +504,19 @@ class AgendaDialog:
             
             self.tree.insert('', 'end', values=valores, tags=(tag_fila,))
     
+    def vigilar_cambios_externos(self):
+        """Recarga la matriz si otro usuario modificó la agenda"""
+        try:
+            if not self.dialog.winfo_exists():
+                return
+            if self.manager.recargar_si_cambio():
+                self.dias_despacho_var.set(str(self.manager.dias_despacho))
+                self.actualizar_fechas_calculadas()
+                self.cargar_proveedores()
+            self.dialog.after(INTERVALO_VIGILANCIA_MS, self.vigilar_cambios_externos)
+        except tk.TclError:
+            pass  # Ventana cerrada
+    
     def guardar_dias_despacho(self):
         """Guarda los días de despacho configurados"""
         try:
@@ -571,7 +611,7 @@ class AgendaDialog:
         else:
             nuevo_valor = None
         
-        # Actualizar en el manager
+        # Actualizar en el manager (el guardado se agrupa con los clics siguientes)
         proveedor_data = self.manager.obtener_proveedor(codigo_prov)
         if proveedor_data:
             proveedor_data[col_name] = nuevo_valor
@@ -580,12 +620,160 @@ class AgendaDialog:
                 proveedor_data['nombre'],
                 {dia: proveedor_data.get(dia) for dia in ['LUN', 'MAR', 'MIE', 'JUE', 'VIE', 'SAB']},
                 proveedor_data.get('D-2'),
-                proveedor_data.get('fecha_manual')
+                proveedor_data.get('fecha_manual'),
+                guardar=False
             )
+            self.programar_guardado()
             
             # Recargar la tabla para reflejar el cambio
             self.cargar_proveedores()
     
+    def programar_guardado(self):
+        """Reinicia la espera del guardado diferido (debounce de clics en la matriz)"""
+        if self._guardado_programado is not None:
+            self.dialog.after_cancel(self._guardado_programado)
+        self._guardado_programado = self.dialog.after(DEMORA_GUARDADO_MS, self.guardar_cambios_pendientes)
+    
+    def guardar_cambios_pendientes(self):
+        """Guarda de una vez los cambios acumulados de la matriz"""
+        if self._guardado_programado is not None:
+            try:
+                self.dialog.after_cancel(self._guardado_programado)
+            except tk.TclError:
+                pass
+            self._guardado_programado = None
+        if self.manager.hay_cambios_pendientes() and not self.manager.guardar_pendientes():
+            messagebox.showerror("Error", "No se pudieron guardar los cambios de la agenda", parent=self.dialog)
+    
+    def cerrar(self):
+        """Guarda los cambios pendientes y cierra el diálogo"""
+        self.guardar_cambios_pendientes()
+        self.dialog.destroy()
+    
+    def abrir_pronostico(self):
+        """Muestra las fechas de entrega de todos los proveedores para varias fechas de pedido"""
+        try:
+            fecha_inicio = datetime.strptime(self.fecha_pedido_var.get(), "%d-%m-%Y")
+        except ValueError:
+            messagebox.showerror("Error", "Formato de fecha inválido. Use dd-mm-yyyy", parent=self.dialog)
+            return
+        
+        ventana = tk.Toplevel(self.dialog)
+        ventana.title("📆 Pronóstico de Entregas")
+        ventana.geometry("1100x600")
+        ventana.configure(bg=self.colors['bg_main'])
+        
+        # Controles: cantidad de fechas de pedido y exportación
+        controles = tk.Frame(ventana, bg=self.colors['bg_card'])
+        controles.pack(fill='x', padx=10, pady=10)
+        
+        tk.Label(
+            controles,
+            text=f"Fechas de pedido desde {fecha_inicio.strftime('%d-%m-%Y')}:",
+            bg=self.colors['bg_card'],
+            fg=self.colors['fg_text'],
+            font=('Segoe UI', 10, 'bold')
+        ).pack(side='left', padx=(10, 10), pady=8)
+        
+        dias_var = tk.StringVar(value="60")
+        tk.Spinbox(
+            controles,
+            from_=1,
+            to=365,
+            textvariable=dias_var,
+            width=6,
+            font=('Segoe UI', 10),
+            command=lambda: mostrar()
+        ).pack(side='left')
+        
+        tabla_frame = tk.Frame(ventana, bg=self.colors['bg_main'])
+        tabla_frame.pack(fill='both', expand=True, padx=10, pady=(0, 10))
+        scrollbar_y = tk.Scrollbar(tabla_frame, orient='vertical')
+        scrollbar_y.pack(side='right', fill='y')
+        scrollbar_x = tk.Scrollbar(tabla_frame, orient='horizontal')
+        scrollbar_x.pack(side='bottom', fill='x')
+        tree = ttk.Treeview(
+            tabla_frame,
+            show='headings',
+            yscrollcommand=scrollbar_y.set,
+            xscrollcommand=scrollbar_x.set,
+            style='Bordered.Treeview'
+        )
+        scrollbar_y.config(command=tree.yview)
+        scrollbar_x.config(command=tree.xview)
+        tree.pack(fill='both', expand=True)
+        
+        def leer_dias():
+            try:
+                return max(1, min(365, int(dias_var.get())))
+            except ValueError:
+                return 60
+        
+        def mostrar():
+            """Recalcula el pronóstico y llena la tabla"""
+            pronostico = self.manager.pronostico_entregas(fecha_inicio, leer_dias())
+            columnas_fecha = [fecha.strftime("%d-%m") for fecha in pronostico.columns]
+            tree.delete(*tree.get_children())
+            tree['columns'] = ['Código', 'Nombre'] + columnas_fecha
+            tree.heading('Código', text='Código')
+            tree.column('Código', width=80, minwidth=80, anchor='center', stretch=False)
+            tree.heading('Nombre', text='Nombre')
+            tree.column('Nombre', width=220, minwidth=220, anchor='w', stretch=False)
+            for col in columnas_fecha:
+                tree.heading(col, text=col)
+                tree.column(col, width=55, minwidth=55, anchor='center', stretch=False)
+            
+            celdas = pronostico.apply(lambda col: col.dt.strftime("%d-%m")).fillna('')
+            for idx, (codigo, fila) in enumerate(zip(celdas.index, celdas.itertuples(index=False))):
+                nombre = self.manager.proveedores.get(codigo, {}).get('nombre', '')
+                tag_fila = 'evenrow' if idx % 2 == 0 else 'oddrow'
+                tree.insert('', 'end', values=(codigo, nombre) + tuple(fila), tags=(tag_fila,))
+        
+        def exportar():
+            archivo = filedialog.asksaveasfilename(
+                parent=ventana,
+                title="Exportar Pronóstico",
+                defaultextension=".xlsx",
+                initialfile=f"Pronostico_Entregas_{fecha_inicio.strftime('%d-%m-%Y')}.xlsx",
+                filetypes=[("Excel", "*.xlsx"), ("CSV", "*.csv")]
+            )
+            if not archivo:
+                return
+            if self.manager.exportar_pronostico(archivo, fecha_inicio, leer_dias()):
+                messagebox.showinfo("✅ Exportado", f"Pronóstico exportado a:\n{archivo}", parent=ventana)
+            else:
+                messagebox.showerror("Error", "No se pudo exportar el pronóstico", parent=ventana)
+        
+        tk.Button(
+            controles,
+            text="🔄 Actualizar",
+            command=mostrar,
+            bg=self.colors['accent'],
+            fg='white',
+            font=('Segoe UI', 9, 'bold'),
+            relief='flat',
+            cursor='hand2',
+            padx=12,
+            pady=4
+        ).pack(side='left', padx=10)
+        
+        tk.Button(
+            controles,
+            text="📤 Exportar",
+            command=exportar,
+            bg=self.colors['success'],
+            fg='white',
+            font=('Segoe UI', 9, 'bold'),
+            relief='flat',
+            cursor='hand2',
+            padx=12,
+            pady=4
+        ).pack(side='left')
+        
+        tree.tag_configure('oddrow', background='#F5F5F5')
+        tree.tag_configure('evenrow', background='white')
+        mostrar()
+    
     def on_tree_motion(self, event):
         """Cambia el cursor cuando está sobre columnas editables"""
         region = self.tree.identify_region(event.x, event.y)
@@ -7,45 +7,93 @@ Gestiona la matriz de proveedores y calcula fechas de entrega automáticamente.
 Reemplaza la funcionalidad del Excel Agenda.xlsm con lógica Python pura.
 """
 
-import json
+import copy
 import os
+from contextlib import contextmanager
 from datetime import datetime, timedelta
 from typing import Dict, List, Tuple, Optional
 
+import numpy as np
+
+from almacenamiento import DIAS_AGENDA, crear_backend, resolver_ruta_almacen, transaccional
+from calendario_feriados import ARCHIVO_FERIADOS_DEFAULT, CalendarioFeriados
+
+
+# Tablas de fechas de entrega que se guardan por gestor antes de vaciar el caché
+MAX_TABLAS_EN_CACHE = 64
+
 
 class AgendaManager:
     """Gestor de agenda de proveedores y cálculo de fechas de entrega"""
     
-    def __init__(self, config_file: str = None):
+    def __init__(self, config_file: str = None, feriados_file: str = None, compacto: bool = None):
         """
         Inicializa el gestor de agenda
         
         Args:
-            config_file: Ruta al archivo de configuración JSON (opcional)
+            config_file: Ruta al archivo de configuración JSON o base SQLite .db (opcional)
+            feriados_file: Ruta a feriados.json (opcional, por defecto junto a la configuración)
+            compacto: Formato del JSON al guardar (None = el del archivo existente)
         """
         # Si no se especifica, usar ubicación por defecto
         if config_file is None:
-            # Guardar en la carpeta raíz del proyecto
+            # Guardar en la carpeta raíz del proyecto (o en la base SQLite si fue migrado)
             base_dir = os.path.dirname(os.path.abspath(__file__))
-            self.config_file = os.path.join(base_dir, "agenda_config.json")
+            self.config_file = resolver_ruta_almacen(os.path.join(base_dir, "agenda_config.json"))
         else:
             self.config_file = config_file
-            
+        
+        self.backend = crear_backend(self.config_file, "agenda", compacto)
         self.dias_despacho = 21  # Días por defecto para calcular fecha de despacho
         self.proveedores = {}  # Diccionario de proveedores y sus días de entrega
+        self._pendientes = {}  # Cambios sin guardar: código -> datos (None = eliminado)
+        self._nivel_lote = 0
+        self.version_config = 0  # Aumenta con cada cambio de proveedores (invalida el calendario)
+        self._calendario = None
+        self._tablas_entrega = {}  # (version_config, día de despacho) -> {código: fecha_entrega}
+        if feriados_file is None:
+            feriados_file = os.path.join(os.path.dirname(os.path.abspath(self.config_file)), ARCHIVO_FERIADOS_DEFAULT)
+        self.feriados = CalendarioFeriados(feriados_file)
+        self._firma = self.backend.firma()
         self.cargar_configuracion()
     
+    def recargar_si_cambio(self) -> bool:
+        """
+        Recarga la configuración solo si otro proceso modificó el almacenamiento
+        (o si cambió el archivo de feriados)
+        
+        Returns:
+            True si se recargó
+        """
+        feriados_cambiaron = self.feriados.recargar_si_cambio()
+        if feriados_cambiaron:
+            self._invalidar_calendario()
+        firma = self.backend.firma()
+        if firma == self._firma:
+            return feriados_cambiaron
+        self._firma = firma
+        self.cargar_configuracion()
+        # Mantener encima los cambios propios que aún no se guardaron
+        for codigo, datos in self._pendientes.items():
+            if datos is None:
+                self.proveedores.pop(codigo, None)
+            else:
+                self.proveedores[codigo] = datos
+        self._invalidar_calendario()
+        return True
+    
     def cargar_configuracion(self):
-        """Carga la configuración desde el archivo JSON"""
-        if os.path.exists(self.config_file):
+        """Carga la configuración desde el almacenamiento"""
+        if self.backend.existe():
             try:
-                with open(self.config_file, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
-                    self.dias_despacho = data.get('dias_despacho', 21)
-                    self.proveedores = data.get('proveedores', {})
-                    # Configuración cargada exitosamente
+                data = self.backend.cargar()
+                self.dias_despacho = data.get('dias_despacho', 21)
+                self.proveedores = data.get('proveedores', {})
+                self._invalidar_calendario()
+                # Configuración cargada exitosamente
             except Exception as e:
-                # Error cargando configuración
+                # Error cargando configuración: conservar una copia antes de reescribirla
+                self.backend.respaldar_ilegible()
                 self._crear_configuracion_default()
         else:
             # Creando configuración por defecto
@@ -55,22 +103,117 @@ class AgendaManager:
         """Crea configuración por defecto"""
         self.dias_despacho = 21
         self.proveedores = {}
+        self._invalidar_calendario()
         self.guardar_configuracion()
     
     def guardar_configuracion(self):
-        """Guarda la configuración en el archivo JSON"""
+        """Guarda la configuración completa en el almacenamiento"""
+        # Los diálogos pueden haber modificado self.proveedores directamente
+        self._invalidar_calendario()
         try:
             data = {
                 'dias_despacho': self.dias_despacho,
                 'proveedores': self.proveedores
             }
-            with open(self.config_file, 'w', encoding='utf-8') as f:
-                json.dump(data, f, indent=4, ensure_ascii=False)
+            with self.backend.bloqueo:
+                self.backend.guardar(data)
+                self._firma = self.backend.firma()
+            # El documento completo incluye los cambios pendientes
+            self._pendientes.clear()
             # Configuración guardada
         except Exception as e:
             pass  # Error guardando configuración
     
-    def agregar_proveedor(self, codigo: str, nombre: str, dias_entrega: Dict[str, any], dias_d2: any = None, fecha_manual: str = None):
+    def _guardar_cambio_proveedor(self, codigo: str, eliminado: bool = False, diferir: bool = False):
+        """
+        Persiste el cambio de un solo proveedor
+        
+        En SQLite actualiza solo la fila afectada; en JSON reescribe el archivo.
+        Dentro de un lote (o con diferir=True) solo lo anota como pendiente.
+        """
+        if diferir or self._nivel_lote:
+            self._pendientes[codigo] = None if eliminado else self.proveedores[codigo]
+            return
+        
+        if not self.backend.incremental:
+            self.guardar_configuracion()
+            return
+        try:
+            with self.backend.bloqueo:
+                if eliminado:
+                    self.backend.eliminar('proveedores', {'codigo': codigo})
+                else:
+                    self.backend.upsert('proveedores', (codigo, self.proveedores[codigo]))
+                self._firma = self.backend.firma()
+        except Exception as e:
+            pass  # Error guardando configuración
+    
+    @contextmanager
+    def lote_cambios(self):
+        """
+        Agrupa varios cambios de proveedores y los guarda una sola vez al salir
+        
+        Si el bloque termina con una excepción no se guarda nada: los
+        proveedores y los cambios pendientes vuelven a como estaban al entrar
+        al lote externo, así una importación que falla a la mitad no queda
+        aplicada a medias.
+        
+        Uso:
+            with manager.lote_cambios():
+                for ...:
+                    manager.agregar_proveedor(...)
+        """
+        externo = self._nivel_lote == 0
+        if externo:
+            respaldo = (copy.deepcopy(self.proveedores), dict(self._pendientes))
+        self._nivel_lote += 1
+        try:
+            yield self
+        except BaseException:
+            self._nivel_lote -= 1
+            if externo:
+                self.proveedores, self._pendientes = respaldo
+                self._invalidar_calendario()
+            raise
+        self._nivel_lote -= 1
+        if externo:
+            self.guardar_pendientes()
+    
+    def hay_cambios_pendientes(self) -> bool:
+        """Indica si hay cambios de proveedores sin guardar"""
+        return bool(self._pendientes)
+    
+    @transaccional
+    def guardar_pendientes(self) -> bool:
+        """
+        Guarda de una vez los cambios de proveedores acumulados
+        
+        En JSON reescribe el archivo una sola vez; en SQLite aplica todas las
+        filas en una transacción.
+        
+        Returns:
+            True si se guardó (o no había nada pendiente)
+        """
+        if not self._pendientes:
+            return True
+        
+        if not self.backend.incremental:
+            self.guardar_configuracion()
+            return not self._pendientes
+        
+        try:
+            registros = [(codigo, datos) for codigo, datos in self._pendientes.items() if datos is not None]
+            eliminados = [{'codigo': codigo} for codigo, datos in self._pendientes.items() if datos is None]
+            with self.backend.bloqueo:
+                self.backend.aplicar_cambios('proveedores', registros, eliminados)
+                self._firma = self.backend.firma()
+            self._pendientes.clear()
+            return True
+        except Exception as e:
+            return False  # Error guardando configuración, los cambios siguen pendientes
+    
+    @transaccional
+    def agregar_proveedor(self, codigo: str, nombre: str, dias_entrega: Dict[str, any], dias_d2: any = None, fecha_manual: str = None, guardar: bool = True):
         """
         Agrega o actualiza un proveedor en la matriz
         
@@ -83,6 +226,7 @@ class AgendaManager:
                          None = Ignorar (no se usa este día)
             dias_d2: Si entrega D-2 (1/0/None)
             fecha_manual: Fecha de entrega manual en formato dd-mm-yyyy (opcional)
+            guardar: Si False, el cambio queda pendiente hasta guardar_pendientes()
         """
         self.proveedores[str(codigo)] = {
             'nombre': nombre,
@@ -95,13 +239,16 @@ class AgendaManager:
             'D-2': dias_d2,
             'fecha_manual': fecha_manual
         }
-        self.guardar_configuracion()
+        self._invalidar_calendario()
+        self._guardar_cambio_proveedor(str(codigo), diferir=not guardar)
     
-    def eliminar_proveedor(self, codigo: str):
-        """Elimina un proveedor de la matriz"""
+    @transaccional
+    def eliminar_proveedor(self, codigo: str, guardar: bool = True):
+        """Elimina un proveedor de la matriz (guardar=False lo deja pendiente)"""
         if str(codigo) in self.proveedores:
             del self.proveedores[str(codigo)]
-            self.guardar_configuracion()
+            self._invalidar_calendario()
+            self._guardar_cambio_proveedor(str(codigo), eliminado=True, diferir=not guardar)
             return True
         return False
     
@@ -125,10 +272,232 @@ class AgendaManager:
         """
         return fecha_pedido + timedelta(days=self.dias_despacho)
     
+    # --- CALENDARIO PRECALCULADO DE ENTREGAS ---
+    
+    def _invalidar_calendario(self):
+        """Descarta el calendario y las tablas en caché tras un cambio de proveedores"""
+        self.version_config += 1
+        self._calendario = None
+        self._tablas_entrega.clear()
+    
+    @staticmethod
+    def _parsear_fecha_manual(fecha_manual) -> Optional[datetime]:
+        """Convierte la fecha manual dd-mm-yyyy (None si está vacía o es inválida)"""
+        if not fecha_manual:
+            return None
+        try:
+            return datetime.strptime(fecha_manual, "%d-%m-%Y")
+        except (ValueError, TypeError):
+            return None  # Si hay error, se usa el cálculo automático
+    
+    def _obtener_calendario(self) -> Dict:
+        """
+        Calendario de entregas de la configuración actual (se arma una vez por versión)
+        
+        Implementa la lógica del VBA de Agenda.xlsm para los 7 días de la semana
+        posibles del despacho a la vez:
+        - Cada día de entrega k (0=LUN..5=SAB) cae 7 - k + w días antes de un
+          despacho en el día w; D-2 cae 2 días antes
+        - Despacho Lunes a Miércoles: se toma la fecha más lejana
+        - Despacho Jueves a Sábado: se toma la más próxima
+        - Despacho Domingo: solo aplica D-2
+        - La fecha manual (parseada aquí una sola vez) reemplaza al cálculo
+        
+        Los feriados se aplican después sobre la fecha resultante (ver
+        CalendarioFeriados): una entrega en feriado pasa al día hábil anterior.
+        
+        Returns:
+            Dict con codigos, indice (código -> fila), desfases (proveedores x 7 días
+            de la semana; días antes del despacho, -1 = sin entrega), fechas_manual
+            y fechas_manual_dias (las mismas como datetime64, NaT = sin fecha manual)
+        """
+        if self._calendario is not None:
+            return self._calendario
+        
+        codigos = list(self.proveedores.keys())
+        columnas = DIAS_AGENDA + ['D-2']
+        
+        # Días/D-2 habilitados (solo cuentan los valores 1 o True)
+        activos = np.array(
+            [[datos.get(col) == 1 or datos.get(col) is True for col in columnas]
+             for datos in self.proveedores.values()],
+            dtype=bool
+        ).reshape(len(codigos), len(columnas))
+        
+        # Desfase de cada candidato según el día de la semana del despacho: (7 días x 7 candidatos)
+        dia_despacho = np.arange(7)[:, None]
+        candidatos = np.empty((7, 7), dtype=np.int16)
+        candidatos[:, :6] = 7 - np.arange(6)[None, :] + dia_despacho
+        candidatos[:, 6] = 2
+        habilitados = np.ones((7, 7), dtype=bool)
+        habilitados[6, :6] = False  # Despacho en domingo: solo D-2
+        
+        validos = activos[:, None, :] & habilitados[None, :, :]
+        mas_lejana = np.where(validos, candidatos, -1).max(axis=2)
+        mas_proxima = np.where(validos, candidatos, np.iinfo(np.int16).max).min(axis=2)
+        mas_proxima[~validos.any(axis=2)] = -1
+        desfases = np.where(dia_despacho.T <= 2, mas_lejana, mas_proxima).astype(np.int16)
+        
+        fechas_manual = [self._parsear_fecha_manual(datos.get('fecha_manual')) for datos in self.proveedores.values()]
+        
+        self._calendario = {
+            'version': self.version_config,
+            'codigos': codigos,
+            'indice': {codigo: i for i, codigo in enumerate(codigos)},
+            'desfases': desfases,
+            'fechas_manual': fechas_manual,
+            'fechas_manual_dias': np.array(
+                [np.datetime64(f.date(), 'D') if f else np.datetime64('NaT') for f in fechas_manual],
+                dtype='datetime64[D]'
+            ),
+        }
+        return self._calendario
+    
+    def tabla_fechas_entrega(self, fecha_despacho: datetime) -> Dict[str, Optional[datetime]]:
+        """
+        Fecha de entrega de todos los proveedores para una fecha de despacho
+        
+        La tabla se calcula de una sola pasada sobre el calendario y queda en
+        caché por (versión de la configuración, día de despacho): la hora no
+        cuenta, así todas las corridas del mismo día comparten la tabla.
+        
+        Args:
+            fecha_despacho: Fecha de despacho (datetime o date)
+            
+        Returns:
+            Dict código de proveedor -> fecha de entrega a las 00:00 (None si no hay configuración)
+        """
+        dia = fecha_despacho.date() if isinstance(fecha_despacho, datetime) else fecha_despacho
+        clave = (self.version_config, dia)
+        tabla = self._tablas_entrega.get(clave)
+        if tabla is not None:
+            return tabla
+        fecha_despacho = datetime.combine(dia, datetime.min.time())
+        
+        calendario = self._obtener_calendario()
+        desfases = calendario['desfases'][:, fecha_despacho.weekday()].tolist()
+        fechas_posibles = {
+            d: self.feriados.ajustar(fecha_despacho - timedelta(days=d))
+            for d in set(desfases) if d >= 0
+        }
+        fechas_posibles[-1] = None
+        
+        tabla = {
+            codigo: manual or fechas_posibles[d]
+            for codigo, d, manual in zip(calendario['codigos'], desfases, calendario['fechas_manual'])
+        }
+        
+        # Proveedores con feriados propios
+        for codigo in self.feriados.excepciones:
+            i = calendario['indice'].get(codigo)
+            if i is not None and not calendario['fechas_manual'][i] and desfases[i] >= 0:
+                tabla[codigo] = self.feriados.ajustar(fecha_despacho - timedelta(days=desfases[i]), codigo)
+        
+        if len(self._tablas_entrega) >= MAX_TABLAS_EN_CACHE:
+            self._tablas_entrega.clear()
+        self._tablas_entrega[clave] = tabla
+        return tabla
+    
+    def matriz_fechas_entrega(self, fechas_despacho) -> Tuple[List[str], np.ndarray]:
+        """
+        Fechas de entrega de todos los proveedores para varias fechas de despacho
+        
+        Args:
+            fechas_despacho: Secuencia de fechas de despacho (datetime, date o datetime64)
+            
+        Returns:
+            Tuple (codigos, matriz): matriz datetime64[D] de forma (proveedores, fechas),
+            NaT donde el proveedor no tiene entrega
+        """
+        calendario = self._obtener_calendario()
+        despachos = np.array([np.datetime64(f, 'D') for f in fechas_despacho], dtype='datetime64[D]')
+        # 1970-01-01 fue jueves (weekday 3)
+        dias_semana = (despachos.astype(np.int64) + 3) % 7
+        
+        desfases = calendario['desfases'][:, dias_semana]
+        matriz = despachos[None, :] - desfases.astype('timedelta64[D]')
+        matriz[desfases < 0] = np.datetime64('NaT')
+        
+        # Feriados: generales para todos y propios para los proveedores con excepciones
+        sin_feriados = matriz
+        matriz = self.feriados.ajustar_arreglo(sin_feriados)
+        for codigo in self.feriados.excepciones:
+            i = calendario['indice'].get(codigo)
+            if i is not None:
+                matriz[i] = self.feriados.ajustar_arreglo(sin_feriados[i], codigo)
+        
+        manuales = calendario['fechas_manual_dias']
+        con_manual = ~np.isnat(manuales)
+        matriz[con_manual, :] = manuales[con_manual, None]
+        
+        return calendario['codigos'], matriz
+    
+    def pronostico_entregas(self, fecha_pedido_inicio: datetime = None, dias: int = 60):
+        """
+        Pronóstico de entregas para varias fechas de pedido consecutivas
+        
+        Calcula en una sola pasada sobre el calendario la fecha de entrega de
+        todos los proveedores para cada fecha de pedido del rango (cada una con
+        su fecha de despacho = pedido + dias_despacho).
+        
+        Args:
+            fecha_pedido_inicio: Primera fecha de pedido (usa la fecha actual si no se proporciona)
+            dias: Cantidad de fechas de pedido a pronosticar
+            
+        Returns:
+            DataFrame proveedores x fechas de pedido con las fechas de entrega
+            (datetime64; NaT = sin entrega)
+        """
+        import pandas as pd
+        
+        if fecha_pedido_inicio is None:
+            fecha_pedido_inicio = datetime.now()
+        
+        fechas_pedido = np.datetime64(fecha_pedido_inicio, 'D') + np.arange(dias)
+        fechas_despacho = fechas_pedido + np.timedelta64(self.dias_despacho, 'D')
+        codigos, matriz = self.matriz_fechas_entrega(fechas_despacho)
+        
+        return pd.DataFrame(
+            matriz,
+            index=pd.Index(codigos, name='PROVEEDOR'),
+            columns=pd.DatetimeIndex(fechas_pedido, name='FECHA_PEDIDO')
+        )
+    
+    def exportar_pronostico(self, ruta_salida: str, fecha_pedido_inicio: datetime = None, dias: int = 60) -> bool:
+        """
+        Exporta el pronóstico de entregas a Excel (o CSV si la ruta termina en .csv)
+        
+        Una fila por proveedor (código y nombre) y una columna por fecha de pedido,
+        con las fechas en formato dd-mm-yyyy.
+        
+        Args:
+            ruta_salida: Archivo destino (.xlsx o .csv)
+            fecha_pedido_inicio: Primera fecha de pedido (opcional)
+            dias: Cantidad de fechas de pedido
+            
+        Returns:
+            True si se exportó correctamente
+        """
+        try:
+            pronostico = self.pronostico_entregas(fecha_pedido_inicio, dias)
+            
+            salida = pronostico.apply(lambda col: col.dt.strftime("%d-%m-%Y")).fillna('')
+            salida.columns = [fecha.strftime("%d-%m-%Y") for fecha in pronostico.columns]
+            salida.insert(0, 'NOMBRE', [self.proveedores[c].get('nombre', '') for c in pronostico.index])
+            salida = salida.reset_index()
+            
+            if ruta_salida.lower().endswith('.csv'):
+                salida.to_csv(ruta_salida, index=False, encoding='utf-8-sig')
+            else:
+                salida.to_excel(ruta_salida, index=False, sheet_name='Pronostico')
+            return True
+        except Exception as e:
+            return False  # Error exportando pronóstico
+    
     def calcular_fecha_entrega(self, codigo_proveedor: str, fecha_despacho: datetime) -> Optional[datetime]:
         """
         Calcula la fecha de entrega para un proveedor específico
-        Implementa la lógica del VBA de Agenda.xlsm
+        Implementa la lógica del VBA de Agenda.xlsm (ver _obtener_calendario)
         
         Args:
             codigo_proveedor: Código del proveedor
@@ -137,56 +506,19 @@ class AgendaManager:
         Returns:
             Fecha de entrega calculada o None si no hay configuración
         """
-        proveedor = self.obtener_proveedor(codigo_proveedor)
-        if not proveedor:
+        calendario = self._obtener_calendario()
+        i = calendario['indice'].get(str(codigo_proveedor))
+        if i is None:
             return None
         
         # Si tiene fecha manual, usarla
-        fecha_manual = proveedor.get('fecha_manual')
-        if fecha_manual:
-            try:
-                return datetime.strptime(fecha_manual, "%d-%m-%Y")
-            except:
-                pass  # Si hay error, continuar con cálculo automático
-        
-        # Día de la semana del despacho (0=Lun, 1=Mar, ..., 6=Dom)
-        dia_semana_despacho = fecha_despacho.weekday()  # 0=Monday, 6=Sunday
-        
-        fecha_seleccionada = None
-        
-        # Mapeo de días de la semana
-        dias = ['LUN', 'MAR', 'MIE', 'JUE', 'VIE', 'SAB']
-        
-        # Revisar D-2 primero (solo si es 1)
-        d2_value = proveedor.get('D-2')
-        if d2_value == 1 or d2_value is True:
-            fecha_test = fecha_despacho - timedelta(days=2)
-            if fecha_test < fecha_despacho:
-                fecha_seleccionada = fecha_test
-        
-        # Revisar días de la semana (LUN-SAB) - solo considerar valor 1
-        for k, dia in enumerate(dias):
-            dia_value = proveedor.get(dia)
-            if dia_value == 1 or dia_value is True:  # Solo considerar si es 1 o True
-                # Calcular fecha de la semana anterior para ese día
-                dias_atras = 7 - (k - dia_semana_despacho)
-                if dias_atras <= 0:
-                    dias_atras += 7
-                fecha_test = fecha_despacho - timedelta(days=dias_atras)
-                
-                # Solo consideramos fechas anteriores al despacho
-                if fecha_test < fecha_despacho:
-                    # Lógica según día de despacho
-                    if dia_semana_despacho in [0, 1, 2]:  # Lunes, Martes, Miércoles
-                        # Tomar la más lejana (mínima)
-                        if fecha_seleccionada is None or fecha_test < fecha_seleccionada:
-                            fecha_seleccionada = fecha_test
-                    elif dia_semana_despacho in [3, 4, 5]:  # Jueves, Viernes, Sábado
-                        # Tomar la más próxima (máxima)
-                        if fecha_seleccionada is None or fecha_test > fecha_seleccionada:
-                            fecha_seleccionada = fecha_test
-        
-        return fecha_seleccionada
+        if calendario['fechas_manual'][i]:
+            return calendario['fechas_manual'][i]
+        
+        desfase = int(calendario['desfases'][i, fecha_despacho.weekday()])
+        if desfase < 0:
+            return None
+        return self.feriados.ajustar(fecha_despacho - timedelta(days=desfase), codigo_proveedor)
     
     def procesar_dataframe_con_fechas(self, df, fecha_pedido: datetime = None):
         """
@@ -210,6 +542,7 @@ class AgendaManager:
         
         df = df.copy()
         df['FECHA_ENTREGA'] = None
+        tabla_entregas = self.tabla_fechas_entrega(fecha_despacho)
         
         # Procesar cada fila
         for idx, row in df.iterrows():
@@ -219,7 +552,7 @@ class AgendaManager:
             codigo_prov = codigo_prov.replace('.0', '')
             
             if codigo_prov:
-                fecha_entrega = self.calcular_fecha_entrega(codigo_prov, fecha_despacho)
+                fecha_entrega = tabla_entregas.get(codigo_prov)
                 if fecha_entrega:
                     df.at[idx, 'FECHA_ENTREGA'] = fecha_entrega
                 else:
@@ -238,6 +571,7 @@ class AgendaManager:
         
         return df
     
+    @transaccional
     def importar_desde_excel(self, ruta_agenda_xlsm: str):
         """
         Importa la configuración desde un archivo Agenda.xlsm existente
@@ -260,36 +594,37 @@ class AgendaManager:
             # Leer días de despacho si está configurado (asumimos que puede estar en alguna celda)
             # Por ahora mantenemos el valor actual
             
-            # Leer matriz de proveedores (A3:K en adelante)
+            # Leer matriz de proveedores (A3:K en adelante), guardando una sola vez al final
             proveedores_importados = 0
-            for row in ws.iter_rows(min_row=3, values_only=True):
-                if row[0]:  # Si hay código de proveedor
-                    codigo = str(row[0]).strip().replace('.0', '')
-                    nombre = str(row[1]) if row[1] else ''
-                    
-                    # row[2] es columna vacía
-                    # Convertir valores a 1, 0 o None
-                    def convertir_valor(val):
-                        if val is None or val == '':
+            with self.lote_cambios():
+                for row in ws.iter_rows(min_row=3, values_only=True):
+                    if row[0]:  # Si hay código de proveedor
+                        codigo = str(row[0]).strip().replace('.0', '')
+                        nombre = str(row[1]) if row[1] else ''
+                        
+                        # row[2] es columna vacía
+                        # Convertir valores a 1, 0 o None
+                        def convertir_valor(val):
+                            if val is None or val == '':
+                                return None
+                            if val == 0:
+                                return 0
+                            if val == 1 or val:
+                                return 1
                             return None
-                        if val == 0:
-                            return 0
-                        if val == 1 or val:
-                            return 1
-                        return None
-                    
-                    dias_entrega = {
-                        'LUN': convertir_valor(row[3]),
-                        'MAR': convertir_valor(row[4]),
-                        'MIE': convertir_valor(row[5]),
-                        'JUE': convertir_valor(row[6]),
-                        'VIE': convertir_valor(row[7]),
-                        'SAB': convertir_valor(row[8]),
-                    }
-                    dias_d2 = convertir_valor(row[9])
-                    
-                    self.agregar_proveedor(codigo, nombre, dias_entrega, dias_d2)
-                    proveedores_importados += 1
+                        
+                        dias_entrega = {
+                            'LUN': convertir_valor(row[3]),
+                            'MAR': convertir_valor(row[4]),
+                            'MIE': convertir_valor(row[5]),
+                            'JUE': convertir_valor(row[6]),
+                            'VIE': convertir_valor(row[7]),
+                            'SAB': convertir_valor(row[8]),
+                        }
+                        dias_d2 = convertir_valor(row[9])
+                        
+                        self.agregar_proveedor(codigo, nombre, dias_entrega, dias_d2)
+                        proveedores_importados += 1
             
             wb.close()
             # print(f"Importados {proveedores_importados} proveedores desde Excel")
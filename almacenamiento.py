@@ -0,0 +1,761 @@
+"""
+Backends de Almacenamiento para Datos de Referencia
+Creado por Lucas Gnemmi
+Versión: 1.0
+
+Abstrae dónde se guardan productos, reglas y agenda:
+- JsonBackend: el archivo JSON de siempre (instalaciones pequeñas), con
+  escritura atómica (temporal + fsync + rename) y codificación compacta opcional
+- SqliteBackend: base SQLite con claves indexadas, actualización fila a fila y modo WAL
+
+Ambos exponen un bloqueo entre procesos (archivo .lock) para las secuencias
+leer-modificar-escribir y una firma barata del archivo para detectar cambios
+hechos por otros usuarios.
+
+Incluye un migrador de una sola vez desde los JSON existentes a SQLite.
+"""
+
+import functools
+import json
+import os
+import shutil
+import sqlite3
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+# orjson es opcional: si está instalado se usa para leer (y escribir compacto) más rápido
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Bloqueo de archivos: fcntl en Linux/macOS, msvcrt en Windows
+try:
+    import fcntl
+    msvcrt = None
+except ImportError:
+    fcntl = None
+    import msvcrt
+
+
+# Base SQLite que, si existe junto a los JSON, reemplaza a los tres archivos
+ARCHIVO_SQLITE_DEFAULT = "datos_referencia.db"
+EXTENSIONES_SQLITE = ('.db', '.sqlite', '.sqlite3')
+
+# Días de la agenda en el mismo orden que agenda_config.json
+DIAS_AGENDA = ['LUN', 'MAR', 'MIE', 'JUE', 'VIE', 'SAB']
+
+# Codificación de los JSON nuevos: False = indentado (legible), True = compacto (sin espacios).
+# Un archivo existente conserva su formato (ver es_json_compacto y --compactar)
+JSON_COMPACTO = False
+
+# Bytes del inicio del archivo que se miran para detectar el formato
+_BYTES_DETECCION = 4096
+
+
+def leer_json(ruta):
+    """Lee un archivo JSON (con orjson si está disponible)"""
+    with open(ruta, 'rb') as f:
+        contenido = f.read()
+    if orjson is not None:
+        return orjson.loads(contenido)
+    return json.loads(contenido.decode('utf-8'))
+
+
+def es_json_compacto(ruta):
+    """
+    Indica si un JSON existente está escrito en formato compacto
+
+    El formato indentado tiene saltos de línea desde el principio; el
+    compacto no tiene ninguno.
+
+    Returns:
+        True/False, o None si el archivo no existe o está vacío
+    """
+    try:
+        with open(ruta, 'rb') as f:
+            inicio = f.read(_BYTES_DETECCION)
+    except OSError:
+        return None
+    if not inicio.strip():
+        return None
+    return b'\n' not in inicio.strip()
+
+
+def _codificar_json(data, indent, compacto):
+    """Serializa a bytes UTF-8 en formato compacto o indentado"""
+    if compacto:
+        if orjson is not None:
+            return orjson.dumps(data)
+        return json.dumps(data, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+    if orjson is not None and indent == 2:
+        return orjson.dumps(data, option=orjson.OPT_INDENT_2)
+    return json.dumps(data, indent=indent, ensure_ascii=False).encode('utf-8')
+
+
+def _fsync_directorio(carpeta):
+    """Persiste la entrada de directorio tras el rename (no aplica en Windows)"""
+    if os.name == 'nt':
+        return
+    try:
+        fd = os.open(carpeta, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+def escribir_json_atomico(ruta, data, indent=2, compacto=False):
+    """
+    Escribe un JSON de forma atómica y segura ante cortes
+
+    Escribe en un temporal de la misma carpeta, hace fsync y lo renombra
+    sobre el destino: un corte a mitad de escritura deja el archivo
+    anterior intacto, nunca un JSON truncado.
+
+    Args:
+        ruta: Archivo destino
+        data: Datos a serializar
+        indent: Indentación en modo legible
+        compacto: Si True, escribe sin espacios ni saltos de línea
+    """
+    contenido = _codificar_json(data, indent, compacto)
+    carpeta = os.path.dirname(os.path.abspath(ruta))
+
+    fd, ruta_tmp = tempfile.mkstemp(prefix=f".{os.path.basename(ruta)}.", suffix=".tmp", dir=carpeta)
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(contenido)
+            f.flush()
+            os.fsync(f.fileno())
+
+        # En Windows el rename falla si otro proceso (antivirus, otro usuario) tiene el archivo abierto
+        for intento in range(5):
+            try:
+                os.replace(ruta_tmp, ruta)
+                break
+            except PermissionError:
+                if intento == 4:
+                    raise
+                time.sleep(0.1 * (intento + 1))
+    except BaseException:
+        try:
+            os.unlink(ruta_tmp)
+        except OSError:
+            pass
+        raise
+
+    _fsync_directorio(carpeta)
+
+
+def firma_archivo(ruta):
+    """
+    Firma barata del archivo para detectar cambios de otros procesos
+
+    Combina inodo, mtime y tamaño: como cada guardado JSON reemplaza el
+    archivo por uno nuevo, el inodo cambia aunque el mtime tenga poca
+    resolución (carpetas de red). En SQLite incluye también el archivo -wal,
+    donde van primero las escrituras.
+
+    Returns:
+        tuple o None si el archivo no existe
+    """
+    try:
+        stat = os.stat(ruta)
+        firma = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+    except OSError:
+        return None
+    if es_ruta_sqlite(ruta):
+        try:
+            stat_wal = os.stat(ruta + "-wal")
+            firma += (stat_wal.st_mtime_ns, stat_wal.st_size)
+        except OSError:
+            pass
+    return firma
+
+
+class BloqueoArchivo:
+    """
+    Bloqueo consultivo entre procesos sobre '<archivo>.lock'
+
+    Es reentrante dentro del proceso (un guardado dentro de una transacción
+    no se bloquea a sí mismo) y serializa también los hilos del proceso.
+    Usar obtener_bloqueo() para compartir una sola instancia por archivo:
+    los bloqueos fcntl son por proceso y cerrar otro descriptor del mismo
+    archivo los liberaría.
+    """
+
+    def __init__(self, ruta, timeout=10.0):
+        """
+        Args:
+            ruta: Archivo de datos a proteger
+            timeout: Segundos de espera antes de desistir
+        """
+        self.ruta_lock = ruta + ".lock"
+        self.timeout = timeout
+        self._lock = threading.RLock()
+        self._nivel = 0
+        self._fd = None
+
+    def __enter__(self):
+        self.adquirir()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.liberar()
+        return False
+
+    def adquirir(self):
+        """Adquiere el bloqueo (espera hasta timeout si otro proceso lo tiene)"""
+        self._lock.acquire()
+        if self._nivel == 0:
+            try:
+                self._fd = self._bloquear_archivo()
+            except BaseException:
+                self._lock.release()
+                raise
+        self._nivel += 1
+
+    def liberar(self):
+        """Libera un nivel del bloqueo"""
+        self._nivel -= 1
+        if self._nivel == 0:
+            fd, self._fd = self._fd, None
+            try:
+                if fcntl is not None:
+                    fcntl.lockf(fd, fcntl.LOCK_UN)
+                else:
+                    os.lseek(fd, 0, os.SEEK_SET)
+                    msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
+            except OSError:
+                pass
+            finally:
+                os.close(fd)
+        self._lock.release()
+
+    def _bloquear_archivo(self):
+        """Abre el archivo .lock y toma el bloqueo exclusivo, reintentando hasta timeout"""
+        fd = os.open(self.ruta_lock, os.O_RDWR | os.O_CREAT, 0o666)
+        limite = time.monotonic() + self.timeout
+        while True:
+            try:
+                if fcntl is not None:
+                    fcntl.lockf(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                else:
+                    os.lseek(fd, 0, os.SEEK_SET)
+                    msvcrt.locking(fd, msvcrt.LK_NBLCK, 1)
+                return fd
+            except OSError:
+                if time.monotonic() >= limite:
+                    os.close(fd)
+                    raise TimeoutError(f"{self.ruta_lock} está bloqueado por otro usuario")
+                time.sleep(0.05)
+
+
+# Una instancia de bloqueo por archivo dentro del proceso
+_bloqueos = {}
+_bloqueos_lock = threading.Lock()
+
+
+def obtener_bloqueo(ruta):
+    """Devuelve el BloqueoArchivo compartido para un archivo de datos"""
+    ruta = os.path.abspath(ruta)
+    with _bloqueos_lock:
+        bloqueo = _bloqueos.get(ruta)
+        if bloqueo is None:
+            bloqueo = BloqueoArchivo(ruta)
+            _bloqueos[ruta] = bloqueo
+        return bloqueo
+
+
+def transaccional(metodo=None, *, si_bloqueado=None):
+    """
+    Decorador para los métodos de los gestores que leen-modifican-escriben
+
+    Toma el bloqueo del almacenamiento, recarga los datos si otro proceso
+    cambió el archivo y, al terminar, registra la firma resultante para que
+    el propio guardado no cuente como cambio externo. El gestor debe tener
+    `backend`, `_firma` y `recargar_si_cambio()`.
+
+    Si el bloqueo no se obtiene a tiempo el método devuelve False, igual que
+    un guardado fallido, o lo que devuelva si_bloqueado(error) para métodos
+    con otro formato de resultado.
+    """
+    if metodo is None:
+        return functools.partial(transaccional, si_bloqueado=si_bloqueado)
+
+    @functools.wraps(metodo)
+    def envoltura(self, *args, **kwargs):
+        try:
+            self.backend.bloqueo.adquirir()
+        except TimeoutError as e:
+            print(f"⚠️ {e}")
+            return si_bloqueado(e) if si_bloqueado else False
+        try:
+            self.recargar_si_cambio()
+            return metodo(self, *args, **kwargs)
+        finally:
+            self._firma = self.backend.firma()
+            self.backend.bloqueo.liberar()
+    return envoltura
+
+
+def es_ruta_sqlite(ruta):
+    """Indica si la ruta corresponde a una base SQLite"""
+    return str(ruta).lower().endswith(EXTENSIONES_SQLITE)
+
+
+def resolver_ruta_almacen(ruta_json):
+    """
+    Resuelve la ruta efectiva de un almacén
+
+    Si existe la base SQLite por defecto en la misma carpeta que el JSON
+    (creada con el migrador), se usa la base; si no, el JSON de siempre.
+
+    Args:
+        ruta_json: Ruta del archivo JSON por defecto
+
+    Returns:
+        str: Ruta a usar por el gestor
+    """
+    carpeta = os.path.dirname(os.path.abspath(ruta_json))
+    ruta_db = os.path.join(carpeta, ARCHIVO_SQLITE_DEFAULT)
+    if os.path.exists(ruta_db):
+        return ruta_db
+    return ruta_json
+
+
+def crear_backend(ruta, almacen, compacto=None):
+    """
+    Crea el backend adecuado según la extensión del archivo
+
+    Args:
+        ruta: Ruta del archivo (.json o .db/.sqlite)
+        almacen: 'products', 'rules' o 'agenda'
+        compacto: Codificación compacta para JSON (None = la del archivo
+            existente, o JSON_COMPACTO si es nuevo)
+    """
+    if es_ruta_sqlite(ruta):
+        return SqliteBackend(ruta, almacen)
+    indent = 4 if almacen in ('rules', 'agenda') else 2
+    return JsonBackend(ruta, indent=indent, compacto=compacto)
+
+
+class JsonBackend:
+    """Almacena el documento completo en un archivo JSON"""
+
+    # Cada cambio reescribe el archivo completo
+    incremental = False
+
+    def __init__(self, ruta, indent=2, compacto=None):
+        self.ruta = ruta
+        self.indent = indent
+        if compacto is None:
+            compacto = es_json_compacto(ruta)
+        self.compacto = JSON_COMPACTO if compacto is None else compacto
+        self.bloqueo = obtener_bloqueo(ruta)
+
+    def existe(self):
+        return os.path.exists(self.ruta)
+
+    def firma(self):
+        """Firma actual del archivo (ver firma_archivo)"""
+        return firma_archivo(self.ruta)
+
+    def cargar(self):
+        """Lee el documento completo (lanza excepción si el JSON es inválido)"""
+        return leer_json(self.ruta)
+
+    def guardar(self, data):
+        """Escribe el documento completo de forma atómica"""
+        escribir_json_atomico(self.ruta, data, indent=self.indent, compacto=self.compacto)
+
+    def respaldar_ilegible(self):
+        """
+        Copia aparte un archivo que no se pudo leer, antes de que un guardado
+        posterior lo reemplace con datos vacíos
+
+        Returns:
+            str: Ruta del respaldo o None si no se pudo crear
+        """
+        if not os.path.exists(self.ruta):
+            return None
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        ruta_respaldo = f"{self.ruta}.ilegible_{timestamp}"
+        try:
+            shutil.copy2(self.ruta, ruta_respaldo)
+            return ruta_respaldo
+        except OSError:
+            return None
+
+
+class SqliteBackend:
+    """
+    Almacena productos, reglas y agenda en tablas SQLite
+
+    Todas las colecciones comparten la misma base; cada gestor usa su
+    almacén ('products', 'rules' o 'agenda'). Las claves primarias son las
+    mismas que usan las búsquedas: sku; local+sku; sku+proveedor; código
+    de proveedor.
+    """
+
+    incremental = True
+
+    ESQUEMA = """
+        CREATE TABLE IF NOT EXISTS almacenes (
+            nombre TEXT PRIMARY KEY
+        );
+        CREATE TABLE IF NOT EXISTS metadata (
+            almacen TEXT NOT NULL,
+            clave TEXT NOT NULL,
+            valor TEXT,
+            PRIMARY KEY (almacen, clave)
+        );
+        CREATE TABLE IF NOT EXISTS products (
+            sku TEXT PRIMARY KEY,
+            descripcion TEXT NOT NULL,
+            formato_minimo REAL,
+            created TEXT,
+            updated TEXT
+        );
+        CREATE TABLE IF NOT EXISTS local_rules (
+            local TEXT NOT NULL,
+            sku TEXT NOT NULL,
+            proveedor TEXT NOT NULL,
+            descripcion TEXT,
+            created TEXT,
+            active INTEGER NOT NULL DEFAULT 1,
+            PRIMARY KEY (local, sku)
+        );
+        CREATE TABLE IF NOT EXISTS stock_blocks (
+            sku TEXT NOT NULL,
+            proveedor TEXT NOT NULL,
+            motivo TEXT,
+            created TEXT,
+            active INTEGER NOT NULL DEFAULT 1,
+            PRIMARY KEY (sku, proveedor)
+        );
+        CREATE TABLE IF NOT EXISTS proveedores (
+            codigo TEXT PRIMARY KEY,
+            nombre TEXT,
+            LUN INTEGER, MAR INTEGER, MIE INTEGER, JUE INTEGER, VIE INTEGER, SAB INTEGER,
+            D2 INTEGER,
+            fecha_manual TEXT
+        );
+    """
+
+    # Colección -> (tabla, columnas, columnas clave)
+    TABLAS = {
+        "products": ("products", ["sku", "descripcion", "formato_minimo", "created", "updated"], ["sku"]),
+        "local_rules": ("local_rules", ["local", "sku", "proveedor", "descripcion", "created", "active"], ["local", "sku"]),
+        "stock_blocks": ("stock_blocks", ["sku", "proveedor", "motivo", "created", "active"], ["sku", "proveedor"]),
+        "proveedores": ("proveedores", ["codigo", "nombre"] + DIAS_AGENDA + ["D2", "fecha_manual"], ["codigo"]),
+    }
+
+    def __init__(self, ruta, almacen):
+        """
+        Args:
+            ruta: Ruta de la base SQLite
+            almacen: 'products', 'rules' o 'agenda'
+        """
+        if almacen not in ('products', 'rules', 'agenda'):
+            raise ValueError(f"Almacén desconocido: {almacen}")
+        self.ruta = ruta
+        self.almacen = almacen
+        self.bloqueo = obtener_bloqueo(ruta)
+        with self._conectar() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(self.ESQUEMA)
+
+    @contextmanager
+    def _conectar(self):
+        """Abre una conexión corta (una por operación) y confirma al salir"""
+        conn = sqlite3.connect(self.ruta, timeout=30)
+        try:
+            conn.execute("PRAGMA synchronous=NORMAL")
+            yield conn
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+
+    # --- Conversión registro <-> fila ---
+
+    def _a_fila(self, coleccion, registro):
+        if coleccion == "proveedores":
+            codigo, datos = registro
+            return (
+                str(codigo), datos.get('nombre', ''),
+                *[datos.get(dia) for dia in DIAS_AGENDA],
+                datos.get('D-2'), datos.get('fecha_manual')
+            )
+        columnas = self.TABLAS[coleccion][1]
+        fila = []
+        for col in columnas:
+            valor = registro.get(col)
+            if col == "active":
+                valor = 1 if registro.get("active", True) else 0
+            fila.append(valor)
+        return tuple(fila)
+
+    @staticmethod
+    def _desde_fila(coleccion, columnas, fila):
+        if coleccion == "proveedores":
+            datos = dict(zip(columnas, fila))
+            codigo = datos.pop("codigo")
+            datos['D-2'] = datos.pop("D2")
+            return codigo, {
+                'nombre': datos['nombre'],
+                **{dia: datos[dia] for dia in DIAS_AGENDA},
+                'D-2': datos['D-2'],
+                'fecha_manual': datos['fecha_manual'],
+            }
+        registro = {}
+        for col, valor in zip(columnas, fila):
+            if col == "active":
+                registro[col] = bool(valor)
+            elif valor is not None:
+                registro[col] = valor
+        return registro
+
+    def _leer_coleccion(self, conn, coleccion):
+        tabla, columnas, claves = self.TABLAS[coleccion]
+        cursor = conn.execute(
+            f"SELECT {', '.join(columnas)} FROM {tabla} ORDER BY rowid"
+        )
+        return [self._desde_fila(coleccion, columnas, fila) for fila in cursor]
+
+    def _escribir_coleccion(self, conn, coleccion, registros):
+        tabla, columnas, _ = self.TABLAS[coleccion]
+        conn.execute(f"DELETE FROM {tabla}")
+        conn.executemany(
+            f"INSERT OR REPLACE INTO {tabla} ({', '.join(columnas)}) VALUES ({', '.join('?' * len(columnas))})",
+            [self._a_fila(coleccion, r) for r in registros]
+        )
+
+    def _leer_metadata(self, conn):
+        cursor = conn.execute("SELECT clave, valor FROM metadata WHERE almacen = ?", (self.almacen,))
+        return {clave: json.loads(valor) for clave, valor in cursor}
+
+    def _escribir_metadata(self, conn, metadata):
+        conn.execute("DELETE FROM metadata WHERE almacen = ?", (self.almacen,))
+        conn.executemany(
+            "INSERT INTO metadata (almacen, clave, valor) VALUES (?, ?, ?)",
+            [(self.almacen, clave, json.dumps(valor, ensure_ascii=False)) for clave, valor in metadata.items()]
+        )
+
+    # --- API del backend ---
+
+    def existe(self):
+        """True si el almacén ya fue inicializado en la base"""
+        with self._conectar() as conn:
+            fila = conn.execute("SELECT 1 FROM almacenes WHERE nombre = ?", (self.almacen,)).fetchone()
+        return fila is not None
+
+    def firma(self):
+        """Firma actual de la base (incluye el archivo -wal)"""
+        return firma_archivo(self.ruta)
+
+    def respaldar_ilegible(self):
+        """SQLite se recupera con su propio journal: no hay copia que hacer"""
+        return None
+
+    def cargar(self):
+        """Devuelve el documento con la misma forma que el JSON equivalente"""
+        with self._conectar() as conn:
+            metadata = self._leer_metadata(conn)
+            if self.almacen == "products":
+                return {"products": self._leer_coleccion(conn, "products"), "metadata": metadata}
+            if self.almacen == "rules":
+                return {
+                    "local_rules": self._leer_coleccion(conn, "local_rules"),
+                    "stock_blocks": self._leer_coleccion(conn, "stock_blocks"),
+                    "metadata": metadata,
+                }
+            return {
+                "dias_despacho": metadata.get("dias_despacho", 21),
+                "proveedores": dict(self._leer_coleccion(conn, "proveedores")),
+            }
+
+    def guardar(self, data):
+        """Reemplaza el almacén completo en una sola transacción"""
+        with self._conectar() as conn:
+            conn.execute("INSERT OR IGNORE INTO almacenes (nombre) VALUES (?)", (self.almacen,))
+            if self.almacen == "products":
+                self._escribir_coleccion(conn, "products", data.get("products", []))
+                self._escribir_metadata(conn, data.get("metadata", {}))
+            elif self.almacen == "rules":
+                self._escribir_coleccion(conn, "local_rules", data.get("local_rules", []))
+                self._escribir_coleccion(conn, "stock_blocks", data.get("stock_blocks", []))
+                self._escribir_metadata(conn, data.get("metadata", {}))
+            else:
+                self._escribir_coleccion(conn, "proveedores", list(data.get("proveedores", {}).items()))
+                self._escribir_metadata(conn, {"dias_despacho": data.get("dias_despacho", 21)})
+
+    def upsert(self, coleccion, registro, metadata=None):
+        """
+        Inserta o actualiza un único registro
+
+        Args:
+            coleccion: 'products', 'local_rules', 'stock_blocks' o 'proveedores'
+            registro: dict del registro (para 'proveedores', tupla (codigo, datos))
+            metadata: Metadata del almacén a actualizar en la misma transacción (opcional)
+        """
+        tabla, columnas, _ = self.TABLAS[coleccion]
+        with self._conectar() as conn:
+            conn.execute("INSERT OR IGNORE INTO almacenes (nombre) VALUES (?)", (self.almacen,))
+            conn.execute(
+                f"INSERT OR REPLACE INTO {tabla} ({', '.join(columnas)}) VALUES ({', '.join('?' * len(columnas))})",
+                self._a_fila(coleccion, registro)
+            )
+            if metadata is not None:
+                self._escribir_metadata(conn, metadata)
+
+    def eliminar(self, coleccion, clave, metadata=None):
+        """
+        Elimina un registro por su clave primaria
+
+        Args:
+            coleccion: 'products', 'local_rules', 'stock_blocks' o 'proveedores'
+            clave: dict {columna_clave: valor}
+            metadata: Metadata del almacén a actualizar en la misma transacción (opcional)
+        """
+        tabla, _, columnas_clave = self.TABLAS[coleccion]
+        condicion = " AND ".join(f"{col} = ?" for col in columnas_clave)
+        with self._conectar() as conn:
+            conn.execute(f"DELETE FROM {tabla} WHERE {condicion}", tuple(str(clave[col]) for col in columnas_clave))
+            if metadata is not None:
+                self._escribir_metadata(conn, metadata)
+
+    def aplicar_cambios(self, coleccion, registros, claves_eliminadas=(), metadata=None):
+        """
+        Inserta/actualiza y elimina varios registros en una sola transacción
+
+        Args:
+            coleccion: 'products', 'local_rules', 'stock_blocks' o 'proveedores'
+            registros: Registros a insertar o actualizar (mismo formato que upsert)
+            claves_eliminadas: Claves de los registros a eliminar (mismo formato que eliminar)
+            metadata: Metadata del almacén a actualizar en la misma transacción (opcional)
+        """
+        tabla, columnas, columnas_clave = self.TABLAS[coleccion]
+        condicion = " AND ".join(f"{col} = ?" for col in columnas_clave)
+        with self._conectar() as conn:
+            conn.execute("INSERT OR IGNORE INTO almacenes (nombre) VALUES (?)", (self.almacen,))
+            conn.executemany(
+                f"DELETE FROM {tabla} WHERE {condicion}",
+                [tuple(str(clave[col]) for col in columnas_clave) for clave in claves_eliminadas]
+            )
+            conn.executemany(
+                f"INSERT OR REPLACE INTO {tabla} ({', '.join(columnas)}) VALUES ({', '.join('?' * len(columnas))})",
+                [self._a_fila(coleccion, registro) for registro in registros]
+            )
+            if metadata is not None:
+                self._escribir_metadata(conn, metadata)
+
+    def guardar_metadata(self, metadata):
+        """Actualiza solo la metadata del almacén"""
+        with self._conectar() as conn:
+            self._escribir_metadata(conn, metadata)
+
+
+def migrar_json_a_sqlite(ruta_db, products_json="products.json", rules_json="rules.json",
+                         agenda_json="agenda_config.json"):
+    """
+    Migra de una sola vez los tres archivos JSON a una base SQLite
+
+    Los JSON originales no se modifican. Una vez creada la base con el
+    nombre por defecto junto a los JSON, los gestores pasan a usarla.
+
+    Args:
+        ruta_db: Ruta de la base SQLite destino
+        products_json: Ruta de products.json
+        rules_json: Ruta de rules.json
+        agenda_json: Ruta de agenda_config.json
+
+    Returns:
+        dict: Cantidad de registros migrados por colección
+    """
+    stats = {"products": 0, "local_rules": 0, "stock_blocks": 0, "proveedores": 0}
+
+    origenes = [("products", products_json), ("rules", rules_json), ("agenda", agenda_json)]
+    for almacen, ruta_json in origenes:
+        if not ruta_json or not os.path.exists(ruta_json):
+            print(f"⚠️ {ruta_json} not found, skipping {almacen}")
+            continue
+
+        data = JsonBackend(ruta_json).cargar()
+        SqliteBackend(ruta_db, almacen).guardar(data)
+
+        if almacen == "products":
+            stats["products"] = len(data.get("products", []))
+        elif almacen == "rules":
+            stats["local_rules"] = len(data.get("local_rules", []))
+            stats["stock_blocks"] = len(data.get("stock_blocks", []))
+        else:
+            stats["proveedores"] = len(data.get("proveedores", {}))
+        print(f"✅ {almacen} migrated from {ruta_json}")
+
+    return stats
+
+
+def convertir_formato_json(rutas, compacto):
+    """
+    Reescribe archivos JSON en formato compacto o indentado
+
+    Como los gestores conservan el formato del archivo existente, basta con
+    convertirlo una vez para que los guardados siguientes lo mantengan.
+
+    Args:
+        rutas: Lista de (almacén, ruta) con almacén 'products', 'rules' o 'agenda'
+        compacto: True = compacto, False = indentado
+
+    Returns:
+        dict: ruta -> (bytes antes, bytes después) de los archivos convertidos
+    """
+    resultado = {}
+    for almacen, ruta in rutas:
+        if not ruta or not os.path.exists(ruta):
+            print(f"⚠️ {ruta} not found, skipping {almacen}")
+            continue
+        antes = os.path.getsize(ruta)
+        backend = crear_backend(ruta, almacen, compacto=compacto)
+        with backend.bloqueo:
+            backend.guardar(backend.cargar())
+        resultado[ruta] = (antes, os.path.getsize(ruta))
+        print(f"✅ {ruta}: {antes:,} → {resultado[ruta][1]:,} bytes")
+    return resultado
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Migra products/rules/agenda de JSON a SQLite, "
+                                                 "o cambia el formato de los JSON")
+    parser.add_argument("--db", default=ARCHIVO_SQLITE_DEFAULT, help="Base SQLite destino")
+    parser.add_argument("--products", default="products.json")
+    parser.add_argument("--rules", default="rules.json")
+    parser.add_argument("--agenda", default="agenda_config.json")
+    formato = parser.add_mutually_exclusive_group()
+    formato.add_argument("--compactar", action="store_true",
+                         help="Reescribir los JSON sin indentación (en lugar de migrar); se mantiene en los guardados")
+    formato.add_argument("--indentar", action="store_true",
+                         help="Reescribir los JSON indentados (legibles) en lugar de migrar")
+    args = parser.parse_args()
+
+    if args.compactar or args.indentar:
+        convertir_formato_json([("products", args.products), ("rules", args.rules), ("agenda", args.agenda)],
+                               compacto=args.compactar)
+    else:
+        resultado = migrar_json_a_sqlite(args.db, args.products, args.rules, args.agenda)
+        print("📊 Migration summary:")
+        for coleccion, cantidad in resultado.items():
+            print(f"   • {coleccion}: {cantidad}")
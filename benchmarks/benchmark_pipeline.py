@@ -0,0 +1,209 @@
+"""
+Benchmark del Pipeline de Procesamiento
+Creado por Lucas Gnemmi
+Versión: 1.0
+
+Mide cada paso del procesamiento (lectura de órdenes, índice de Full.xlsx,
+validación de SKUs, mapeo de proveedores, fechas, separación de errores,
+IDs, formato de empaque y escritura) sobre un escenario sintético
+(generar_datos.py) o una carpeta real, y agrega el resultado con el commit
+actual a benchmarks/resultados/resultados.jsonl para comparar entre commits.
+
+Uso:
+    python benchmarks/benchmark_pipeline.py --lineas 100000
+    python benchmarks/benchmark_pipeline.py --datos C:\\Copia\\Sistema --xlsx
+    python benchmarks/benchmark_pipeline.py --comparar --lineas 100000
+"""
+
+import contextlib
+import io
+import json
+import os
+import subprocess
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, REPO_DIR)
+sys.path.insert(0, BENCH_DIR)
+
+import pandas as pd
+
+from contexto_ejecucion import ContextoEjecucion
+from escritores_salida import ESCRITORES
+from generar_datos import generar_escenario, REGION_DEFAULT
+from procesamiento_v2 import (
+    procesar_pdfs, construir_indice_proveedores, preparar_flujo, marcar_skus_items,
+    marcar_proveedor_por_sku, marcar_fechas_entrega, separar_errores, filas_validas,
+    asignar_id_final, ajustar_cantidades_formato_minimo
+)
+
+
+DATOS_DIR = os.path.join(BENCH_DIR, "datos")
+RESULTADOS = os.path.join(BENCH_DIR, "resultados", "resultados.jsonl")
+
+# Fecha fija para que todas las corridas calculen los mismos despachos
+FECHA_PEDIDO = datetime(2026, 10, 20)
+
+
+def commit_actual():
+    """Commit (abreviado) del repositorio, con '+' si hay cambios sin commitear"""
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_DIR,
+                                capture_output=True, text=True, check=True).stdout.strip()
+        cambios = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], cwd=REPO_DIR,
+                                 capture_output=True, text=True).stdout.strip()
+        return commit + ("+" if cambios else "")
+    except Exception:
+        return "sin-git"
+
+
+class Cronometro:
+    """Tiempo (y opcionalmente memoria pico) de cada paso"""
+
+    def __init__(self, memoria=False):
+        self.memoria = memoria
+        self.pasos = {}
+
+    @contextlib.contextmanager
+    def paso(self, nombre):
+        if self.memoria:
+            tracemalloc.start()
+        inicio = time.perf_counter()
+        try:
+            # Los pasos escriben mucho en consola; no se mide la terminal
+            with contextlib.redirect_stdout(io.StringIO()):
+                yield
+        finally:
+            resultado = {"segundos": round(time.perf_counter() - inicio, 4)}
+            if self.memoria:
+                resultado["pico_mb"] = round(tracemalloc.get_traced_memory()[1] / 1e6, 1)
+                tracemalloc.stop()
+            self.pasos[nombre] = resultado
+            print(f"   {nombre:<22} {resultado['segundos']:>9.3f} s"
+                  + (f" {resultado['pico_mb']:>9.1f} MB" if self.memoria else ""))
+
+
+def preparar_datos(datos=None, lineas=10000, semilla=0):
+    """Carpeta de entrada: la indicada, o un escenario sintético (generado una vez y reutilizado)"""
+    if datos:
+        return datos, {"datos": os.path.abspath(datos)}
+    destino = os.path.join(DATOS_DIR, f"lineas_{lineas}_semilla_{semilla}")
+    if not os.path.isdir(os.path.join(destino, "Ordenes")):
+        print(f"🧪 Generating synthetic scenario: {lineas} lines...")
+        generar_escenario(destino, lineas=lineas, semilla=semilla)
+    return destino, {"lineas": lineas, "semilla": semilla}
+
+
+def ejecutar_benchmark(base_dir, region=REGION_DEFAULT, formatos=("csv",), memoria=False):
+    """
+    Ejecuta el procesamiento completo midiendo cada paso
+
+    Args:
+        base_dir: Carpeta con Ordenes/, Full-Agenda/ y los JSON de referencia
+        region: Región de Full.xlsx
+        formatos: Formatos de salida a medir (claves de escritores_salida.ESCRITORES)
+        memoria: Si True, mide también la memoria pico de cada paso (más lento)
+
+    Returns:
+        Dict con los pasos, el total y el tamaño del resultado
+    """
+    contexto = ContextoEjecucion(
+        products_file=os.path.join(base_dir, "products.json"),
+        rules_file=os.path.join(base_dir, "rules.json"),
+        agenda_file=os.path.join(base_dir, "agenda_config.json"),
+    )
+    # Cargar los gestores fuera de la medición (en la interfaz ya están en memoria)
+    contexto.cargar()
+
+    cron = Cronometro(memoria)
+    with cron.paso("lectura_ordenes"):
+        df = procesar_pdfs(os.path.join(base_dir, "Ordenes"))
+    with cron.paso("indice_full"):
+        indice = construir_indice_proveedores(os.path.join(base_dir, "Full-Agenda", "Full.xlsx"), region)
+    with cron.paso("validar_skus"):
+        preparar_flujo(df)
+        marcar_skus_items(df, contexto.products_manager)
+    with cron.paso("mapear_proveedores"):
+        marcar_proveedor_por_sku(df, indice, rules_manager=contexto.rules_manager)
+    with cron.paso("fechas_entrega"):
+        marcar_fechas_entrega(df, agenda_manager=contexto.agenda_manager, fecha_pedido=FECHA_PEDIDO)
+    with cron.paso("separar_errores"):
+        df_errores = separar_errores(df)
+    with cron.paso("asignar_id"):
+        df_final = asignar_id_final(df.loc[filas_validas(df)])
+    with cron.paso("formato_minimo"):
+        ajustar_cantidades_formato_minimo(df_final, products_manager=contexto.products_manager)
+
+    salida = os.path.join(BENCH_DIR, "resultados", "salida")
+    os.makedirs(os.path.dirname(salida), exist_ok=True)
+    for formato in formatos:
+        with cron.paso(f"escribir_{formato}"):
+            ESCRITORES[formato](df_final, df_errores, salida)
+
+    return {
+        "pasos": cron.pasos,
+        "total_segundos": round(sum(p["segundos"] for p in cron.pasos.values()), 3),
+        "lineas_entrada": len(df),
+        "lineas_final": len(df_final),
+        "errores": len(df_errores),
+    }
+
+
+def guardar_resultado(resultado):
+    """Agrega el resultado al historial (una línea JSON por corrida)"""
+    os.makedirs(os.path.dirname(RESULTADOS), exist_ok=True)
+    with open(RESULTADOS, "a", encoding="utf-8") as f:
+        f.write(json.dumps(resultado, ensure_ascii=False) + "\n")
+
+
+def comparar(escenario, ultimos=5):
+    """
+    Tabla paso x commit con las últimas corridas del mismo escenario
+
+    Returns:
+        DataFrame (vacío si no hay corridas)
+    """
+    if not os.path.exists(RESULTADOS):
+        return pd.DataFrame()
+    with open(RESULTADOS, encoding="utf-8") as f:
+        corridas = [json.loads(linea) for linea in f if linea.strip()]
+    corridas = [c for c in corridas if c.get("escenario") == escenario][-ultimos:]
+    tabla = pd.DataFrame({
+        f"{c['commit']} ({c['fecha'][5:16]})": {**{p: v["segundos"] for p, v in c["pasos"].items()},
+                                                 "TOTAL": c["total_segundos"]}
+        for c in corridas
+    })
+    return tabla
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Mide cada paso del procesamiento de órdenes")
+    parser.add_argument("--datos", default=None, help="Carpeta de entrada real (default: escenario sintético)")
+    parser.add_argument("--lineas", type=int, default=10000, help="Líneas del escenario sintético (default 10.000)")
+    parser.add_argument("--semilla", type=int, default=0, help="Semilla del escenario sintético")
+    parser.add_argument("--region", default=REGION_DEFAULT, help="Región de Full.xlsx")
+    parser.add_argument("--xlsx", action="store_true", help="Medir también la escritura del Excel con formato")
+    parser.add_argument("--memoria", action="store_true", help="Medir la memoria pico de cada paso (más lento)")
+    parser.add_argument("--comparar", action="store_true", help="Solo mostrar las últimas corridas del escenario")
+    args = parser.parse_args()
+
+    base_dir, escenario = preparar_datos(args.datos, args.lineas, args.semilla)
+
+    if not args.comparar:
+        print(f"⏱️ Benchmark on {base_dir} (commit {commit_actual()})")
+        resultado = ejecutar_benchmark(base_dir, args.region, ("csv", "xlsx") if args.xlsx else ("csv",), args.memoria)
+        resultado = {"fecha": datetime.now().isoformat(timespec="seconds"), "commit": commit_actual(),
+                     "escenario": escenario, **resultado}
+        guardar_resultado(resultado)
+        print(f"✅ Total {resultado['total_segundos']} s - {resultado['lineas_final']} order lines, "
+              f"{resultado['errores']} errors")
+
+    tabla = comparar(escenario)
+    if not tabla.empty:
+        print(tabla.to_string())
@@ -0,0 +1,228 @@
+"""
+Ejecución Aislada de una Versión del Procesamiento
+Creado por Lucas Gnemmi
+Versión: 1.0
+
+Proceso hijo de equivalencia.py: corre el procesamiento del código de una
+carpeta (un commit extraído, otra instalación o este repositorio) sobre los
+datos de entrada y guarda PEDIDOS_CD y Errors en CSV.
+
+No importa nada del repositorio antes de fijar sys.path: equivalencia.py lo
+lanza con cwd y PYTHONPATH en la carpeta del código, este script quita su
+propia carpeta de sys.path y al terminar verifica que ningún módulo del
+procesamiento se haya cargado desde otro lado. Así la referencia ejecuta
+de verdad su propio código y no una mezcla con el de la candidata.
+
+- Versiones con pipeline_procesamiento.ejecutar_pipeline(contexto=,
+  fecha_pedido=, guardar=): se usa ese pipeline.
+- Versiones anteriores (las funciones por paso de la interfaz original):
+  procesar_pdfs -> validar_skus_items -> mapear_proveedor_por_sku ->
+  rellenar_fecha_entrega_y_observacion -> asignar_id_final ->
+  ajustar_cantidades_formato_minimo, uniendo los errores en el mismo orden
+  que la interfaz.
+
+Uso (lo llama equivalencia.py):
+    python benchmarks/ejecutar_version.py CODIGO_DIR BASE_DIR DESTINO LOTE FECHA_ISO
+"""
+
+import contextlib
+import os
+import sys
+
+_PROPIA = os.path.dirname(os.path.abspath(__file__))
+_REPO_PROPIO = os.path.dirname(_PROPIA)
+
+# Módulos del procesamiento que tienen que venir de la carpeta del código
+MODULOS_PROCESAMIENTO = (
+    "procesamiento_v2", "pipeline_procesamiento", "contexto_ejecucion",
+    "products_manager", "rules_manager", "agenda_manager",
+)
+
+REGION = "119"
+HOJAS = ("PEDIDOS_CD", "Errors")
+
+
+def _dentro_de(ruta, carpeta):
+    ruta, carpeta = os.path.realpath(ruta), os.path.realpath(carpeta)
+    return os.path.commonpath([ruta, carpeta]) == carpeta
+
+
+def preparar_rutas(codigo_dir):
+    """Deja en sys.path solo la carpeta del código (sin la de este script ni el cwd)"""
+    sys.path[:] = [p for p in sys.path if p not in ("", ".") and os.path.realpath(p) != os.path.realpath(_PROPIA)]
+    sys.path.insert(0, codigo_dir)
+
+
+def verificar_origen(codigo_dir):
+    """
+    Falla si algún módulo del procesamiento se cargó desde fuera de codigo_dir
+
+    Raises:
+        RuntimeError: con los módulos que vienen de otra carpeta
+    """
+    ajenos = []
+    for nombre, modulo in list(sys.modules.items()):
+        archivo = getattr(modulo, "__file__", None)
+        if not archivo or os.path.realpath(archivo) == os.path.realpath(__file__):
+            continue
+        del_repo_propio = _dentro_de(archivo, _REPO_PROPIO) and not _dentro_de(_REPO_PROPIO, codigo_dir)
+        if (nombre in MODULOS_PROCESAMIENTO or del_repo_propio) and not _dentro_de(archivo, codigo_dir):
+            ajenos.append(f"{nombre} ({archivo})")
+    if ajenos:
+        raise RuntimeError(f"Módulos cargados desde fuera de {codigo_dir}: {', '.join(ajenos)}")
+
+
+def _acepta(funcion, parametro):
+    import inspect
+    return parametro in inspect.signature(funcion).parameters
+
+
+def _tiene_pipeline():
+    """True si la versión tiene ejecutar_pipeline con contexto, fecha_pedido y guardar"""
+    try:
+        from pipeline_procesamiento import ejecutar_pipeline
+        import contexto_ejecucion  # noqa: F401
+    except ImportError:
+        return False
+    return all(_acepta(ejecutar_pipeline, p) for p in ("contexto", "fecha_pedido", "guardar"))
+
+
+def ejecutar_pipeline_version(base_dir, tamano_lote, fecha_pedido):
+    """Versiones con ejecutar_pipeline(contexto=, fecha_pedido=, guardar=)"""
+    from contexto_ejecucion import ContextoEjecucion
+    from pipeline_procesamiento import ejecutar_pipeline
+
+    contexto = ContextoEjecucion(
+        products_file=os.path.join(base_dir, "products.json"),
+        rules_file=os.path.join(base_dir, "rules.json"),
+        agenda_file=os.path.join(base_dir, "agenda_config.json"),
+    )
+    resultado = ejecutar_pipeline(base_dir, REGION, tamano_lote=tamano_lote, contexto=contexto,
+                                  fecha_pedido=fecha_pedido, guardar=False)
+    return resultado['df_final'], resultado['df_errores']
+
+
+def _gestores_legado(base_dir):
+    """
+    Gestores de productos, reglas y agenda leyendo los archivos de base_dir
+
+    Returns:
+        (gestores, clases): dict parámetro -> instancia, y la lista de
+        (clase, ruta) para archivos_por_defecto()
+    """
+    from products_manager import ProductsManager
+    from rules_manager import RulesManager
+    from agenda_manager import AgendaManager
+
+    gestores, clases = {}, []
+    for clave, clase, archivo in (("products_manager", ProductsManager, "products.json"),
+                                  ("rules_manager", RulesManager, "rules.json"),
+                                  ("agenda_manager", AgendaManager, "agenda_config.json")):
+        ruta = os.path.join(base_dir, archivo)
+        gestores[clave] = clase(ruta)
+        clases.append((clase, ruta))
+    return gestores, clases
+
+
+@contextlib.contextmanager
+def archivos_por_defecto(clases):
+    """
+    Cambia el archivo por defecto de los gestores mientras dura el bloque
+
+    En la versión original algunos pasos crean ProductsManager(),
+    RulesManager() o AgendaManager() sin argumentos (archivo relativo al cwd
+    o a la carpeta del código) y no aceptan un gestor. Dentro del bloque esos
+    constructores leen los archivos de los datos de entrada; al salir se
+    restauran los valores originales.
+
+    Args:
+        clases: Lista de (clase, ruta); solo se cambian los constructores con
+            un único parámetro opcional (el archivo)
+    """
+    originales = [(clase, clase.__init__.__defaults__) for clase, _ in clases]
+    try:
+        for clase, ruta in clases:
+            if len(clase.__init__.__defaults__ or ()) == 1:
+                clase.__init__.__defaults__ = (ruta,)
+        yield
+    finally:
+        for clase, defaults in originales:
+            clase.__init__.__defaults__ = defaults
+
+
+def ejecutar_pasos_legado(base_dir, fecha_pedido):
+    """Versiones sin pipeline: los pasos de la interfaz original, uno tras otro"""
+    gestores, clases = _gestores_legado(base_dir)
+    with archivos_por_defecto(clases):
+        return _pasos_legado(base_dir, fecha_pedido, gestores)
+
+
+def _pasos_legado(base_dir, fecha_pedido, gestores):
+    import pandas as pd
+    from procesamiento_v2 import (
+        procesar_pdfs, validar_skus_items, mapear_proveedor_por_sku, asignar_id_final,
+        ajustar_cantidades_formato_minimo, rellenar_fecha_entrega_y_observacion_con_agenda_manager,
+    )
+
+    def con_gestor(funcion, clave):
+        return {clave: gestores[clave]} if _acepta(funcion, clave) else {}
+
+    df = procesar_pdfs(os.path.join(base_dir, "Ordenes"))
+    if df.empty:
+        return pd.DataFrame(), pd.DataFrame()
+    df_items, df_err_items, _ = validar_skus_items(df, gestores["products_manager"])
+    df_map, df_err_prov, _ = mapear_proveedor_por_sku(
+        df_items, os.path.join(base_dir, "Full-Agenda", "Full.xlsx"), REGION,
+        **con_gestor(mapear_proveedor_por_sku, "rules_manager"),
+    )
+    # rellenar_fecha_entrega_y_observacion llama a esta función con la fecha actual;
+    # se llama directamente para fijar la fecha del pedido
+    df_valid, df_err_fecha = rellenar_fecha_entrega_y_observacion_con_agenda_manager(
+        df_map, fecha_pedido, **con_gestor(rellenar_fecha_entrega_y_observacion_con_agenda_manager, "agenda_manager"),
+    )
+    errores = [e.reset_index(drop=True) for e in (df_err_items, df_err_prov, df_err_fecha)]
+    errores = [e.loc[:, ~e.columns.duplicated()] for e in errores]
+    df_errores = pd.concat(errores, ignore_index=True)
+
+    df_final = asignar_id_final(df_valid.reset_index(drop=True))
+    ajustado = ajustar_cantidades_formato_minimo(
+        df_final, **con_gestor(ajustar_cantidades_formato_minimo, "products_manager")
+    )
+    if ajustado is not None:
+        df_final = ajustado
+    return df_final, df_errores
+
+
+def main(codigo_dir, base_dir, destino, tamano_lote, fecha_iso):
+    preparar_rutas(codigo_dir)
+
+    import io
+    import json
+    import time
+    from datetime import datetime
+
+    fecha_pedido = datetime.fromisoformat(fecha_iso)
+    inicio = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        if _tiene_pipeline():
+            modo = "pipeline"
+            df_final, df_errores = ejecutar_pipeline_version(base_dir, tamano_lote, fecha_pedido)
+        else:
+            modo = "pasos"
+            if tamano_lote:
+                raise RuntimeError("Esta versión no tiene procesamiento por lotes (--lotes)")
+            df_final, df_errores = ejecutar_pasos_legado(base_dir, fecha_pedido)
+    segundos = time.perf_counter() - inicio
+    verificar_origen(codigo_dir)
+
+    os.makedirs(destino, exist_ok=True)
+    for hoja, df in zip(HOJAS, (df_final, df_errores)):
+        columnas = [c for c in df.columns if not str(c).startswith('_')]
+        df.to_csv(os.path.join(destino, f"{hoja}.csv"), index=False, columns=columnas, encoding="utf-8")
+    with open(os.path.join(destino, "tiempo.json"), "w", encoding="utf-8") as f:
+        json.dump({"segundos": round(segundos, 3), "modo": modo}, f)
+
+
+if __name__ == "__main__":
+    _, codigo, base, salida, lote, fecha = sys.argv
+    main(os.path.abspath(codigo), os.path.abspath(base), os.path.abspath(salida), int(lote) or None, fecha)
@@ -0,0 +1,217 @@
+"""
+Verificación de Equivalencia entre Versiones del Procesamiento
+Creado por Lucas Gnemmi
+Versión: 1.0
+
+Ejecuta una versión de referencia y una candidata del procesamiento sobre
+los mismos datos de entrada (escenario sintético o carpeta real) y compara
+PEDIDOS_CD y Errors celda por celda: IDs, OBSERVACION, proveedores, fechas,
+cantidades y qué filas terminan en errores. Sirve para adoptar optimizaciones
+con la seguridad de que el resultado no cambia, y muestra los tiempos de
+ambas versiones lado a lado.
+
+La referencia puede ser un commit de git, otra carpeta con el código, o una
+salida "golden" grabada antes con --grabar. Cada versión corre en su propio
+proceso (ejecutar_version.py) con cwd y PYTHONPATH en su carpeta, y se
+verifica que no cargue módulos de la otra. Las versiones anteriores al
+pipeline sin interfaz se ejecutan con las funciones por paso originales.
+
+Uso:
+    python benchmarks/equivalencia.py --referencia HEAD~1 --lineas 100000
+    python benchmarks/equivalencia.py --referencia-dir C:\\SistemaAnterior --datos C:\\Copia
+    python benchmarks/equivalencia.py --grabar --lineas 100000     # Guarda la salida actual como golden
+    python benchmarks/equivalencia.py --golden --lineas 100000     # Compara contra la golden guardada
+"""
+
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, BENCH_DIR)
+
+import pandas as pd
+
+from benchmark_pipeline import preparar_datos, FECHA_PEDIDO, RESULTADOS
+
+
+# Proceso hijo que corre una versión aislada (no importa nada del repositorio)
+EJECUTOR = os.path.join(BENCH_DIR, "ejecutar_version.py")
+
+
+GOLDEN_DIR = os.path.join(BENCH_DIR, "golden")
+
+HOJAS = ("PEDIDOS_CD", "Errors")
+
+# Máximo de diferencias que se muestran en consola (el CSV las tiene todas)
+MAX_DIFERENCIAS_LOG = 20
+
+
+def ejecutar_version(codigo_dir, base_dir, destino, tamano_lote=None):
+    """
+    Ejecuta el pipeline de una versión del código en un proceso separado
+
+    Args:
+        codigo_dir: Carpeta con el código (pipeline_procesamiento.py, procesamiento_v2.py, ...)
+        base_dir: Carpeta de datos de entrada
+        destino: Carpeta donde se guardan PEDIDOS_CD.csv, Errors.csv y tiempo.json
+        tamano_lote: Tamaño de lote (None = todo en memoria)
+
+    Returns:
+        Segundos que tardó el procesamiento
+    """
+    codigo_dir = os.path.abspath(codigo_dir)
+    comando = [sys.executable, EJECUTOR, codigo_dir, os.path.abspath(base_dir), os.path.abspath(destino),
+               str(tamano_lote or 0), FECHA_PEDIDO.isoformat()]
+    entorno = dict(os.environ, PYTHONPATH=codigo_dir)
+    proceso = subprocess.run(comando, capture_output=True, text=True, cwd=codigo_dir, env=entorno)
+    if proceso.returncode != 0:
+        raise RuntimeError(f"La versión en {codigo_dir} falló:\n{proceso.stderr[-2000:]}")
+    with open(os.path.join(destino, "tiempo.json"), encoding="utf-8") as f:
+        return json.load(f)["segundos"]
+
+
+def extraer_commit(referencia, destino):
+    """Copia el código de un commit de git a una carpeta (git archive)"""
+    os.makedirs(destino, exist_ok=True)
+    archivo = subprocess.run(["git", "archive", "--format=tar", referencia], cwd=REPO_DIR,
+                             capture_output=True, check=True).stdout
+    subprocess.run(["tar", "-x", "-C", destino], input=archivo, check=True)
+    return destino
+
+
+def leer_hojas(carpeta):
+    """PEDIDOS_CD y Errors guardados por ejecutar_version, todo como texto"""
+    hojas = {}
+    for hoja in HOJAS:
+        ruta = os.path.join(carpeta, f"{hoja}.csv")
+        try:
+            hojas[hoja] = pd.read_csv(ruta, dtype=str, keep_default_na=False, encoding="utf-8")
+        except (FileNotFoundError, pd.errors.EmptyDataError):
+            hojas[hoja] = pd.DataFrame()
+    return hojas
+
+
+def _normalizar_valor(valor):
+    """Mismo texto para 120, 120.0 y '120.0'; vacío para nulos"""
+    texto = str(valor).strip()
+    if texto.lower() in ("nan", "none", "<na>"):
+        return ""
+    try:
+        numero = float(texto)
+        if numero.is_integer() and ("." in texto or "e" in texto.lower()):
+            return str(int(numero))
+    except ValueError:
+        pass
+    return texto
+
+
+def comparar_hojas(referencia, candidata, hoja):
+    """
+    Compara dos hojas celda por celda
+
+    Args:
+        referencia, candidata: DataFrames de texto
+        hoja: Nombre de la hoja (para el reporte)
+
+    Returns:
+        DataFrame con una fila por diferencia (HOJA, FILA, COLUMNA, REFERENCIA, CANDIDATA)
+    """
+    diferencias = []
+    columnas_ref, columnas_cand = list(referencia.columns), list(candidata.columns)
+    for col in columnas_ref:
+        if col not in columnas_cand:
+            diferencias.append((hoja, "", col, "columna presente", "columna faltante"))
+    for col in columnas_cand:
+        if col not in columnas_ref:
+            diferencias.append((hoja, "", col, "columna faltante", "columna presente"))
+    if len(referencia) != len(candidata):
+        diferencias.append((hoja, "", "", f"{len(referencia)} filas", f"{len(candidata)} filas"))
+
+    comunes = [c for c in columnas_ref if c in columnas_cand]
+    n = min(len(referencia), len(candidata))
+    ref = referencia[comunes].iloc[:n].map(_normalizar_valor).to_numpy()
+    cand = candidata[comunes].iloc[:n].map(_normalizar_valor).to_numpy()
+    for fila, columna in zip(*(ref != cand).nonzero()):
+        # Fila como en Excel: +1 por el encabezado y +1 porque empieza en 0
+        diferencias.append((hoja, int(fila) + 2, comunes[columna], ref[fila, columna], cand[fila, columna]))
+
+    return pd.DataFrame(diferencias, columns=["HOJA", "FILA", "COLUMNA", "REFERENCIA", "CANDIDATA"])
+
+
+def comparar_carpetas(carpeta_referencia, carpeta_candidata):
+    """Diferencias de todas las hojas entre dos salidas de ejecutar_version"""
+    ref, cand = leer_hojas(carpeta_referencia), leer_hojas(carpeta_candidata)
+    return pd.concat([comparar_hojas(ref[h], cand[h], h) for h in HOJAS], ignore_index=True)
+
+
+def reportar(diferencias, tiempos):
+    """Muestra el resultado y guarda todas las diferencias en CSV"""
+    print("⏱️ " + "  |  ".join(f"{nombre}: {segundos:.2f} s" for nombre, segundos in tiempos.items()))
+    if diferencias.empty:
+        print("✅ Equivalent outputs: PEDIDOS_CD and Errors match cell by cell")
+        return None
+
+    ruta = os.path.join(os.path.dirname(RESULTADOS), f"diferencias_{time.strftime('%Y%m%d_%H%M%S')}.csv")
+    os.makedirs(os.path.dirname(ruta), exist_ok=True)
+    diferencias.to_csv(ruta, index=False, encoding="utf-8-sig")
+    print(f"❌ {len(diferencias)} differences found:")
+    print(diferencias.groupby(["HOJA", "COLUMNA"]).size().to_string())
+    print(diferencias.head(MAX_DIFERENCIAS_LOG).to_string(index=False))
+    print(f"📄 All differences: {ruta}")
+    return ruta
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Compara la salida de dos versiones del procesamiento")
+    referencia = parser.add_mutually_exclusive_group(required=True)
+    referencia.add_argument("--referencia", help="Commit de git de la versión de referencia (p. ej. HEAD~1)")
+    referencia.add_argument("--referencia-dir", help="Carpeta con el código de referencia")
+    referencia.add_argument("--golden", action="store_true", help="Comparar contra la salida golden grabada")
+    referencia.add_argument("--grabar", action="store_true", help="Grabar la salida actual como golden")
+    parser.add_argument("--candidata-dir", default=REPO_DIR, help="Código candidato (default: este repositorio)")
+    parser.add_argument("--datos", default=None, help="Carpeta de entrada real (default: escenario sintético)")
+    parser.add_argument("--lineas", type=int, default=10000, help="Líneas del escenario sintético")
+    parser.add_argument("--semilla", type=int, default=0, help="Semilla del escenario sintético")
+    parser.add_argument("--lotes", type=int, default=None, help="Procesar por lotes de N líneas")
+    args = parser.parse_args()
+
+    base_dir, escenario = preparar_datos(args.datos, args.lineas, args.semilla)
+    nombre_golden = "_".join(f"{k}_{v}" for k, v in escenario.items() if k != "datos") or "datos"
+    carpeta_golden = os.path.join(GOLDEN_DIR, nombre_golden)
+
+    temporal = tempfile.mkdtemp(prefix="equivalencia_")
+    try:
+        carpeta_cand = os.path.join(temporal, "candidata")
+        tiempos = {"candidata": ejecutar_version(os.path.abspath(args.candidata_dir), base_dir, carpeta_cand, args.lotes)}
+
+        if args.grabar:
+            shutil.rmtree(carpeta_golden, ignore_errors=True)
+            shutil.copytree(carpeta_cand, carpeta_golden)
+            print(f"💾 Golden output saved in {carpeta_golden} ({tiempos['candidata']:.2f} s)")
+            sys.exit(0)
+
+        if args.golden:
+            if not os.path.isdir(carpeta_golden):
+                print(f"❌ No golden output for this scenario, record it first with --grabar")
+                sys.exit(1)
+            carpeta_ref = carpeta_golden
+            with open(os.path.join(carpeta_golden, "tiempo.json"), encoding="utf-8") as f:
+                tiempos["golden"] = json.load(f)["segundos"]
+        else:
+            codigo_ref = args.referencia_dir or extraer_commit(args.referencia, os.path.join(temporal, "codigo"))
+            carpeta_ref = os.path.join(temporal, "referencia")
+            tiempos["referencia"] = ejecutar_version(os.path.abspath(codigo_ref), base_dir, carpeta_ref, args.lotes)
+
+        diferencias = comparar_carpetas(carpeta_ref, carpeta_cand)
+        reportar(diferencias, tiempos)
+        sys.exit(1 if not diferencias.empty else 0)
+    finally:
+        shutil.rmtree(temporal, ignore_errors=True)
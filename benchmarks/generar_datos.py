@@ -0,0 +1,209 @@
+"""
+Generador de Datos Sintéticos para Benchmarks
+Creado por Lucas Gnemmi
+Versión: 1.0
+
+Crea una carpeta con la misma estructura que el sistema (Ordenes/,
+Full-Agenda/Full.xlsx, products.json, rules.json, agenda_config.json y
+feriados.json) con datos inventados pero con la forma de los reales:
+SKUs con varios proveedores, varias regiones en Full.xlsx, formatos de
+empaque, reglas especiales y proveedores sin agenda. Con la misma semilla
+se generan siempre los mismos archivos.
+
+Uso:
+    python benchmarks/generar_datos.py destino --lineas 100000
+"""
+
+import json
+import os
+from datetime import datetime
+
+import numpy as np
+from openpyxl import Workbook
+
+
+REGION_DEFAULT = "119"
+REGIONES = (REGION_DEFAULT, "111", "099")
+DIAS_AGENDA = ("LUN", "MAR", "MIE", "JUE", "VIE", "SAB")
+
+# Máximo de líneas por planilla de órdenes (las exportaciones reales vienen partidas)
+LINEAS_POR_ARCHIVO = 200000
+
+COLUMNAS_ORDENES = [
+    "NUM_PEDIDO_CTRPED", "DATA_ENTREGA_CTRPED", "COD_MAT_PEDCOM", "DESCR_MAT_CADMAT",
+    "QTDE_PEDIDA_PEDCOM", "QTDE_ENTREGUE_PEDCOM", "LOCAL_ENTREGA_CTRPED",
+    "DESCR_CEN_CADCEN", "FORNECEDOR_CTRPED"
+]
+
+COLUMNAS_FULL = [
+    "Fecha Precio", "RUT", "Código Proveedor", "Descripción Proveedor", "Codigo SKU",
+    "Descripcion SKU", "UM SKU", "Región", "Descripción región", "Precio", "Precio UM",
+    "Validez inicial", "Validez final", "Categoría"
+]
+
+LUGARES = ("GREGORIO ALIMENT.", "LAREDO Y CABO NEGRO ALIM", "CULLEN ALIMENT", "POSESION",
+           "DAU", "CERRO SOMBRERO", "PECKET", "ISLA RIESCO", "KIMIRI AIKE", "BAHIA LAREDO")
+
+
+def _escribir_xlsx(ruta, columnas, filas):
+    """Escribe una hoja con openpyxl en modo write_only (sin cargar todo en memoria)"""
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet()
+    ws.append(columnas)
+    for fila in filas:
+        ws.append(fila)
+    wb.save(ruta)
+
+
+def _escribir_json(ruta, datos):
+    with open(ruta, "w", encoding="utf-8") as f:
+        json.dump(datos, f, indent=2, ensure_ascii=False)
+
+
+def generar_escenario(destino, lineas=10000, skus=2000, proveedores=150, centros=60,
+                      semilla=0, lineas_por_archivo=LINEAS_POR_ARCHIVO):
+    """
+    Genera un escenario completo de entrada
+
+    Args:
+        destino: Carpeta a crear (misma estructura que la carpeta del sistema)
+        lineas: Líneas de pedido en total (repartidas en varias planillas)
+        skus: SKUs distintos del catálogo
+        proveedores: Proveedores distintos
+        centros: Centros de costo (bodegas) distintos
+        semilla: Semilla del generador aleatorio
+        lineas_por_archivo: Máximo de líneas por planilla de órdenes
+
+    Returns:
+        Dict con los parámetros y las rutas generadas
+    """
+    rng = np.random.default_rng(semilla)
+    os.makedirs(os.path.join(destino, "Ordenes"), exist_ok=True)
+    os.makedirs(os.path.join(destino, "Full-Agenda"), exist_ok=True)
+    ahora = datetime.now().isoformat()
+
+    codigos_prov = [str(20000 + 37 * i) for i in range(proveedores)]
+    codigos_sku = [f"A{100000 + 13 * i}" for i in range(skus)]
+    codigos_centro = [str(30700 + 3 * i) for i in range(centros)]
+    nombres_centro = [f"BOD. ENAP MAGALLANES {LUGARES[i % len(LUGARES)]} {i // len(LUGARES) or ''}".strip()
+                      for i in range(centros)]
+
+    # Proveedores de cada SKU: ~15% con 2 o 3 proveedores
+    cantidad_prov = rng.choice([1, 2, 3], size=skus, p=[0.85, 0.11, 0.04])
+    prov_por_sku = {
+        sku: list(rng.choice(codigos_prov, size=n, replace=False))
+        for sku, n in zip(codigos_sku, cantidad_prov)
+    }
+
+    # ~1% de los SKUs sin precio en Full.xlsx y ~2% fuera de la maestra de productos
+    sin_precio = set(rng.choice(codigos_sku, size=max(1, skus // 100), replace=False))
+    fuera_maestra = set(rng.choice(codigos_sku, size=max(1, skus // 50), replace=False))
+
+    # Full.xlsx: cada par SKU-proveedor en la región principal y a veces en otras
+    filas_full = []
+    for sku, provs in prov_por_sku.items():
+        if sku in sin_precio:
+            continue
+        for prov in provs:
+            for region in REGIONES:
+                if region != REGION_DEFAULT and rng.random() < 0.6:
+                    continue
+                precio = round(float(rng.uniform(500, 50000)), 1)
+                filas_full.append([
+                    "20260101", f"76{prov}0", prov, f"PROVEEDOR {prov}", sku, f"SKU-PRODUCTO {sku}", "UN",
+                    region, f"REGION {region}", precio, precio, "20260101", "20261231", "SKU-ABARROTES"
+                ])
+    _escribir_xlsx(os.path.join(destino, "Full-Agenda", "Full.xlsx"), COLUMNAS_FULL, filas_full)
+
+    # products.json con formato mínimo en ~30% de los SKUs
+    formatos = rng.choice([0, 6, 12, 24], size=skus, p=[0.7, 0.1, 0.1, 0.1])
+    productos = []
+    for sku, formato in zip(codigos_sku, formatos):
+        if sku in fuera_maestra:
+            continue
+        producto = {"sku": sku, "descripcion": f"SKU-PRODUCTO {sku}", "created": ahora}
+        if formato:
+            producto["formato_minimo"] = float(formato)
+        productos.append(producto)
+    _escribir_json(os.path.join(destino, "products.json"), {"products": productos})
+
+    # agenda_config.json: ~3% de proveedores sin configurar
+    sin_agenda = set(rng.choice(codigos_prov, size=max(1, proveedores // 33), replace=False))
+    agenda = {"dias_despacho": 21, "proveedores": {}}
+    for prov in codigos_prov:
+        if prov in sin_agenda:
+            continue
+        dias = rng.random(len(DIAS_AGENDA)) < 0.5
+        dias[rng.integers(len(DIAS_AGENDA))] = True
+        config = {"nombre": f"PROVEEDOR {prov}"}
+        config.update({dia: (1 if activo else None) for dia, activo in zip(DIAS_AGENDA, dias)})
+        config.update({"D-2": None, "fecha_manual": None})
+        agenda["proveedores"][prov] = config
+    _escribir_json(os.path.join(destino, "agenda_config.json"), agenda)
+    _escribir_json(os.path.join(destino, "feriados.json"), {
+        "feriados": ["01-01-2026", "01-05-2026", "18-09-2026", "19-09-2026", "25-12-2026"],
+        "proveedores": {}
+    })
+
+    # rules.json: reglas LOCAL + SKU y bloqueos sobre SKUs con varios proveedores
+    multi = [sku for sku, provs in prov_por_sku.items() if len(provs) > 1 and sku not in sin_precio]
+    reglas = {"local_rules": [], "stock_blocks": [], "metadata": {"created": ahora, "version": "1.0"}}
+    for sku in multi[:10]:
+        reglas["local_rules"].append({
+            "local": str(rng.choice(codigos_centro)), "sku": sku, "proveedor": prov_por_sku[sku][-1],
+            "descripcion": "Regla sintética", "created": ahora, "active": True
+        })
+    for sku in multi[10:30]:
+        reglas["stock_blocks"].append({
+            "sku": sku, "proveedor": prov_por_sku[sku][0], "motivo": "Quiebre sintético",
+            "created": ahora, "active": True
+        })
+    _escribir_json(os.path.join(destino, "rules.json"), reglas)
+
+    # Órdenes: pocos SKUs concentran la mayoría de las líneas (como en los pedidos reales)
+    pesos_sku = 1.0 / np.arange(1, skus + 1) ** 0.8
+    pesos_sku /= pesos_sku.sum()
+    archivos = []
+    for inicio in range(0, lineas, lineas_por_archivo):
+        n = min(lineas_por_archivo, lineas - inicio)
+        idx_sku = rng.choice(skus, size=n, p=pesos_sku)
+        idx_centro = rng.integers(centros, size=n)
+        cantidades = rng.integers(1, 200, size=n)
+        decimales = rng.random(n) < 0.02
+        pedidos = 10500000 + inicio // 50 + np.arange(n) // 50
+
+        def filas():
+            for i in range(n):
+                sku = codigos_sku[idx_sku[i]]
+                cantidad = f"{cantidades[i]},5" if decimales[i] else str(cantidades[i])
+                yield [
+                    str(pedidos[i]), "20261020", sku, f"SKU-PRODUCTO {sku}", cantidad, "0",
+                    codigos_centro[idx_centro[i]], nombres_centro[idx_centro[i]],
+                    prov_por_sku[sku][0]
+                ]
+
+        nombre = f"Pedidos_{len(archivos) + 1:03d}.xlsx"
+        _escribir_xlsx(os.path.join(destino, "Ordenes", nombre), COLUMNAS_ORDENES, filas())
+        archivos.append(nombre)
+
+    print(f"✅ Scenario generated in {destino}: {lineas} lines in {len(archivos)} files, "
+          f"{len(filas_full)} Full.xlsx rows, {len(productos)} products, {len(agenda['proveedores'])} suppliers in agenda")
+    return {
+        "destino": destino, "lineas": lineas, "skus": skus, "proveedores": proveedores,
+        "centros": centros, "semilla": semilla, "archivos": archivos,
+    }
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Genera datos sintéticos de entrada para benchmarks")
+    parser.add_argument("destino", help="Carpeta a crear")
+    parser.add_argument("--lineas", type=int, default=10000, help="Líneas de pedido (default 10.000)")
+    parser.add_argument("--skus", type=int, default=2000, help="SKUs distintos (default 2.000)")
+    parser.add_argument("--proveedores", type=int, default=150, help="Proveedores distintos (default 150)")
+    parser.add_argument("--centros", type=int, default=60, help="Centros de costo (default 60)")
+    parser.add_argument("--semilla", type=int, default=0, help="Semilla aleatoria (default 0)")
+    args = parser.parse_args()
+
+    generar_escenario(args.destino, args.lineas, args.skus, args.proveedores, args.centros, args.semilla)
@@ -0,0 +1,180 @@
+"""
+Calendario de Feriados para el Cálculo de Fechas de Entrega
+Creado por Lucas Gnemmi
+Versión: 1.0
+
+Carga los feriados desde feriados.json (con excepciones por proveedor) y
+precalcula un índice diario de días hábiles para correr en O(1) una fecha de
+entrega que cae en feriado al día hábil anterior (Lunes a Sábado).
+
+Formato de feriados.json:
+{
+    "feriados": ["01-01-2026", "03-04-2026", ...],
+    "proveedores": {
+        "77300": {
+            "trabaja": ["21-05-2026"],      # Entrega aunque sea feriado
+            "no_trabaja": ["24-12-2026"]    # Días sin entrega solo para este proveedor
+        }
+    }
+}
+"""
+
+import os
+from datetime import datetime, timedelta
+from typing import Optional
+
+import numpy as np
+
+from almacenamiento import firma_archivo, leer_json
+
+
+ARCHIVO_FERIADOS_DEFAULT = "feriados.json"
+
+# Días extra a cada lado del índice para poder retroceder desde el primer feriado
+MARGEN_INDICE_DIAS = 14
+
+
+def _parsear_fechas(valores) -> set:
+    """Convierte una lista de fechas dd-mm-yyyy en un set de datetime64[D] (ignora las inválidas)"""
+    fechas = set()
+    for valor in valores or []:
+        try:
+            fechas.add(np.datetime64(datetime.strptime(str(valor).strip(), "%d-%m-%Y").date(), 'D'))
+        except ValueError:
+            continue
+    return fechas
+
+
+class CalendarioFeriados:
+    """Feriados generales y por proveedor con índice precalculado de días hábiles"""
+
+    def __init__(self, archivo: str = None):
+        """
+        Inicializa el calendario
+
+        Args:
+            archivo: Ruta a feriados.json (opcional, por defecto junto a este módulo)
+        """
+        if archivo is None:
+            base_dir = os.path.dirname(os.path.abspath(__file__))
+            archivo = os.path.join(base_dir, ARCHIVO_FERIADOS_DEFAULT)
+        self.archivo = archivo
+        self.version = 0
+        self.feriados = set()
+        self.excepciones = {}  # código -> {'trabaja': set, 'no_trabaja': set}
+        self._indices = {}  # código (None = general) -> arreglo de días a retroceder
+        self._origen = None
+        self._firma = None
+        self.cargar()
+
+    def cargar(self):
+        """Carga los feriados desde el archivo (sin archivo = sin feriados)"""
+        self._firma = firma_archivo(self.archivo)
+        data = {}
+        if self._firma is not None:
+            try:
+                data = leer_json(self.archivo)
+            except Exception as e:
+                print(f"⚠️ Error loading holidays from {self.archivo}: {e}")
+
+        self.feriados = _parsear_fechas(data.get('feriados'))
+        self.excepciones = {
+            str(codigo): {
+                'trabaja': _parsear_fechas(config.get('trabaja')),
+                'no_trabaja': _parsear_fechas(config.get('no_trabaja')),
+            }
+            for codigo, config in (data.get('proveedores') or {}).items()
+        }
+        self._construir_indices()
+        self.version += 1
+
+    def recargar_si_cambio(self) -> bool:
+        """
+        Recarga los feriados solo si el archivo cambió
+
+        Returns:
+            True si se recargaron
+        """
+        if firma_archivo(self.archivo) == self._firma:
+            return False
+        self.cargar()
+        return True
+
+    def _construir_indices(self):
+        """
+        Precalcula, para cada día del rango cubierto por los feriados, cuántos
+        días hay que retroceder hasta el día hábil anterior (0 si es hábil)
+        """
+        self._indices = {}
+        todas = set(self.feriados)
+        for excepcion in self.excepciones.values():
+            todas |= excepcion['trabaja'] | excepcion['no_trabaja']
+        if not todas:
+            self._origen = None
+            return
+
+        self._origen = min(todas) - np.timedelta64(MARGEN_INDICE_DIAS, 'D')
+        fin = max(todas) + np.timedelta64(MARGEN_INDICE_DIAS, 'D')
+        dias = np.arange(self._origen, fin + np.timedelta64(1, 'D'), dtype='datetime64[D]')
+        # 1970-01-01 fue jueves: domingo = 6
+        es_domingo = (dias.astype(np.int64) + 3) % 7 == 6
+
+        def indice(feriados):
+            es_feriado = np.isin(dias, np.array(sorted(feriados), dtype='datetime64[D]'))
+            posiciones = np.arange(len(dias))
+            # Último día hábil (Lunes a Sábado, no feriado) en o antes de cada día
+            ultimo_habil = np.maximum.accumulate(np.where(~es_feriado & ~es_domingo, posiciones, 0))
+            return np.where(es_feriado, posiciones - ultimo_habil, 0).astype(np.int16)
+
+        self._indices[None] = indice(self.feriados)
+        for codigo, excepcion in self.excepciones.items():
+            self._indices[codigo] = indice((self.feriados - excepcion['trabaja']) | excepcion['no_trabaja'])
+
+    def _indice_para(self, codigo: Optional[str]) -> Optional[np.ndarray]:
+        """Índice del proveedor (o el general si no tiene excepciones)"""
+        if self._origen is None:
+            return None
+        return self._indices.get(str(codigo) if codigo is not None else None, self._indices[None])
+
+    def tiene_excepciones(self, codigo: str) -> bool:
+        """Indica si el proveedor tiene feriados propios"""
+        return str(codigo) in self.excepciones
+
+    def ajustar(self, fecha: datetime, codigo: str = None) -> datetime:
+        """
+        Corre una fecha de entrega al día hábil anterior si cae en feriado
+
+        Args:
+            fecha: Fecha de entrega calculada
+            codigo: Código del proveedor (para aplicar sus excepciones)
+
+        Returns:
+            La misma fecha o el día hábil anterior
+        """
+        indice = self._indice_para(codigo)
+        if indice is None:
+            return fecha
+        posicion = int((np.datetime64(fecha, 'D') - self._origen).astype(np.int64))
+        if 0 <= posicion < len(indice) and indice[posicion]:
+            return fecha - timedelta(days=int(indice[posicion]))
+        return fecha
+
+    def ajustar_arreglo(self, fechas: np.ndarray, codigo: str = None) -> np.ndarray:
+        """
+        Versión vectorizada de ajustar() para un arreglo datetime64[D] (respeta NaT)
+
+        Args:
+            fechas: Arreglo de fechas de entrega (cualquier forma)
+            codigo: Código del proveedor (para aplicar sus excepciones)
+
+        Returns:
+            Nuevo arreglo con las fechas ajustadas
+        """
+        indice = self._indice_para(codigo)
+        if indice is None:
+            return fechas
+        posiciones = (fechas - self._origen).astype(np.int64)
+        en_rango = ~np.isnat(fechas) & (posiciones >= 0) & (posiciones < len(indice))
+        ajustadas = fechas.copy()
+        ajustadas[en_rango] -= indice[posiciones[en_rango]].astype('timedelta64[D]')
+        return ajustadas
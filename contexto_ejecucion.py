@@ -0,0 +1,165 @@
+"""
+Contexto de Ejecución - Registro de Gestores
+Creado por Lucas Gnemmi
+Versión: 1.0
+
+Mantiene una sola instancia de ProductsManager, RulesManager y AgendaManager
+por proceso (invalidada cuando el archivo cambia en disco) y la reparte entre
+todos los pasos de una ejecución, para que cada archivo de referencia se lea
+una única vez por corrida.
+"""
+
+import os
+import threading
+
+from almacenamiento import firma_archivo as _firma_archivo, resolver_ruta_almacen
+
+
+# Registro a nivel de proceso: (clase, ruta absoluta) -> (firma del archivo, firma de auxiliares, instancia)
+_registro = {}
+_registro_lock = threading.Lock()
+
+
+def _ruta_por_defecto(clase):
+    """Ruta que usaría el gestor si se construye sin argumentos"""
+    nombre = clase.__name__
+    if nombre == "ProductsManager":
+        return os.path.abspath(resolver_ruta_almacen("products.json"))
+    if nombre == "RulesManager":
+        return os.path.abspath(resolver_ruta_almacen("rules.json"))
+    if nombre == "AgendaManager":
+        base_dir = os.path.dirname(os.path.abspath(__file__))
+        return resolver_ruta_almacen(os.path.join(base_dir, "agenda_config.json"))
+    raise ValueError(f"Gestor no soportado: {nombre}")
+
+
+def _firma_auxiliares(instancia):
+    """Firma de los archivos que el gestor lee además del suyo (feriados.json de la agenda)"""
+    archivo = getattr(getattr(instancia, "feriados", None), "archivo", None)
+    return _firma_archivo(archivo) if archivo else None
+
+
+def obtener_manager(clase, archivo=None):
+    """
+    Obtiene la instancia compartida de un gestor para un archivo
+
+    Si el archivo no cambió desde la última carga (mismo mtime y tamaño)
+    se reutiliza la instancia existente; si cambió, se construye una nueva.
+    Para la agenda también se compara el archivo de feriados.
+
+    Args:
+        clase: ProductsManager, RulesManager o AgendaManager
+        archivo: Ruta del archivo JSON o base SQLite (opcional, usa la ruta por defecto del gestor)
+
+    Returns:
+        Instancia del gestor
+    """
+    ruta = os.path.abspath(archivo) if archivo else _ruta_por_defecto(clase)
+    clave = (clase, ruta)
+
+    with _registro_lock:
+        firma_actual = _firma_archivo(ruta)
+        entrada = _registro.get(clave)
+        if (entrada is not None and firma_actual is not None and entrada[0] == firma_actual
+                and entrada[1] == _firma_auxiliares(entrada[2])):
+            return entrada[2]
+
+        instancia = clase(ruta)
+        # Releer la firma: el gestor puede haber creado el archivo por defecto
+        _registro[clave] = (_firma_archivo(ruta), _firma_auxiliares(instancia), instancia)
+        return instancia
+
+
+def limpiar_registro():
+    """Descarta todas las instancias compartidas (fuerza recarga en el próximo uso)"""
+    with _registro_lock:
+        _registro.clear()
+
+
+class ContextoEjecucion:
+    """
+    Gestores de referencia de una corrida del procesamiento
+
+    Cada gestor se resuelve una sola vez (al primer uso) desde el registro
+    del proceso y queda fijo durante toda la corrida, de modo que todos los
+    pasos trabajan sobre los mismos datos aunque el archivo cambie a mitad
+    de la ejecución.
+    """
+
+    def __init__(self, products_file=None, rules_file=None, agenda_file=None):
+        """
+        Inicializa el contexto
+
+        Args:
+            products_file: Ruta a products.json (opcional)
+            rules_file: Ruta a rules.json (opcional)
+            agenda_file: Ruta a agenda_config.json (opcional)
+        """
+        self.products_file = products_file
+        self.rules_file = rules_file
+        self.agenda_file = agenda_file
+        self._products_manager = None
+        self._rules_manager = None
+        self._agenda_manager = None
+
+    @classmethod
+    def desde_carpeta(cls, base_dir, products_file=None, rules_file=None, agenda_file=None):
+        """
+        Contexto que lee los archivos de referencia de una carpeta del sistema
+
+        Usa products.json, rules.json y agenda_config.json (o la base SQLite)
+        de base_dir; los que no estén en la carpeta quedan con la ruta por
+        defecto del gestor. Las rutas explícitas tienen prioridad.
+
+        Args:
+            base_dir: Carpeta del sistema (la de Ordenes/ y Full-Agenda/)
+            products_file, rules_file, agenda_file: Rutas explícitas (opcionales)
+        """
+        def en_carpeta(nombre):
+            ruta = resolver_ruta_almacen(os.path.join(os.path.abspath(base_dir), nombre))
+            return ruta if os.path.exists(ruta) else None
+
+        return cls(
+            products_file=products_file or en_carpeta("products.json"),
+            rules_file=rules_file or en_carpeta("rules.json"),
+            agenda_file=agenda_file or en_carpeta("agenda_config.json"),
+        )
+
+    @property
+    def products_manager(self):
+        """ProductsManager compartido de esta corrida"""
+        if self._products_manager is None:
+            from products_manager import ProductsManager
+            self._products_manager = obtener_manager(ProductsManager, self.products_file)
+        return self._products_manager
+
+    @property
+    def rules_manager(self):
+        """RulesManager compartido de esta corrida"""
+        if self._rules_manager is None:
+            from rules_manager import RulesManager
+            self._rules_manager = obtener_manager(RulesManager, self.rules_file)
+        return self._rules_manager
+
+    @property
+    def agenda_manager(self):
+        """AgendaManager compartido de esta corrida"""
+        if self._agenda_manager is None:
+            from agenda_manager import AgendaManager
+            self._agenda_manager = obtener_manager(AgendaManager, self.agenda_file)
+        return self._agenda_manager
+
+    def cargar(self):
+        """
+        Resuelve los tres gestores de una vez (productos, reglas y agenda)
+
+        Sirve para leer los archivos de referencia antes de la primera corrida
+        (servicio, benchmarks) en lugar de hacerlo al primer uso.
+
+        Returns:
+            El mismo contexto
+        """
+        self.products_manager
+        self.rules_manager
+        self.agenda_manager
+        return self
@@ -0,0 +1,359 @@
+"""
+Diferencias entre Corridas del Procesamiento
+Creado por Lucas Gnemmi
+Versión: 1.0
+
+Después de corregir agenda, reglas o productos se vuelve a procesar y hay
+que revisar qué cambió respecto de la salida anterior. En lugar de comparar
+los Excel a ojo (o volver a leerlos), cada corrida guardada deja en
+Salidas/corridas/ sus DataFrames de PEDIDOS_CD y Errors tal como quedaron en
+memoria (pickle de pandas, columnar y con las categóricas), y este módulo
+compara cada corrida con la anterior del mismo archivo de salida (o, si no
+hay, con la anterior de la misma región) por (PROVEEDOR, SKU, OBSERVACION):
+
+- Líneas nuevas, quitadas y con otra cantidad en PEDIDOS_CD
+- Errores resueltos (estaban en la corrida anterior y ya no) y nuevos
+
+El resultado se escribe en un Excel chico con una sola hoja "Diferencias"
+(Salidas/Diferencias_<archivo de salida>.xlsx).
+
+Uso:
+    python diferencias_corridas.py                       # Última corrida de Salidas/corridas/ y su anterior
+    python diferencias_corridas.py anterior.pkl nueva.pkl --salida Diferencias.xlsx
+"""
+
+import os
+from datetime import datetime
+
+import pandas as pd
+from openpyxl.styles import Font, PatternFill, Alignment
+
+from errores_pedidos import COLUMNA_ETAPA_ERROR, COLUMNA_MOTIVO_ERROR, COLUMNA_PROVEEDOR_ERROR
+from esquema_pedidos import como_texto
+from resumen_errores import ETIQUETAS_MOTIVO
+from trazas import trazado
+
+
+CARPETA_CORRIDAS = "corridas"
+PREFIJO_CORRIDA = "corrida_"
+EXTENSION_CORRIDA = ".pkl"
+
+# Artefactos que se conservan (los más viejos se borran)
+MAX_CORRIDAS = 30
+
+CLAVE_DIFERENCIAS = ["PROVEEDOR", "SKU", "OBSERVACION"]
+HOJA_DIFERENCIAS = "Diferencias"
+
+# Columnas internas que se guardan con los errores (el motivo se muestra en la hoja)
+COLUMNAS_ERROR = [COLUMNA_ETAPA_ERROR, COLUMNA_MOTIVO_ERROR, COLUMNA_PROVEEDOR_ERROR]
+
+# Tipos de cambio, en el orden de la hoja
+LINEA_NUEVA = "Línea nueva"
+LINEA_QUITADA = "Línea quitada"
+CANTIDAD_CAMBIADA = "Cantidad cambiada"
+ERROR_RESUELTO = "Error resuelto"
+ERROR_NUEVO = "Error nuevo"
+
+COLORES_CAMBIO = {
+    LINEA_NUEVA: "d4edda",
+    LINEA_QUITADA: "f8d7da",
+    CANTIDAD_CAMBIADA: "fff3cd",
+    ERROR_RESUELTO: "d1ecf1",
+    ERROR_NUEVO: "f5c6cb",
+}
+
+COLUMNAS_HOJA = ["CAMBIO"] + CLAVE_DIFERENCIAS + [
+    "CANTIDAD_ANTES", "CANTIDAD_AHORA", "DIFERENCIA", "LINEAS_ANTES", "LINEAS_AHORA", "MOTIVO"
+]
+
+SIN_DATO = "-"
+
+# Tolerancia para considerar distintas dos cantidades (sumas de float)
+TOLERANCIA = 1e-9
+
+
+# --- Artefactos de corrida ---
+
+def carpeta_corridas(archivo_salida):
+    """Carpeta de artefactos para un archivo de salida (Salidas/corridas/)"""
+    return os.path.join(os.path.dirname(os.path.abspath(archivo_salida)), CARPETA_CORRIDAS)
+
+
+def _columnas_artefacto(df, internas=()):
+    return [c for c in df.columns if not str(c).startswith("_") or c in internas]
+
+
+def guardar_corrida(df_final, df_errores, archivo_salida, region=None, carpeta=None):
+    """
+    Guarda los DataFrames de una corrida para compararla después
+
+    Args:
+        df_final: Pedidos consolidados (PEDIDOS_CD)
+        df_errores: Registros con errores (Errors)
+        archivo_salida: Excel de salida de la corrida (se guarda como referencia)
+        region: Región de Full.xlsx de la corrida
+        carpeta: Carpeta de artefactos (default Salidas/corridas/ junto al Excel)
+
+    Returns:
+        Ruta del artefacto
+    """
+    carpeta = carpeta or carpeta_corridas(archivo_salida)
+    os.makedirs(carpeta, exist_ok=True)
+    fecha = datetime.now()
+    ruta = os.path.join(carpeta, f"{PREFIJO_CORRIDA}{fecha.strftime('%Y%m%d_%H%M%S_%f')}{EXTENSION_CORRIDA}")
+    pd.to_pickle({
+        "fecha": fecha,
+        "archivo_salida": os.path.abspath(archivo_salida),
+        "region": None if region is None else str(region),
+        "pedidos": df_final[_columnas_artefacto(df_final)],
+        "errores": df_errores[_columnas_artefacto(df_errores, COLUMNAS_ERROR)],
+    }, ruta)
+
+    for vieja in listar_corridas(carpeta)[:-MAX_CORRIDAS]:
+        try:
+            os.remove(vieja)
+        except OSError:
+            pass
+    return ruta
+
+
+def listar_corridas(carpeta):
+    """Artefactos de una carpeta, del más viejo al más nuevo"""
+    if not os.path.isdir(carpeta):
+        return []
+    return [os.path.join(carpeta, f) for f in sorted(os.listdir(carpeta))
+            if f.startswith(PREFIJO_CORRIDA) and f.endswith(EXTENSION_CORRIDA)]
+
+
+def cargar_corrida(ruta):
+    """Dict con fecha, archivo_salida, region, pedidos y errores de un artefacto"""
+    return pd.read_pickle(ruta)
+
+
+def corrida_anterior(ruta, corrida=None):
+    """
+    Artefacto anterior comparable con el de ruta, o None
+
+    Se busca hacia atrás el último del mismo archivo de salida; si no hay,
+    el último de la misma región. Las corridas de otro archivo y otra región
+    (otro pedido del servicio, otra región en la interfaz) no se comparan.
+
+    Args:
+        ruta: Artefacto de la corrida nueva
+        corrida: Su contenido ya cargado (opcional, evita releerlo)
+    """
+    corrida = corrida if corrida is not None else cargar_corrida(ruta)
+    archivo, region = corrida.get("archivo_salida"), corrida.get("region")
+    misma_region = None
+    anteriores = [r for r in listar_corridas(os.path.dirname(ruta))
+                  if os.path.basename(r) < os.path.basename(ruta)]
+    for candidata in reversed(anteriores):
+        try:
+            datos = cargar_corrida(candidata)
+        except Exception:
+            continue
+        if archivo is not None and datos.get("archivo_salida") == archivo:
+            return candidata
+        if misma_region is None and region is not None and datos.get("region") == region:
+            misma_region = candidata
+    return misma_region
+
+
+# --- Comparación ---
+
+def _totales_por_clave(df):
+    """Líneas, cantidad total y motivo (errores) por PROVEEDOR, SKU, OBSERVACION"""
+    datos = {col: como_texto(df[col]).fillna(SIN_DATO).astype(str) if col in df.columns
+             else pd.Series(SIN_DATO, index=df.index) for col in CLAVE_DIFERENCIAS}
+    datos["CANTIDAD"] = pd.to_numeric(df["CANTIDAD"].astype(object), errors="coerce").fillna(0) \
+        if "CANTIDAD" in df.columns else pd.Series(0.0, index=df.index)
+    if COLUMNA_MOTIVO_ERROR in df.columns:
+        datos["MOTIVO"] = como_texto(df[COLUMNA_MOTIVO_ERROR]).map(ETIQUETAS_MOTIVO).fillna(SIN_DATO)
+    base = pd.DataFrame(datos, index=df.index)
+    agregados = {"LINEAS": ("CANTIDAD", "size"), "CANTIDAD": ("CANTIDAD", "sum")}
+    if "MOTIVO" in base.columns:
+        agregados["MOTIVO"] = ("MOTIVO", "first")
+    return base.groupby(CLAVE_DIFERENCIAS, sort=False).agg(**agregados).reset_index()
+
+
+def _cruzar(antes, ahora):
+    """Outer join por clave con columnas _ANTES / _AHORA y el origen de cada clave"""
+    return _totales_por_clave(antes).merge(
+        _totales_por_clave(ahora), on=CLAVE_DIFERENCIAS, how="outer",
+        suffixes=("_ANTES", "_AHORA"), indicator="ORIGEN", sort=True,
+    )
+
+
+@trazado("diferencias", "etapa")
+def diferenciar_corridas(anterior, nueva):
+    """
+    Compara dos corridas por (PROVEEDOR, SKU, OBSERVACION)
+
+    Args:
+        anterior, nueva: Dicts de cargar_corrida (o rutas de artefactos)
+
+    Returns:
+        Dict de DataFrames 'agregadas', 'quitadas', 'cambiadas' (PEDIDOS_CD)
+        y 'errores_resueltos', 'errores_nuevos' (Errors), con la clave y
+        CANTIDAD/LINEAS _ANTES y _AHORA
+    """
+    if isinstance(anterior, str):
+        anterior = cargar_corrida(anterior)
+    if isinstance(nueva, str):
+        nueva = cargar_corrida(nueva)
+
+    pedidos = _cruzar(anterior["pedidos"], nueva["pedidos"])
+    ambos = pedidos["ORIGEN"] == "both"
+    distinta = (pedidos["CANTIDAD_AHORA"] - pedidos["CANTIDAD_ANTES"]).abs() > TOLERANCIA
+    errores = _cruzar(anterior["errores"], nueva["errores"])
+
+    return {
+        "agregadas": pedidos[pedidos["ORIGEN"] == "right_only"],
+        "quitadas": pedidos[pedidos["ORIGEN"] == "left_only"],
+        "cambiadas": pedidos[ambos & distinta],
+        "errores_resueltos": errores[errores["ORIGEN"] == "left_only"],
+        "errores_nuevos": errores[errores["ORIGEN"] == "right_only"],
+    }
+
+
+def tabla_diferencias(diferencias):
+    """Una sola tabla con todos los cambios (columnas de COLUMNAS_HOJA)"""
+    partes = []
+    for clave, cambio in (("agregadas", LINEA_NUEVA), ("quitadas", LINEA_QUITADA), ("cambiadas", CANTIDAD_CAMBIADA),
+                          ("errores_resueltos", ERROR_RESUELTO), ("errores_nuevos", ERROR_NUEVO)):
+        df = diferencias[clave]
+        if df.empty:
+            continue
+        tabla = df.reindex(columns=COLUMNAS_HOJA)
+        tabla["CAMBIO"] = cambio
+        tabla["DIFERENCIA"] = df["CANTIDAD_AHORA"].fillna(0) - df["CANTIDAD_ANTES"].fillna(0)
+        if "MOTIVO_AHORA" in df.columns:
+            tabla["MOTIVO"] = df["MOTIVO_AHORA"].fillna(df["MOTIVO_ANTES"])
+        partes.append(tabla)
+    if not partes:
+        return pd.DataFrame(columns=COLUMNAS_HOJA)
+    return pd.concat(partes, ignore_index=True)
+
+
+def resumen_diferencias(diferencias):
+    """Líneas de texto para el log"""
+    n = {clave: len(df) for clave, df in diferencias.items()}
+    if not any(n.values()):
+        return ["🔁 No changes since the previous run"]
+    return [
+        "🔁 Changes since the previous run:",
+        f"   • Lines added: {n['agregadas']}, removed: {n['quitadas']}, quantity changed: {n['cambiadas']}",
+        f"   • Errors resolved: {n['errores_resueltos']}, new: {n['errores_nuevos']}",
+    ]
+
+
+@trazado("escribir_diferencias", "escritura")
+def escribir_diferencias(diferencias, ruta, anterior=None, nueva=None):
+    """
+    Escribe la hoja Diferencias (una fila por cambio, coloreada por tipo)
+
+    Args:
+        diferencias: Resultado de diferenciar_corridas
+        ruta: Excel a crear
+        anterior, nueva: Dicts de las corridas (para el título con sus fechas)
+
+    Returns:
+        ruta
+    """
+    tabla = tabla_diferencias(diferencias)
+    with pd.ExcelWriter(ruta, engine="openpyxl") as writer:
+        tabla.to_excel(writer, sheet_name=HOJA_DIFERENCIAS, index=False, startrow=2)
+        hoja = writer.sheets[HOJA_DIFERENCIAS]
+
+        titulo = "Diferencias entre corridas"
+        if anterior is not None and nueva is not None:
+            titulo += f": {anterior['fecha']:%d-%m-%Y %H:%M:%S} → {nueva['fecha']:%d-%m-%Y %H:%M:%S}"
+        hoja["A1"] = titulo
+        hoja["A1"].font = Font(bold=True, size=13, color="2c3e50")
+        n = {clave: len(df) for clave, df in diferencias.items()}
+        hoja["A2"] = (f"Líneas nuevas: {n['agregadas']} | quitadas: {n['quitadas']} | "
+                      f"con otra cantidad: {n['cambiadas']} | errores resueltos: {n['errores_resueltos']} | "
+                      f"errores nuevos: {n['errores_nuevos']}")
+
+        encabezado = PatternFill("solid", fgColor="2c3e50")
+        for celda in hoja[3]:
+            celda.font = Font(bold=True, color="ffffff")
+            celda.fill = encabezado
+            celda.alignment = Alignment(horizontal="center")
+
+        # Color por tipo de cambio (columna A)
+        rellenos = {cambio: PatternFill("solid", fgColor=color) for cambio, color in COLORES_CAMBIO.items()}
+        for (celda,) in hoja.iter_rows(min_row=4, max_col=1):
+            if celda.value in rellenos:
+                celda.fill = rellenos[celda.value]
+
+        anchos = {"A": 18, "B": 12, "C": 12, "D": 60, "E": 15, "F": 15, "G": 13, "H": 13, "I": 13, "J": 40}
+        for columna, ancho in anchos.items():
+            hoja.column_dimensions[columna].width = ancho
+        hoja.freeze_panes = "A4"
+        if not tabla.empty:
+            hoja.auto_filter.ref = f"A3:J{len(tabla) + 3}"
+    return ruta
+
+
+def registrar_corrida(df_final, df_errores, archivo_salida, region=None, log=print):
+    """
+    Guarda el artefacto de la corrida y, si hay una anterior comparable (ver
+    corrida_anterior), escribe sus diferencias en
+    Salidas/Diferencias_<archivo de salida>.xlsx
+
+    Nunca hace fallar la corrida: los problemas se informan en el log.
+
+    Returns:
+        Dict con 'corrida' y 'diferencias' (rutas, None si no se escribieron)
+    """
+    archivos = {"corrida": None, "diferencias": None}
+    try:
+        archivos["corrida"] = guardar_corrida(df_final, df_errores, archivo_salida, region)
+        nueva = cargar_corrida(archivos["corrida"])
+        ruta_anterior = corrida_anterior(archivos["corrida"], nueva)
+        if ruta_anterior is None:
+            return archivos
+        anterior = cargar_corrida(ruta_anterior)
+        diferencias = diferenciar_corridas(anterior, nueva)
+        for linea in resumen_diferencias(diferencias):
+            log(linea)
+        nombre = os.path.splitext(os.path.basename(archivo_salida))[0]
+        archivos["diferencias"] = escribir_diferencias(
+            diferencias, os.path.join(os.path.dirname(os.path.abspath(archivo_salida)), f"Diferencias_{nombre}.xlsx"),
+            anterior, nueva,
+        )
+    except Exception as e:
+        # p. ej. el Excel de diferencias está abierto o el artefacto anterior es de otra versión de pandas
+        log(f"⚠️ Could not compare with the previous run: {e}")
+    return archivos
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Compara dos corridas guardadas en Salidas/corridas/")
+    parser.add_argument("corridas", nargs="*",
+                        help="Artefactos anterior y nuevo (default: el último y su anterior comparable)")
+    parser.add_argument("--carpeta", default=None, help="Carpeta de artefactos (default Salidas/corridas)")
+    parser.add_argument("--salida", default=None, help="Excel de diferencias a escribir")
+    args = parser.parse_args()
+
+    if args.corridas and len(args.corridas) != 2:
+        parser.error("indicar dos artefactos (anterior y nuevo) o ninguno")
+    rutas = args.corridas
+    if not rutas:
+        ultimas = listar_corridas(
+            args.carpeta or os.path.join(os.path.dirname(os.path.abspath(__file__)), "Salidas", CARPETA_CORRIDAS)
+        )[-1:]
+        rutas = [corrida_anterior(ultimas[0]), ultimas[0]] if ultimas else []
+    if len(rutas) < 2 or rutas[0] is None:
+        print("⚠️ At least two stored runs are needed to compare")
+        raise SystemExit(1)
+
+    anterior, nueva = cargar_corrida(rutas[0]), cargar_corrida(rutas[1])
+    diferencias = diferenciar_corridas(anterior, nueva)
+    for linea in resumen_diferencias(diferencias):
+        print(linea)
+    if args.salida:
+        print(f"📁 {escribir_diferencias(diferencias, args.salida, anterior, nueva)}")
@@ -0,0 +1,139 @@
+"""
+Modelo de Errores de las Líneas de Pedido
+Creado por Lucas Gnemmi
+Versión: 1.0
+
+Cada línea que falla en el procesamiento guarda su error en columnas
+categóricas (etapa, código de motivo y proveedor involucrado) junto con el
+archivo y la fila de origen. El texto de OBSERVACION que se ve en la hoja
+Errors ("CENTRO//No tiene Precio//LUGAR") recién se arma al exportar, con
+renderizar_observacion().
+"""
+
+from string import Formatter
+
+import pandas as pd
+
+from esquema_pedidos import asignar, como_texto, columna_vacia, mapear_texto
+from trazas import trazado
+
+
+COLUMNA_ETAPA_ERROR = "_ETAPA_ERROR"
+COLUMNA_MOTIVO_ERROR = "_MOTIVO_ERROR"
+COLUMNA_PROVEEDOR_ERROR = "_PROVEEDOR_ERROR"
+COLUMNA_FILA_ORIGEN = "_SRC_ROW"
+
+# Orden en que se reportan los errores (mismo orden que la hoja Errors histórica)
+ETAPAS_ERROR = ("items", "proveedor", "agenda")
+
+# Código de motivo -> (etapa, texto). El texto puede usar {proveedor} y {sku}
+MOTIVOS_ERROR = {
+    "FALTA_PRODUCTO": ("items", "Falta Producto en Maestra C.Calzada"),
+    "SIN_PRECIO": ("proveedor", "No tiene Precio"),
+    "REGLA_NO_EN_FULL": ("proveedor", "REGLA ESPECIAL NO CUMPLIDA: Proveedor {proveedor} no existe en Full.xlsx para SKU {sku}"),
+    "BLOQUEO_STOCK": ("proveedor", "Bloqueado por Quiebre de Stock"),
+    "FALTA_AGENDA": ("agenda", "Falta Agenda"),
+    "REGLA_SIN_AGENDA": ("agenda", "REGLA ESPECIAL NO CUMPLIDA: Proveedor {proveedor} no está configurado en Agenda"),
+    "SIN_PROVEEDOR": ("agenda", "Sin código de proveedor"),
+    "ERROR_AGENDA": ("agenda", "Error en sistema de agenda"),
+}
+
+# Motivos cuya OBSERVACION no lleva centro de costo ni lugar
+MOTIVOS_SIN_LUGAR = {"SIN_PROVEEDOR", "ERROR_AGENDA"}
+
+
+def agregar_columnas_error(df):
+    """Agrega (en el lugar) las columnas de error vacías que falten"""
+    n = len(df)
+    if COLUMNA_ETAPA_ERROR not in df.columns:
+        df[COLUMNA_ETAPA_ERROR] = columna_vacia(n, ETAPAS_ERROR)
+    if COLUMNA_MOTIVO_ERROR not in df.columns:
+        df[COLUMNA_MOTIVO_ERROR] = columna_vacia(n, MOTIVOS_ERROR)
+    if COLUMNA_PROVEEDOR_ERROR not in df.columns:
+        df[COLUMNA_PROVEEDOR_ERROR] = columna_vacia(n)
+    return df
+
+
+def filas_validas(df):
+    """Máscara de las filas que no fallaron en ninguna etapa"""
+    if COLUMNA_ETAPA_ERROR not in df.columns:
+        return pd.Series(True, index=df.index)
+    return df[COLUMNA_ETAPA_ERROR].isna()
+
+
+def marcar_error(df, filas, motivo, proveedor=None):
+    """
+    Marca filas como error (en el lugar)
+
+    Args:
+        df: DataFrame del flujo (con las columnas de agregar_columnas_error)
+        filas: Índices (etiquetas) de las filas
+        motivo: Código de MOTIVOS_ERROR
+        proveedor: Proveedor involucrado (escalar o Series alineada), opcional
+    """
+    if len(filas) == 0:
+        return
+    df.loc[filas, COLUMNA_ETAPA_ERROR] = MOTIVOS_ERROR[motivo][0]
+    df.loc[filas, COLUMNA_MOTIVO_ERROR] = motivo
+    if proveedor is not None:
+        asignar(df, filas, COLUMNA_PROVEEDOR_ERROR, proveedor)
+
+
+def _texto_motivo(plantilla, df_motivo):
+    """Arma el texto de un motivo reemplazando {proveedor} y {sku} por columna"""
+    texto = pd.Series("", index=df_motivo.index, dtype=object)
+    for literal, campo, _, _ in Formatter().parse(plantilla):
+        texto = texto + literal
+        if campo == "proveedor":
+            texto = texto + mapear_texto(df_motivo[COLUMNA_PROVEEDOR_ERROR], str)
+        elif campo == "sku":
+            texto = texto + mapear_texto(df_motivo["SKU"], lambda sku: str(sku).strip().upper())
+    return texto
+
+
+def renderizar_observacion(df_err):
+    """
+    Arma el texto histórico de OBSERVACION de las filas con error
+
+    Args:
+        df_err: Filas con error (con _MOTIVO_ERROR, CENTRO_COSTO y NOMBRE_LUGAR)
+
+    Returns:
+        Series de texto con el mismo índice
+    """
+    observacion = pd.Series("", index=df_err.index, dtype=object)
+    motivos = df_err[COLUMNA_MOTIVO_ERROR]
+    for motivo in motivos.dropna().unique():
+        etapa, plantilla = MOTIVOS_ERROR[motivo]
+        df_motivo = df_err.loc[(motivos == motivo).to_numpy()]
+        texto = "//" + _texto_motivo(plantilla, df_motivo) + "//"
+        if motivo not in MOTIVOS_SIN_LUGAR:
+            centro = como_texto(df_motivo["CENTRO_COSTO"]).fillna("").astype(str)
+            lugar = como_texto(df_motivo["NOMBRE_LUGAR"]).fillna("").astype(str)
+            if etapa == "agenda":
+                centro, lugar = centro.str.strip(), lugar.str.strip()
+            texto = centro + texto + lugar
+        observacion[df_motivo.index] = texto
+    return observacion
+
+
+@trazado("separar_errores")
+def separar_errores(df, renderizar=True):
+    """
+    Filas con error ordenadas por etapa, con OBSERVACION armada para exportar
+
+    Args:
+        df: DataFrame del flujo (uno o varios lotes concatenados)
+        renderizar: Si True, escribe en OBSERVACION el texto histórico del error
+
+    Returns:
+        DataFrame con una fila por error (conserva las columnas estructuradas)
+    """
+    df_err = df.loc[~filas_validas(df)]
+    if COLUMNA_ETAPA_ERROR in df_err.columns:
+        orden = pd.Categorical(df_err[COLUMNA_ETAPA_ERROR], categories=ETAPAS_ERROR, ordered=True).codes
+        df_err = df_err.iloc[orden.argsort(kind="stable")]
+    df_err = df_err.reset_index(drop=True)
+    if renderizar and COLUMNA_MOTIVO_ERROR in df_err.columns:
+        df_err["OBSERVACION"] = renderizar_observacion(df_err)
+    return df_err
@@ -0,0 +1,168 @@
+"""
+Escritores de Salida del Procesamiento
+Creado por Lucas Gnemmi
+Versión: 1.0
+
+Cada formato de salida es una función escritor(df_final, df_errores, ruta_base)
+registrada en ESCRITORES:
+
+- xlsx: el Excel de siempre (PEDIDOS_CD, Errors y resumen de errores) con formato
+- csv: PEDIDOS_CD para la carga en el ERP (orden de columnas y codificación fijos)
+- parquet: PEDIDOS_CD y errores con esquema fijo para análisis (requiere pyarrow)
+
+guardar_salidas() ejecuta los formatos pedidos; el XLSX es el más lento de
+escribir y se puede omitir en corridas automáticas.
+"""
+
+import os
+
+import pandas as pd
+
+from procesamiento_v2 import formatear_excel_salida
+from resumen_errores import escribir_resumen_errores
+from trazas import trazado
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+
+
+FORMATOS_DEFAULT = ("xlsx",)
+
+# Las columnas de uso interno (_REGLA_ESPECIAL, _SRC_FILE, columnas de error, ...)
+# empiezan con este prefijo y no van al Excel de salida
+PREFIJO_INTERNO = '_'
+
+# Formato de carga del ERP
+COLUMNAS_ERP = ["ID PEDIDO", "LOCAL", "PROVEEDOR", "FECHA_ENTREGA", "SKU", "CANTIDAD", "OBSERVACION"]
+CSV_SEPARADOR = ";"
+CSV_CODIFICACION = "utf-8-sig"
+
+
+def _columnas_visibles(df):
+    return [c for c in df.columns if not str(c).startswith(PREFIJO_INTERNO)]
+
+
+@trazado("escribir_xlsx", "escritura")
+def guardar_resultados(df_final, df_errores, archivo_salida):
+    """
+    Escribe las hojas PEDIDOS_CD y Errors (sin columnas internas), el resumen
+    de errores (ver resumen_errores.py) y aplica el formato
+
+    Args:
+        df_final: Pedidos consolidados
+        df_errores: Registros con errores
+        archivo_salida: Ruta del Excel a crear
+    """
+    with pd.ExcelWriter(archivo_salida, engine="openpyxl") as writer:
+        df_final.to_excel(writer, sheet_name="PEDIDOS_CD", index=False, columns=_columnas_visibles(df_final))
+        if not df_errores.empty:
+            df_errores.to_excel(writer, sheet_name="Errors", index=False, columns=_columnas_visibles(df_errores))
+            escribir_resumen_errores(writer, df_errores)
+
+    formatear_excel_salida(archivo_salida)
+    print(f"✅ File saved: {os.path.basename(archivo_salida)}")
+
+
+def escribir_xlsx(df_final, df_errores, ruta_base):
+    """Excel con formato (guardar_resultados)"""
+    archivo = ruta_base + ".xlsx"
+    guardar_resultados(df_final, df_errores, archivo)
+    return archivo
+
+
+@trazado("escribir_csv", "escritura")
+def escribir_csv(df_final, df_errores, ruta_base):
+    """PEDIDOS_CD en CSV con el orden de columnas y la codificación del ERP"""
+    archivo = ruta_base + ".csv"
+    df_final.to_csv(archivo, sep=CSV_SEPARADOR, encoding=CSV_CODIFICACION, index=False,
+                    columns=COLUMNAS_ERP, float_format="%.15g")
+    print(f"✅ File saved: {os.path.basename(archivo)}")
+    return archivo
+
+
+# Esquema fijo de los Parquet (las categóricas se escriben como texto)
+ESQUEMA_PEDIDOS = {
+    "ID PEDIDO": "int64",
+    "LOCAL": "string",
+    "PROVEEDOR": "string",
+    "FECHA_ENTREGA": "string",
+    "SKU": "string",
+    "CANTIDAD": "float64",
+    "OBSERVACION": "string",
+}
+
+ESQUEMA_ERRORES = {
+    "LOCAL": "string",
+    "SKU": "string",
+    "CANTIDAD": "float64",
+    "CENTRO_COSTO": "string",
+    "NOMBRE_LUGAR": "string",
+    "PROVEEDOR": "string",
+    "OBSERVACION": "string",
+    "_ETAPA_ERROR": "string",
+    "_MOTIVO_ERROR": "string",
+    "_PROVEEDOR_ERROR": "string",
+    "_SRC_FILE": "string",
+    "_SRC_ROW": "Int32",
+}
+
+
+def _tabla_parquet(df, esquema):
+    """DataFrame con exactamente las columnas y tipos del esquema (faltantes vacías)"""
+    datos = {}
+    for col, tipo in esquema.items():
+        serie = df[col] if col in df.columns else pd.Series(pd.NA, index=df.index)
+        if tipo == "string":
+            serie = serie.astype(object).where(serie.notna(), None).astype("string")
+        elif tipo in ("float64", "Int32"):
+            serie = pd.to_numeric(serie.astype(object), errors="coerce").astype(tipo)
+        else:
+            serie = serie.astype(tipo)
+        datos[col] = serie
+    return pa.Table.from_pandas(pd.DataFrame(datos), preserve_index=False)
+
+
+@trazado("escribir_parquet", "escritura")
+def escribir_parquet(df_final, df_errores, ruta_base):
+    """PEDIDOS_CD (y los errores, si hay) en Parquet con esquema fijo"""
+    if pa is None:
+        print("⚠️ pyarrow is not installed, Parquet output skipped (pip install pyarrow)")
+        return None
+    archivo = ruta_base + ".parquet"
+    pq.write_table(_tabla_parquet(df_final, ESQUEMA_PEDIDOS), archivo)
+    if not df_errores.empty:
+        pq.write_table(_tabla_parquet(df_errores, ESQUEMA_ERRORES), ruta_base + "_errores.parquet")
+    print(f"✅ File saved: {os.path.basename(archivo)}")
+    return archivo
+
+
+ESCRITORES = {
+    "xlsx": escribir_xlsx,
+    "csv": escribir_csv,
+    "parquet": escribir_parquet,
+}
+
+
+def guardar_salidas(df_final, df_errores, archivo_salida, formatos=FORMATOS_DEFAULT):
+    """
+    Escribe el resultado en los formatos pedidos
+
+    Args:
+        df_final: Pedidos consolidados
+        df_errores: Registros con errores
+        archivo_salida: Ruta del Excel de salida; los demás formatos usan el
+            mismo nombre con su extensión
+        formatos: Claves de ESCRITORES (p. ej. ("csv", "parquet"))
+
+    Returns:
+        Dict formato -> ruta del archivo escrito (None si se omitió)
+    """
+    desconocidos = [f for f in formatos if f not in ESCRITORES]
+    if desconocidos:
+        raise ValueError(f"Formato de salida no soportado: {', '.join(desconocidos)} "
+                         f"(usar {', '.join(ESCRITORES)})")
+    ruta_base = os.path.splitext(archivo_salida)[0]
+    return {formato: ESCRITORES[formato](df_final, df_errores, ruta_base) for formato in formatos}
@@ -0,0 +1,150 @@
+"""
+Esquema de Tipos para las Líneas de Pedido
+Creado por Lucas Gnemmi
+Versión: 1.0
+
+Las columnas de texto de las órdenes (SKU, CENTRO_COSTO, NOMBRE_LUGAR,
+PROVEEDOR, OBSERVACION, ...) repiten unos pocos valores en cientos de miles
+de filas. Se guardan como categóricas de pandas desde la lectura hasta la
+escritura del Excel: cada valor distinto se guarda una sola vez y las
+agrupaciones trabajan sobre códigos enteros.
+
+Las categorías se mantienen siempre ordenadas alfabéticamente, así ordenar
+o agrupar por estas columnas da el mismo orden que con texto.
+"""
+
+import numpy as np
+import pandas as pd
+from pandas.api.types import union_categoricals
+
+
+# Columnas de texto que se guardan como categóricas
+COLUMNAS_CATEGORICAS = (
+    "LOCAL", "SKU", "CENTRO_COSTO", "NOMBRE_LUGAR", "PROVEEDOR",
+    "FECHA_ENTREGA", "OBSERVACION", "_SRC_FILE"
+)
+
+# Columnas enteras que pueden venir vacías (entero nullable de pandas)
+COLUMNAS_ENTERAS = ("_SRC_ROW",)
+
+
+def es_categorica(serie):
+    """Indica si una Series es categórica"""
+    return isinstance(serie.dtype, pd.CategoricalDtype)
+
+
+def _categorias_ordenadas(valores):
+    """Categorías sin nulos y ordenadas alfabéticamente"""
+    return sorted({v for v in valores if not pd.isna(v)}, key=str)
+
+
+def cambiar_categorias(serie, categorias):
+    """
+    Equivalente a serie.cat.set_categories(categorias) con códigos del tamaño correcto
+
+    set_categories conserva el tipo entero de los códigos cuando la columna
+    no tenía categorías (int8); al pasar de 127 categorías los códigos se
+    desbordan en la asignación siguiente. Aquí se recalculan los códigos y
+    from_codes elige el tipo según la cantidad de categorías.
+    """
+    posiciones = pd.Index(categorias).get_indexer(serie.cat.categories)
+    codigos = serie.cat.codes.to_numpy()
+    nuevos = np.where(codigos >= 0, posiciones[codigos], -1) if len(posiciones) else np.full(len(codigos), -1)
+    return pd.Series(pd.Categorical.from_codes(nuevos, categories=categorias), index=serie.index, name=serie.name)
+
+
+def aplicar_esquema(df, columnas=COLUMNAS_CATEGORICAS):
+    """
+    Convierte (en el lugar) las columnas de texto presentes a categóricas
+    y las de COLUMNAS_ENTERAS a Int32
+
+    Args:
+        df: DataFrame de líneas de pedido
+        columnas: Columnas a convertir (por defecto COLUMNAS_CATEGORICAS)
+
+    Returns:
+        El mismo DataFrame
+    """
+    for col in columnas:
+        if col in df.columns and not es_categorica(df[col]):
+            valores = df[col].astype(object)
+            df[col] = pd.Categorical(valores, categories=_categorias_ordenadas(valores.unique()))
+    for col in COLUMNAS_ENTERAS:
+        if col in df.columns and df[col].dtype != "Int32":
+            df[col] = df[col].astype("Int32")
+    return df
+
+
+def columna_vacia(n, categorias=()):
+    """Columna categórica de n nulos (para las columnas que agregan las etapas)"""
+    return pd.Categorical([None] * n, categories=list(categorias))
+
+
+def como_texto(serie):
+    """Valores de la Series como object (para concatenar texto); sin cambios si no es categórica"""
+    return serie.astype(object) if es_categorica(serie) else serie
+
+
+def mapear_texto(serie, funcion):
+    """
+    Aplica una función a cada valor distinto de la Series (una sola vez por valor)
+
+    Args:
+        serie: Series de texto (categórica u object)
+        funcion: Función valor -> valor (recibe también los nulos)
+
+    Returns:
+        Series object con el resultado, con el mismo índice
+    """
+    if es_categorica(serie):
+        nuevos = np.array([funcion(c) for c in serie.cat.categories] + [funcion(np.nan)], dtype=object)
+        # Código -1 (nulo) toma el último elemento
+        return pd.Series(nuevos[serie.cat.codes.to_numpy()], index=serie.index, dtype=object)
+    distintos = pd.unique(serie.to_numpy(dtype=object))
+    return serie.map({v: funcion(v) for v in distintos}).astype(object)
+
+
+def asignar(df, filas, columna, valores):
+    """
+    Asigna valores a filas de una columna (en el lugar), agregando las categorías nuevas
+
+    Args:
+        df: DataFrame
+        filas: Índices (etiquetas) de las filas
+        columna: Nombre de la columna
+        valores: Escalar o Series alineada con filas
+    """
+    serie = df[columna]
+    if es_categorica(serie):
+        nuevos = pd.unique(pd.Series(valores, index=filas, dtype=object).to_numpy())
+        faltantes = [v for v in nuevos if not pd.isna(v) and v not in serie.cat.categories]
+        if faltantes:
+            categorias = _categorias_ordenadas(list(serie.cat.categories) + faltantes)
+            df[columna] = cambiar_categorias(serie, categorias)
+    df.loc[filas, columna] = valores
+
+
+def concatenar(partes):
+    """
+    pd.concat que conserva las columnas categóricas aunque cada parte tenga sus propias categorías
+
+    Args:
+        partes: Lista de DataFrames (p. ej. los lotes del procesamiento)
+
+    Returns:
+        DataFrame concatenado con índice nuevo
+    """
+    partes = [p for p in partes]
+    if len(partes) == 1:
+        return partes[0]
+    for col in partes[0].columns:
+        series = [p[col] for p in partes if col in p.columns]
+        if not all(es_categorica(s) for s in series):
+            continue
+        if all(s.cat.categories.equals(series[0].cat.categories) for s in series):
+            continue
+        categorias = _categorias_ordenadas(union_categoricals([s.array for s in series]).categories)
+        for p in partes:
+            if col in p.columns:
+                p[col] = cambiar_categorias(p[col], categorias)
+    return pd.concat(partes, ignore_index=True)
@@ -0,0 +1,360 @@
+"""
+Gestor de Trabajos del Procesamiento
+Creado por Lucas Gnemmi
+Versión: 1.0
+
+Cola acotada de corridas con identificador, cancelación y progreso:
+
+- Cada corrida es un Trabajo (T0001, T0002, ...) con su estado, progreso
+  (etapa, filas hechas y total) y un TokenCancelacion.
+- Un grupo fijo de hilos atiende la cola. Dos trabajos con la misma clave
+  (p. ej. el mismo archivo de salida) nunca corren a la vez, y con juntar=True
+  un pedido igual a uno que ya espera en la cola se junta con ese.
+- Con la cola llena, enviar() lanza ColaLlena en lugar de acumular corridas.
+
+Las etapas informan su avance con reportar_progreso() y revisan si se pidió
+cancelar con verificar_cancelacion(); las dos toman el trabajo del hilo
+actual, así que fuera de un trabajo (CLI, benchmarks) no hacen nada.
+
+Uso:
+    gestor = GestorTrabajos(al_progresar=mostrar)
+    trabajo = gestor.enviar("procesar", ejecutar_pipeline, kwargs={...}, juntar=True)
+    gestor.cancelar(trabajo.id)
+"""
+
+import threading
+import time
+from collections import deque
+
+
+# Estados de un trabajo
+EN_COLA = "en_cola"
+EJECUTANDO = "ejecutando"
+TERMINADO = "terminado"
+CANCELADO = "cancelado"
+FALLIDO = "fallido"
+
+# Filas entre avisos de progreso (y revisiones de cancelación) en los bucles por fila
+CADA_FILAS = 1000
+
+# Segundos mínimos entre llamadas a al_progresar de un mismo trabajo
+INTERVALO_AVISOS = 0.2
+
+# Trabajos terminados que se conservan para consultar su estado
+HISTORIAL = 50
+
+
+class ColaLlena(Exception):
+    """La cola de trabajos está completa (reintentar más tarde)"""
+
+
+class Cancelado(Exception):
+    """Se pidió cancelar el trabajo en curso"""
+
+
+class TokenCancelacion:
+    """Marca compartida entre quien cancela y la corrida que la revisa"""
+
+    def __init__(self):
+        self._evento = threading.Event()
+
+    def cancelar(self):
+        self._evento.set()
+
+    @property
+    def cancelado(self):
+        return self._evento.is_set()
+
+    def verificar(self):
+        """Lanza Cancelado si se pidió cancelar"""
+        if self._evento.is_set():
+            raise Cancelado("Procesamiento cancelado")
+
+
+class Trabajo:
+    """Una corrida en la cola del gestor"""
+
+    def __init__(self, id, nombre, funcion, args=(), kwargs=None, clave=None):
+        self.id = id
+        self.nombre = nombre
+        self.clave = clave
+        self.funcion = funcion
+        self.args = args
+        self.kwargs = kwargs or {}
+        self.token = TokenCancelacion()
+        self.estado = EN_COLA
+        self.etapa = None
+        self.hechas = 0
+        self.total = None
+        self.resultado = None
+        self.error = None
+        self.creado = time.time()
+        self.inicio = None
+        self.fin = None
+        self._aviso = 0.0
+        self._hecho = threading.Event()
+
+    @property
+    def terminado(self):
+        return self._hecho.is_set()
+
+    @property
+    def fraccion(self):
+        """Avance de la etapa actual entre 0 y 1 (None si no se conoce el total)"""
+        if not self.total:
+            return None
+        return min(self.hechas / self.total, 1.0)
+
+    def esperar(self, timeout=None):
+        """
+        Espera a que termine y devuelve el resultado
+
+        Raises:
+            TimeoutError: si no terminó en timeout segundos
+            Cancelado: si se canceló
+            La excepción de la corrida, si falló
+        """
+        if not self._hecho.wait(timeout):
+            raise TimeoutError(f"El trabajo {self.id} no terminó en {timeout} s")
+        if self.error is not None:
+            raise self.error
+        return self.resultado
+
+    def como_dict(self):
+        """Estado resumido (para logs y el servicio HTTP)"""
+        return {
+            "id": self.id, "nombre": self.nombre, "estado": self.estado,
+            "etapa": self.etapa, "hechas": self.hechas, "total": self.total,
+            "segundos": round((self.fin or time.time()) - self.inicio, 3) if self.inicio else None,
+            "error": str(self.error) if self.error is not None and self.estado == FALLIDO else None,
+        }
+
+
+# Trabajo que ejecuta cada hilo del gestor
+_local = threading.local()
+
+
+def trabajo_actual():
+    """Trabajo que se está ejecutando en este hilo, o None"""
+    return getattr(_local, "trabajo", None)
+
+
+def verificar_cancelacion():
+    """Lanza Cancelado si se pidió cancelar el trabajo de este hilo"""
+    trabajo = getattr(_local, "trabajo", None)
+    if trabajo is not None:
+        trabajo.token.verificar()
+
+
+def reportar_progreso(etapa, hechas, total=None):
+    """
+    Informa el avance del trabajo de este hilo y corta si se pidió cancelar
+
+    Args:
+        etapa: Texto de la etapa (p. ej. "leer Pedido.xlsx")
+        hechas: Filas (o unidades) procesadas de la etapa
+        total: Total de la etapa, si se conoce
+    """
+    trabajo = getattr(_local, "trabajo", None)
+    if trabajo is None:
+        return
+    trabajo.etapa, trabajo.hechas, trabajo.total = etapa, hechas, total
+    gestor = getattr(_local, "gestor", None)
+    if gestor is not None:
+        gestor._avisar_progreso(trabajo)
+    trabajo.token.verificar()
+
+
+class GestorTrabajos:
+    """Cola acotada de trabajos atendida por un grupo fijo de hilos"""
+
+    def __init__(self, trabajadores=1, cola_maxima=1, al_progresar=None, al_terminar=None, nombre="Trabajos"):
+        """
+        Args:
+            trabajadores: Hilos que ejecutan trabajos
+            cola_maxima: Trabajos que pueden esperar en la cola (sin contar los que corren)
+            al_progresar: Función(trabajo) llamada desde el hilo del trabajo al
+                cambiar de etapa o avanzar (a lo sumo cada INTERVALO_AVISOS s)
+            al_terminar: Función(trabajo) llamada desde el hilo del trabajo al terminar
+            nombre: Prefijo de los nombres de los hilos
+        """
+        self.trabajadores = trabajadores
+        self.cola_maxima = cola_maxima
+        self.al_progresar = al_progresar
+        self.al_terminar = al_terminar
+        self.nombre = nombre
+        self._pendientes = deque()
+        self._en_curso = []
+        self._historial = deque(maxlen=HISTORIAL)
+        self._numero = 0
+        self._cond = threading.Condition()
+        self._detenido = False
+        self._hilos = []
+
+    def _iniciar_hilos(self):
+        while len(self._hilos) < self.trabajadores:
+            hilo = threading.Thread(target=self._trabajador, name=f"{self.nombre}-{len(self._hilos) + 1}", daemon=True)
+            hilo.start()
+            self._hilos.append(hilo)
+
+    def enviar(self, nombre, funcion, args=(), kwargs=None, clave=None, juntar=False):
+        """
+        Encola un trabajo
+
+        Args:
+            nombre: Nombre del trabajo (para logs y para juntar pedidos iguales)
+            funcion: Función a ejecutar con args y kwargs
+            clave: Trabajos con la misma clave (p. ej. el archivo de salida) no
+                corren a la vez; None no restringe
+            juntar: Si ya espera en la cola un trabajo con el mismo nombre y
+                clave, devolver ese en lugar de encolar otro
+
+        Returns:
+            Trabajo
+
+        Raises:
+            ColaLlena: si ya hay cola_maxima trabajos esperando
+            RuntimeError: si el gestor se detuvo
+        """
+        with self._cond:
+            if self._detenido:
+                raise RuntimeError("El gestor de trabajos está detenido")
+            if juntar:
+                for pendiente in self._pendientes:
+                    if pendiente.nombre == nombre and pendiente.clave == clave:
+                        return pendiente
+            if len(self._pendientes) >= self.cola_maxima:
+                raise ColaLlena(f"Cola llena ({self.cola_maxima} trabajo(s) esperando)")
+            self._numero += 1
+            trabajo = Trabajo(f"T{self._numero:04d}", nombre, funcion, args, kwargs, clave)
+            self._pendientes.append(trabajo)
+            self._iniciar_hilos()
+            self._cond.notify_all()
+        return trabajo
+
+    def _siguiente(self):
+        """Primer trabajo de la cola cuya clave no está corriendo (con el lock tomado)"""
+        ocupadas = {t.clave for t in self._en_curso if t.clave is not None}
+        for trabajo in self._pendientes:
+            if trabajo.clave is None or trabajo.clave not in ocupadas:
+                self._pendientes.remove(trabajo)
+                return trabajo
+        return None
+
+    def _trabajador(self):
+        _local.gestor = self
+        while True:
+            with self._cond:
+                trabajo = self._siguiente()
+                while trabajo is None and not self._detenido:
+                    self._cond.wait()
+                    trabajo = self._siguiente()
+                if trabajo is None:
+                    return
+                trabajo.estado = EJECUTANDO
+                trabajo.inicio = time.time()
+                self._en_curso.append(trabajo)
+
+            _local.trabajo = trabajo
+            try:
+                trabajo.token.verificar()
+                trabajo.resultado = trabajo.funcion(*trabajo.args, **trabajo.kwargs)
+                # La corrida puede atrapar Cancelado por su cuenta (la interfaz lo informa en el log)
+                trabajo.estado = CANCELADO if trabajo.token.cancelado else TERMINADO
+            except Cancelado as e:
+                trabajo.estado, trabajo.error = CANCELADO, e
+            except Exception as e:
+                trabajo.estado, trabajo.error = FALLIDO, e
+            finally:
+                _local.trabajo = None
+                self._finalizar(trabajo)
+
+    def _finalizar(self, trabajo):
+        trabajo.fin = time.time()
+        with self._cond:
+            if trabajo in self._en_curso:
+                self._en_curso.remove(trabajo)
+            self._historial.append(trabajo)
+            self._cond.notify_all()
+        trabajo._hecho.set()
+        if self.al_terminar is not None:
+            try:
+                self.al_terminar(trabajo)
+            except Exception as e:
+                print(f"⚠️ Error in job callback for {trabajo.id}: {e}")
+
+    def _avisar_progreso(self, trabajo):
+        ahora = time.monotonic()
+        if self.al_progresar is None or ahora - trabajo._aviso < INTERVALO_AVISOS:
+            return
+        trabajo._aviso = ahora
+        try:
+            self.al_progresar(trabajo)
+        except Exception as e:
+            print(f"⚠️ Error in progress callback for {trabajo.id}: {e}")
+
+    def cancelar(self, id):
+        """
+        Cancela un trabajo: si espera en la cola se quita, si corre se le
+        pide que corte en la próxima revisión
+
+        Returns:
+            True si el trabajo existía y no había terminado
+        """
+        with self._cond:
+            for trabajo in self._pendientes:
+                if trabajo.id == id:
+                    self._pendientes.remove(trabajo)
+                    break
+            else:
+                for trabajo in self._en_curso:
+                    if trabajo.id == id:
+                        trabajo.token.cancelar()
+                        return True
+                return False
+        trabajo.token.cancelar()
+        trabajo.estado, trabajo.error = CANCELADO, Cancelado("Procesamiento cancelado")
+        self._finalizar(trabajo)
+        return True
+
+    def cancelar_todos(self):
+        """Cancela los trabajos en cola y en curso; devuelve cuántos"""
+        with self._cond:
+            ids = [t.id for t in list(self._pendientes) + self._en_curso]
+        return sum(self.cancelar(id) for id in ids)
+
+    def trabajo(self, id):
+        """Trabajo por id (en cola, en curso o del historial reciente), o None"""
+        return next((t for t in self.trabajos() if t.id == id), None)
+
+    def trabajos(self):
+        """Trabajos en curso, en cola y terminados recientes"""
+        with self._cond:
+            return list(self._en_curso) + list(self._pendientes) + list(reversed(self._historial))
+
+    @property
+    def ocupado(self):
+        """True si hay trabajos corriendo o esperando"""
+        with self._cond:
+            return bool(self._en_curso or self._pendientes)
+
+    def en_cola(self):
+        with self._cond:
+            return len(self._pendientes)
+
+    def detener(self, cancelar=True):
+        """
+        Deja de aceptar trabajos y espera a que terminen los hilos
+
+        Args:
+            cancelar: Cancelar lo pendiente y lo que está corriendo (si False,
+                se termina todo lo encolado)
+        """
+        if cancelar:
+            self.cancelar_todos()
+        with self._cond:
+            self._detenido = True
+            self._cond.notify_all()
+        for hilo in self._hilos:
+            if hilo is not threading.current_thread():
+                hilo.join()
@@ -22,7 +22,6 @@ if os.path.exists(libs_path) and libs_path not in sys.path:
     sys.path.insert(0, libs_path)
 
 import shutil
-import threading
 import tkinter as tk
 import customtkinter as ctk
 from tkinter import messagebox, filedialog
@@ -33,15 +32,25 @@ import webbrowser
 from datetime import datetime
 from procesamiento_v2 import (
     procesar_pdfs,
-    validar_skus_items,
-    mapear_proveedor_por_sku,
-    rellenar_fecha_entrega_y_observacion,
+    preparar_flujo,
+    filas_validas,
+    separar_errores,
+    marcar_skus_items,
+    construir_indice_proveedores,
+    marcar_proveedor_por_sku,
+    marcar_fechas_entrega,
     asignar_id_final,
-    formatear_excel_salida,
     obtener_nombre_archivo_salida,
-    ajustar_cantidades_formato_minimo
+    ajustar_cantidades_formato_minimo,
+    COLUMNA_ETAPA_ERROR
 )
+from pipeline_procesamiento import guardar_resultados
+from perfilador import perfilar
+from diferencias_corridas import registrar_corrida
+from gestor_trabajos import GestorTrabajos, ColaLlena, Cancelado, verificar_cancelacion
+from servicio_procesamiento import servicio_disponible, procesar_remoto, URL_DEFAULT as URL_SERVICIO
 from agenda_manager import AgendaManager
+from contexto_ejecucion import ContextoEjecucion
 from rules_dialog import RulesDialog
 from agenda_dialog import AgendaDialog
 from products_dialog import ProductsDialog
@@ -133,6 +142,10 @@ class ModernGUI:
         self.current_step = 0
         self.total_steps = len(self.progress_steps)
         
+        # Un procesamiento a la vez; un clic durante la corrida deja a lo sumo otra en cola
+        self.trabajos = GestorTrabajos(cola_maxima=1, al_progresar=self.progreso_trabajo,
+                                       al_terminar=self.trabajo_terminado, nombre="Procesamiento")
+        
         self.setup_main_window()
         self.setup_paths()
         self.setup_widgets()
@@ -429,6 +442,30 @@ class ModernGUI:
             text_color=self.theme.TEXT_SECONDARY
         ).pack(side="left")
         
+        # Perfilar la corrida (para diagnosticar lentitud en un equipo)
+        self.perfilar_var = tk.BooleanVar(value=False)
+        ctk.CTkCheckBox(
+            region_config,
+            text="🔬 Perfilar corrida",
+            variable=self.perfilar_var,
+            font=(self.theme.FONT_FAMILY, self.theme.FONT_SIZE_SMALL),
+            text_color=self.theme.TEXT_SECONDARY,
+            fg_color=self.theme.PRIMARY,
+            hover_color=self.theme.PRIMARY_DARK
+        ).pack(side="right")
+        
+        # Procesar en el servicio local (servicio_procesamiento.py), que tiene los datos ya cargados
+        self.servicio_var = tk.BooleanVar(value=False)
+        ctk.CTkCheckBox(
+            region_config,
+            text="⚡ Usar servicio local",
+            variable=self.servicio_var,
+            font=(self.theme.FONT_FAMILY, self.theme.FONT_SIZE_SMALL),
+            text_color=self.theme.TEXT_SECONDARY,
+            fg_color=self.theme.PRIMARY,
+            hover_color=self.theme.PRIMARY_DARK
+        ).pack(side="right", padx=(0, 10))
+        
         # Paso 4: Procesar
         process_frame = ctk.CTkFrame(steps_container, fg_color="transparent")
         process_frame.pack(fill="x", pady=2)
@@ -455,6 +492,20 @@ class ModernGUI:
         )
         self.btn_procesar.pack(side="left", fill="x", expand=True)
         
+        self.btn_cancelar = ctk.CTkButton(
+            process_frame,
+            text="⛔ CANCELAR",
+            command=self.cancelar_procesamiento,
+            fg_color=self.theme.ERROR,
+            hover_color="#c0392b",
+            font=(self.theme.FONT_FAMILY, 13, "bold"),
+            corner_radius=self.theme.CORNER_RADIUS,
+            height=45,
+            width=120,
+            state="disabled"
+        )
+        self.btn_cancelar.pack(side="left", padx=(10, 0))
+        
     def _create_step_button(self, parent, step_num, text, command, color):
         """Crear un botón de paso numerado"""
         step_frame = ctk.CTkFrame(parent, fg_color="transparent")
@@ -851,6 +902,16 @@ class ModernGUI:
             self.actualizar_progreso(porcentaje, step_text)
             self.current_step += 1
     
+    def progreso_trabajo(self, trabajo):
+        """Avance por filas dentro del paso actual (lo llama el gestor de trabajos)"""
+        if self.current_step == 0:
+            return
+        paso = self.current_step - 1
+        fraccion = trabajo.fraccion or 0
+        porcentaje = (paso + fraccion) / (self.total_steps - 1) * 100
+        detalle = f"{trabajo.hechas:,}/{trabajo.total:,}" if trabajo.total else f"{trabajo.hechas:,}"
+        self.actualizar_progreso(porcentaje, f"{self.progress_steps[paso]} {trabajo.etapa}: {detalle} filas")
+    
     def progreso_paso(self, paso, total_pasos, descripcion):
         """Actualizar progreso basado en pasos completados"""
         porcentaje = (paso / total_pasos) * 100
@@ -1398,6 +1459,9 @@ class ModernGUI:
             self.log(f"📂 Directorio base: {self.BASE_DIR}")
             self.log(f"📅 Iniciado el: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
             
+            # Gestores de referencia compartidos por todos los pasos de esta corrida
+            contexto = ContextoEjecucion()
+            
             # Paso 1: Leer Excel
             self.siguiente_paso()
             self.log("📖 Paso 1: Leyendo archivos Excel...")
@@ -1411,105 +1475,96 @@ class ModernGUI:
                 return
                 
             # Paso 2: Validar SKUs
+            # Todas las etapas trabajan sobre df_pdfs: las filas con error quedan
+            # marcadas (etapa + motivo) en lugar de separarse en copias
+            verificar_cancelacion()
             self.siguiente_paso()
             self.log("🔍 Paso 2: Validando Items C.Calzada...")
-            from products_manager import ProductsManager
-            products_manager = ProductsManager()
-            df_items_valid, df_err_items, warnings_items = validar_skus_items(df_pdfs, products_manager)
+            preparar_flujo(df_pdfs)
+            warnings_items = marcar_skus_items(df_pdfs, contexto.products_manager)
             
             for warning in warnings_items:
                 self.log(warning)
                 
-            self.log(f"✅ Registros válidos en items: {len(df_items_valid)}")
-            if len(df_err_items) > 0:
-                self.log(f"⚠️ Registros no encontrados en items: {len(df_err_items)}")
+            errores_por_etapa = df_pdfs[COLUMNA_ETAPA_ERROR].value_counts()
+            self.log(f"✅ Registros válidos en items: {int(filas_validas(df_pdfs).sum())}")
+            if errores_por_etapa.get("items", 0) > 0:
+                self.log(f"⚠️ Registros no encontrados en items: {errores_por_etapa['items']}")
             
             # Paso 3: Mapear proveedores
+            verificar_cancelacion()
             self.siguiente_paso()
             self.log("�️ Paso 3: Mapeando proveedores desde Full.xlsx...")
             region_seleccionada = self.region_var.get().strip() or "119"
             self.log(f"📍 Usando región: {region_seleccionada}")
-            df_map, df_err_prov, warnings = mapear_proveedor_por_sku(df_items_valid, self.FULL_XLSX, region_seleccionada)
+            warnings = []
+            indice_proveedores = construir_indice_proveedores(self.FULL_XLSX, region_seleccionada, warnings)
+            if indice_proveedores is not None:
+                warnings += marcar_proveedor_por_sku(
+                    df_pdfs, indice_proveedores, rules_manager=contexto.rules_manager
+                )
             
             for warning in warnings:
                 self.log(warning)
+            
+            if indice_proveedores is None:
+                self.status_bar.configure(text="❌ No se pudo leer Full.xlsx")
+                messagebox.showerror("❌ Full.xlsx", "No se pudo leer Full.xlsx.\n\nRevise el registro de actividad para más detalles.")
+                return
                 
-            self.log(f"✅ Valid records with supplier: {len(df_map)}")
-            if len(df_err_prov) > 0:
-                self.log(f"⚠️ Records with price errors: {len(df_err_prov)}")
+            errores_por_etapa = df_pdfs[COLUMNA_ETAPA_ERROR].value_counts()
+            self.log(f"✅ Valid records with supplier: {int(filas_validas(df_pdfs).sum())}")
+            if errores_por_etapa.get("proveedor", 0) > 0:
+                self.log(f"⚠️ Records with price errors: {errores_por_etapa['proveedor']}")
                 
             # Paso 4: Fechas y observaciones
+            verificar_cancelacion()
             self.siguiente_paso()
             self.log("📅 Paso 4: Procesando fechas y observaciones con AgendaManager...")
-            df_final_valid, df_err_fecha = rellenar_fecha_entrega_y_observacion(df_map)
-            
-            # Asegurar índices únicos después del procesamiento
-            df_final_valid = df_final_valid.reset_index(drop=True)
-            df_err_fecha = df_err_fecha.reset_index(drop=True)
+            marcar_fechas_entrega(df_pdfs, agenda_manager=contexto.agenda_manager)
             
-            self.log(f"✅ Registros con fecha asignada: {len(df_final_valid)}")
-            if len(df_err_fecha) > 0:
-                self.log(f"⚠️ Registros con errores de agenda: {len(df_err_fecha)}")
+            errores_por_etapa = df_pdfs[COLUMNA_ETAPA_ERROR].value_counts()
+            self.log(f"✅ Registros con fecha asignada: {int(filas_validas(df_pdfs).sum())}")
+            if errores_por_etapa.get("agenda", 0) > 0:
+                self.log(f"⚠️ Registros con errores de agenda: {errores_por_etapa['agenda']}")
                 
-            # Asegurar índices únicos en todos los DataFrames de errores antes del concat
-            df_err_items = df_err_items.reset_index(drop=True)
-            df_err_prov = df_err_prov.reset_index(drop=True)
-            
-            # Eliminar columnas duplicadas si existen
-            if len(df_err_items.columns) != len(set(df_err_items.columns)):
-                self.log("⚠️ Columnas duplicadas en df_err_items, eliminando...")
-                df_err_items = df_err_items.loc[:, ~df_err_items.columns.duplicated()]
-            
-            if len(df_err_prov.columns) != len(set(df_err_prov.columns)):
-                self.log("⚠️ Columnas duplicadas en df_err_prov, eliminando...")
-                df_err_prov = df_err_prov.loc[:, ~df_err_prov.columns.duplicated()]
-            
-            if len(df_err_fecha.columns) != len(set(df_err_fecha.columns)):
-                self.log("⚠️ Columnas duplicadas en df_err_fecha, eliminando...")
-                df_err_fecha = df_err_fecha.loc[:, ~df_err_fecha.columns.duplicated()]
-            
-            # Combinar todos los errores
-            df_errores = pd.concat([df_err_items, df_err_prov, df_err_fecha], ignore_index=True)
+            # Todos los errores, en orden de etapa
+            df_errores = separar_errores(df_pdfs)
             
             # Paso 5: Asignar IDs finales
+            verificar_cancelacion()
             self.siguiente_paso()
             self.log("🏷️ Paso 5: Asignando IDs finales...")
-            df_final = asignar_id_final(df_final_valid)
+            df_final_adjusted = asignar_id_final(df_pdfs.loc[filas_validas(df_pdfs)])
+            del df_pdfs
             
             # Paso 6: Ajustar cantidades con formato de empaque
+            verificar_cancelacion()
             self.siguiente_paso()
             self.log("🔧 Paso 6: Aplicando ajustes de formato de empaque...")
-            df_final_adjusted = ajustar_cantidades_formato_minimo(df_final)
+            ajustar_cantidades_formato_minimo(df_final_adjusted, products_manager=contexto.products_manager)
             
-            # Paso 7: Guardando resultados
+            # Paso 7: Guardando resultados (última oportunidad de cancelar: después se escribe la salida)
+            verificar_cancelacion()
             self.siguiente_paso()
             self.log("💾 Paso 7: Guardando resultados en Excel...")
             # Obtener nombre dinámico del archivo
             archivo_salida = self.get_nombre_archivo_salida()
             nombre_archivo = os.path.basename(archivo_salida)
             
-            # Limpiar columnas internas antes de guardar
-            columnas_internas = ['_REGLA_ESPECIAL', '_SRC_FILE']
-            df_final_limpio = df_final_adjusted.copy()  # Usar DataFrame ajustado
-            df_errores_limpio = df_errores.copy()
-            
-            for col in columnas_internas:
-                if col in df_final_limpio.columns:
-                    df_final_limpio = df_final_limpio.drop(columns=[col])
-                if col in df_errores_limpio.columns:
-                    df_errores_limpio = df_errores_limpio.drop(columns=[col])
-            
-            with pd.ExcelWriter(archivo_salida, engine="openpyxl") as writer:
-                df_final_limpio.to_excel(writer, sheet_name="PEDIDOS_CD", index=False)
-                if not df_errores_limpio.empty:
-                    df_errores_limpio.to_excel(writer, sheet_name="Errors", index=False)
-                    
+            # Escribe PEDIDOS_CD y Errors (sin columnas internas) y aplica el formato
+            guardar_resultados(df_final_adjusted, df_errores, archivo_salida)
             self.log(f"✅ Archivo guardado: {nombre_archivo}")
             
+            # Comparar con la corrida anterior (artefactos en Salidas/corridas/)
+            diferencias = registrar_corrida(df_final_adjusted, df_errores, archivo_salida,
+                                            region=region_seleccionada, log=self.log)
+            if diferencias['diferencias']:
+                self.log(f"🔁 Diferencias: {os.path.basename(diferencias['diferencias'])}")
+            
             # Paso 8: Formato profesional
             self.siguiente_paso()
-            self.log("🎨 Paso 8: Aplicando formato profesional...")
-            formatear_excel_salida(archivo_salida)
+            self.log("🎨 Paso 8: Formato profesional aplicado")
             
             # Paso 9: Completado
             self.siguiente_paso()
@@ -1544,6 +1599,11 @@ class ModernGUI:
             if messagebox.askyesno("🎉 Procesamiento Completado", result_msg):
                 self.abrir_salida_xlsx()
                 
+        except Cancelado:
+            self.log("⛔ PROCESAMIENTO CANCELADO (no se escribió ningún archivo de salida)")
+            self.status_bar.configure(text="⛔ Procesamiento cancelado")
+            self.actualizar_progreso(0, "Procesamiento cancelado")
+            
         except Exception as e:
             import traceback
             error_msg = f"❌ ERROR CRÍTICO: {str(e)}"
@@ -1561,9 +1621,93 @@ class ModernGUI:
         finally:
             self.btn_procesar.configure(state="normal", text="🚀 PROCESAR PEDIDOS")
             
+    def ejecutar_procesamiento_servicio(self):
+        """Procesar en el servicio local (cliente liviano); si no responde, procesar aquí"""
+        estado = servicio_disponible(URL_SERVICIO)
+        if estado is None:
+            self.log(f"⚠️ Servicio local no disponible en {URL_SERVICIO}, procesando en este equipo")
+            self.ejecutar_procesamiento()
+            return
+        
+        self.btn_procesar.configure(state="disabled", text="🔄 PROCESANDO...")
+        self.status_bar.configure(text="⚡ Procesando en el servicio local, por favor espere...")
+        try:
+            self.log("=" * 80)
+            self.log(f"⚡ PROCESANDO EN SERVICIO LOCAL ({URL_SERVICIO}, {estado['en_cola']} en cola)")
+            self.log("=" * 80)
+            archivo_salida = self.get_nombre_archivo_salida()
+            resultado = procesar_remoto(
+                URL_SERVICIO, carpeta=self.ORDENES_DIR, region=self.region_var.get().strip() or "119",
+                guardar=True, archivo_salida=archivo_salida
+            )
+            for warning in resultado['warnings']:
+                self.log(warning)
+            
+            nombre_archivo = os.path.basename(archivo_salida)
+            self.log("📊 RESUMEN DEL PROCESAMIENTO:")
+            self.log(f"   • Total de registros procesados: {resultado['lineas']}")
+            self.log(f"   • Total de errores: {resultado['errores']}")
+            self.log(f"   • Archivo de salida: {nombre_archivo}")
+            self.log(f"   • Tiempo en el servicio: {resultado['segundos']:.2f} s")
+            self.log("🎉 PROCESAMIENTO COMPLETADO EXITOSAMENTE")
+            self.mostrar_salida(resultado['df_final'])
+            self.status_bar.configure(
+                text=f"✅ Procesamiento completado: {resultado['lineas']} registros, {resultado['errores']} errores • Creado por Lucas Gnemmi"
+            )
+            if resultado['archivo_salida'] and messagebox.askyesno(
+                "🎉 Procesamiento Completado",
+                f"🎉 ¡Procesamiento completado exitosamente!\n\n"
+                f"📊 Registros procesados: {resultado['lineas']}\n"
+                f"❌ Errores encontrados: {resultado['errores']}\n"
+                f"📁 Archivo guardado: {nombre_archivo}\n\n"
+                f"¿Desea abrir el archivo de resultados?"
+            ):
+                self.abrir_salida_xlsx()
+        except Exception as e:
+            self.log(f"❌ ERROR EN SERVICIO LOCAL: {e}")
+            self.status_bar.configure(text="❌ Error en procesamiento")
+            messagebox.showerror("❌ Error", f"Error en el servicio de procesamiento:\n\n{str(e)}")
+        finally:
+            self.btn_procesar.configure(state="normal", text="🚀 PROCESAR PEDIDOS")
+        
+    def ejecutar_procesamiento_perfilado(self):
+        """Ejecutar el procesamiento con el perfilador (resultados en Salidas/profiles/)"""
+        with perfilar(os.path.join(self.BASE_DIR, "Salidas", "profiles"), log=self.log):
+            self.ejecutar_procesamiento()
+        
     def ejecutar_procesamiento_async(self):
-        """Ejecutar procesamiento en hilo separado para mantener UI responsiva"""
-        threading.Thread(target=self.ejecutar_procesamiento, daemon=True).start()
+        """Encolar el procesamiento en el gestor de trabajos para mantener UI responsiva"""
+        if self.servicio_var.get():
+            objetivo = self.ejecutar_procesamiento_servicio
+        elif self.perfilar_var.get():
+            objetivo = self.ejecutar_procesamiento_perfilado
+        else:
+            objetivo = self.ejecutar_procesamiento
+        en_curso = self.trabajos.ocupado
+        try:
+            # Varios clics mientras se procesa se juntan en una sola corrida siguiente
+            trabajo = self.trabajos.enviar("procesar", objetivo, juntar=True)
+        except ColaLlena:
+            self.log("⏳ Ya hay un procesamiento en curso y otro en espera")
+            return
+        if en_curso:
+            self.log(f"⏳ Ya hay un procesamiento en curso; se procesará de nuevo al terminar ({trabajo.id})")
+        self.btn_cancelar.configure(state="normal")
+        
+    def cancelar_procesamiento(self):
+        """Cancelar el procesamiento en curso (entre pasos o lotes de filas) y el que espera"""
+        if self.trabajos.cancelar_todos():
+            self.log("⛔ Cancelando procesamiento...")
+            self.status_bar.configure(text="⛔ Cancelando procesamiento...")
+        if self.servicio_var.get():
+            self.log("⚠️ El pedido ya enviado al servicio local termina allí")
+        
+    def trabajo_terminado(self, trabajo):
+        """Al terminar un trabajo (lo llama el gestor desde su hilo)"""
+        if not self.trabajos.ocupado:
+            self.btn_cancelar.configure(state="disabled")
+        if trabajo.error is not None and not isinstance(trabajo.error, Cancelado):
+            self.log(f"❌ Error en el trabajo {trabajo.id}: {trabajo.error}")
         
     def run(self):
         """Iniciar la aplicación con mensaje de bienvenida"""
@@ -0,0 +1,121 @@
+"""
+Lector de Planillas Excel
+Creado por Lucas Gnemmi
+Versión: 1.0
+
+Punto único de lectura de los Excel de entrada (Ordenes, Full.xlsx,
+importaciones de productos y reglas). Usa python-calamine (lector nativo en
+Rust, varias veces más rápido que openpyxl) cuando está instalado y, si no
+está o falla con un archivo, openpyxl. Permite leer solo las columnas que
+necesita cada paso.
+
+Benchmark:
+    python lector_excel.py Full-Agenda/Full.xlsx
+"""
+
+import os
+
+import pandas as pd
+
+try:
+    import python_calamine
+except ImportError:
+    python_calamine = None
+
+
+MOTOR_RAPIDO = "calamine"
+MOTOR_COMPATIBLE = "openpyxl"
+
+
+def motores_disponibles():
+    """Motores de lectura de .xlsx en orden de preferencia"""
+    return ([MOTOR_RAPIDO] if python_calamine is not None else []) + [MOTOR_COMPATIBLE]
+
+
+def _selector_columnas(columnas):
+    """usecols de pandas que compara los nombres sin espacios ni mayúsculas"""
+    if columnas is None:
+        return None
+    buscadas = {str(c).strip().upper() for c in columnas}
+    return lambda nombre: str(nombre).strip().upper() in buscadas
+
+
+def leer_excel(path, columnas=None, sheet_name=0, dtype=str, nrows=None):
+    """
+    Lee una hoja de Excel con el motor más rápido disponible
+
+    Args:
+        path: Ruta del archivo (.xlsx, .xlsm o .xls)
+        columnas: Nombres de las columnas a leer (sin distinguir mayúsculas ni
+            espacios); None lee todas. Las que no existan simplemente no aparecen
+        sheet_name: Hoja a leer (nombre o posición)
+        dtype: Tipo de las columnas (default str, como el resto del sistema)
+        nrows: Cantidad máxima de filas de datos (None = todas; 0 = solo encabezado)
+
+    Returns:
+        DataFrame con los nombres de columna sin espacios al inicio/final
+    """
+    opciones = dict(sheet_name=sheet_name, dtype=dtype, usecols=_selector_columnas(columnas), nrows=nrows)
+
+    if path.lower().endswith('.xls'):
+        # Formato antiguo: lo resuelve pandas (xlrd) o calamine
+        motores = ([MOTOR_RAPIDO] if python_calamine is not None else []) + [None]
+    else:
+        motores = motores_disponibles()
+
+    for i, motor in enumerate(motores):
+        try:
+            df = pd.read_excel(path, engine=motor, **opciones)
+            break
+        except Exception as e:
+            if i == len(motores) - 1:
+                raise
+            print(f"⚠️ {motor} could not read {os.path.basename(path)} ({e}), retrying with {motores[i + 1] or 'default engine'}")
+
+    df.columns = [str(c).strip() for c in df.columns]
+    return df
+
+
+def benchmark(path, columnas=None, repeticiones=3):
+    """
+    Mide el tiempo de lectura de un archivo con cada motor disponible
+
+    Args:
+        path: Ruta del Excel
+        columnas: Columnas para la medición con usecols (default: las 3 primeras)
+        repeticiones: Lecturas por medición (se informa la mejor)
+
+    Returns:
+        Lista de dicts con motor, columnas, segundos, filas y columnas leídas
+    """
+    from time import perf_counter
+
+    if columnas is None:
+        columnas = list(leer_excel(path, nrows=0).columns[:3])
+
+    resultados = []
+    for motor in motores_disponibles():
+        for seleccion in (None, columnas):
+            tiempos = []
+            for _ in range(repeticiones):
+                inicio = perf_counter()
+                df = pd.read_excel(path, engine=motor, dtype=str, usecols=_selector_columnas(seleccion))
+                tiempos.append(perf_counter() - inicio)
+            resultados.append({
+                "motor": motor,
+                "columnas": "todas" if seleccion is None else len(seleccion),
+                "segundos": round(min(tiempos), 3),
+                "filas": len(df),
+                "columnas_leidas": df.shape[1],
+            })
+    return resultados
+
+
+if __name__ == "__main__":
+    import sys
+
+    archivo = sys.argv[1] if len(sys.argv) > 1 else os.path.join("Full-Agenda", "Full.xlsx")
+    print(f"📊 Read benchmark: {archivo} ({os.path.getsize(archivo) / 1e6:.1f} MB)")
+    if python_calamine is None:
+        print("💡 python-calamine is not installed (pip install python-calamine), only openpyxl is measured")
+    print(pd.DataFrame(benchmark(archivo)).to_string(index=False))
@@ -0,0 +1,155 @@
+"""
+Motor de Procesamiento en Memoria
+Creado por Lucas Gnemmi
+Versión: 1.0
+
+Mantiene entre corridas lo que es caro de preparar: el índice de Full.xlsx
+(por región, mientras el archivo no cambie) y los items de cada planilla de
+órdenes ya leída (mientras no cambie). Los gestores de productos, reglas y
+agenda ya quedan en memoria por proceso (contexto_ejecucion.py).
+
+Lo usan el vigilante de la carpeta de órdenes y el servicio HTTP local,
+que procesan muchas veces seguidas con casi los mismos datos.
+"""
+
+import os
+import threading
+
+from almacenamiento import firma_archivo
+from contexto_ejecucion import ContextoEjecucion
+from escritores_salida import FORMATOS_DEFAULT
+from esquema_pedidos import concatenar
+from procesamiento_v2 import leer_archivo_ordenes, construir_indice_proveedores
+
+
+EXTENSIONES_ORDENES = ('.xlsx', '.xls')
+
+
+def es_planilla_ordenes(nombre):
+    """Planillas de órdenes, sin los archivos temporales de Excel (~$...)"""
+    nombre = os.path.basename(nombre)
+    return nombre.lower().endswith(EXTENSIONES_ORDENES) and not nombre.startswith("~$")
+
+
+class MotorIncremental:
+    """
+    Órdenes leídas e índices de Full.xlsx en memoria entre corridas
+
+    Cada planilla se vuelve a leer solo si cambió su firma (mtime y tamaño);
+    el índice de una región, solo si cambió Full.xlsx. Se puede usar desde
+    varios hilos a la vez.
+    """
+
+    def __init__(self, base_dir, region="119", contexto_kwargs=None):
+        """
+        Args:
+            base_dir: Carpeta del sistema (con Ordenes/, Full-Agenda/ y Salidas/)
+            region: Región de Full.xlsx por defecto
+            contexto_kwargs: Rutas para ContextoEjecucion (products_file, rules_file,
+                agenda_file); las que falten se toman de base_dir
+        """
+        self.base_dir = base_dir
+        self.ordenes_dir = os.path.join(base_dir, "Ordenes")
+        self.full_xlsx = os.path.join(base_dir, "Full-Agenda", "Full.xlsx")
+        self.region = region
+        self.contexto_kwargs = contexto_kwargs or {}
+        self._ordenes = {}  # ruta absoluta -> (firma, DataFrame)
+        self._indices = {}  # región -> (firma de Full.xlsx, índice)
+        self._lock = threading.Lock()
+
+    def contexto(self):
+        """ContextoEjecucion para una corrida (los gestores vienen del registro del proceso)"""
+        return ContextoEjecucion.desde_carpeta(self.base_dir, **self.contexto_kwargs)
+
+    def indice_proveedores(self, warnings=None, region=None):
+        """Índice SKU -> proveedores de la región, reconstruido solo si Full.xlsx cambió"""
+        region = region or self.region
+        firma = firma_archivo(self.full_xlsx)
+        with self._lock:
+            entrada = self._indices.get(region)
+            if entrada is not None and entrada[0] == firma:
+                return entrada[1]
+            indice = construir_indice_proveedores(self.full_xlsx, region, warnings)
+            if indice is not None:
+                self._indices[region] = (firma, indice)
+            return indice
+
+    def leer_archivos(self, rutas, cachear=True):
+        """
+        Items de varias planillas, leyendo solo las nuevas o modificadas
+
+        Args:
+            rutas: Rutas de las planillas, en el orden en que se concatenan
+            cachear: Si False, se leen sin guardarlas (p. ej. archivos temporales)
+
+        Returns:
+            (DataFrame o None si no hay items, cantidad de planillas leídas del disco)
+        """
+        partes, leidas = [], 0
+        for ruta in rutas:
+            ruta = os.path.abspath(ruta)
+            firma = firma_archivo(ruta)
+            if firma is None:
+                raise FileNotFoundError(f"❌ Order file not found: {ruta}")
+            with self._lock:
+                entrada = self._ordenes.get(ruta)
+            if entrada is not None and entrada[0] == firma:
+                df = entrada[1]
+            else:
+                df = leer_archivo_ordenes(ruta)
+                leidas += 1
+                if cachear:
+                    with self._lock:
+                        self._ordenes[ruta] = (firma, df)
+            if not df.empty:
+                partes.append(df)
+
+        # Olvidar las planillas que ya no existen
+        with self._lock:
+            for ruta in [r for r in self._ordenes if not os.path.exists(r)]:
+                del self._ordenes[ruta]
+
+        if not partes:
+            return None, leidas
+        # Copia: las etapas modifican el DataFrame y lo guardado se reutiliza en la próxima corrida
+        return concatenar([p.copy() for p in partes]), leidas
+
+    def planillas(self, carpeta=None):
+        """Rutas de las planillas de una carpeta (default Ordenes/), en orden alfabético"""
+        carpeta = carpeta or self.ordenes_dir
+        return [os.path.join(carpeta, f) for f in sorted(os.listdir(carpeta)) if es_planilla_ordenes(f)]
+
+    def procesar(self, rutas=None, region=None, formatos=FORMATOS_DEFAULT, guardar=True,
+                 archivo_salida=None, fecha_pedido=None, cachear=True):
+        """
+        Una corrida completa con las planillas indicadas
+
+        Args:
+            rutas: Planillas a procesar (default: todas las de Ordenes/)
+            region: Región de Full.xlsx (default la del motor)
+            formatos: Formatos de salida (claves de escritores_salida.ESCRITORES)
+            guardar: Si False, no escribe archivos (solo devuelve los DataFrames)
+            archivo_salida: Ruta del Excel de salida (default el nombre de la interfaz)
+            fecha_pedido: Fecha del pedido (default la actual)
+            cachear: Si False, las planillas no quedan en memoria (archivos temporales)
+
+        Returns:
+            Resultado de ejecutar_pipeline, o None si no hay items
+        """
+        from pipeline_procesamiento import ejecutar_pipeline
+
+        region = region or self.region
+        warnings = []
+        indice = self.indice_proveedores(warnings, region)
+        if indice is None:
+            raise RuntimeError(warnings[-1] if warnings else f"❌ Could not read {self.full_xlsx}")
+        if rutas is None:
+            rutas = self.planillas()
+        df, leidas = self.leer_archivos(rutas, cachear)
+        print(f"📄 {leidas} of {len(rutas)} workbook(s) read from disk, the rest from memory")
+        if df is None:
+            print("⚠️ No records found in Excel files.")
+            return None
+        return ejecutar_pipeline(self.base_dir, region, archivo_salida=archivo_salida, contexto=self.contexto(),
+                                 fecha_pedido=fecha_pedido, guardar=guardar, formatos=formatos,
+                                 df_ordenes=df, indice_proveedores=indice)
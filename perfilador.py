@@ -0,0 +1,217 @@
+"""
+Perfilador de Corridas del Procesamiento
+Creado por Lucas Gnemmi
+Versión: 1.0
+
+Cuando una corrida es lenta en un equipo, perfilar() envuelve el
+procesamiento y deja en Salidas/profiles/ lo necesario para ver por qué:
+
+- <nombre>.prof: perfil determinista de cProfile (pstats, snakeviz, ...)
+- <nombre>.trace.json: línea de tiempo de las pilas muestreadas y de los
+  tramos de cada etapa (trazas.py) en formato Chrome trace
+  (chrome://tracing, https://ui.perfetto.dev o speedscope)
+- <nombre>.folded: pilas plegadas para flamegraph.pl o speedscope
+
+Al terminar se muestran en el log las funciones con más tiempo propio.
+Solo se usa la biblioteca estándar.
+
+Uso:
+    with perfilar(os.path.join(base_dir, "Salidas", "profiles"), log=self.log):
+        self.ejecutar_procesamiento()
+"""
+
+import contextlib
+import cProfile
+import json
+import os
+import pstats
+import sys
+import threading
+from collections import Counter
+from datetime import datetime
+from time import perf_counter
+
+from trazas import marca, trazar
+
+
+CARPETA_PERFILES = os.path.join("Salidas", "profiles")
+
+# Funciones que se muestran en el log al terminar
+TOP_DEFAULT = 20
+
+# Segundos entre muestras de la pila (5 ms: ~200 muestras por segundo)
+INTERVALO_MUESTREO = 0.005
+
+
+class MuestreadorPilas(threading.Thread):
+    """Toma la pila de llamadas de un hilo cada `intervalo` segundos"""
+
+    def __init__(self, hilo_id, intervalo=INTERVALO_MUESTREO):
+        super().__init__(name="MuestreadorPilas", daemon=True)
+        self.hilo_id = hilo_id
+        self.intervalo = intervalo
+        # (segundos desde el inicio, pila de (funcion, archivo, linea) de afuera hacia adentro)
+        self.muestras = []
+        # Instante de inicio en microsegundos de trazas.marca(), para alinear con los tramos
+        self.origen = None
+        self._detener = threading.Event()
+
+    def run(self):
+        self.origen = marca()
+        inicio = perf_counter()
+        while not self._detener.wait(self.intervalo):
+            frame = sys._current_frames().get(self.hilo_id)
+            if frame is None:
+                continue
+            pila = []
+            while frame is not None:
+                codigo = frame.f_code
+                pila.append((codigo.co_name, codigo.co_filename, codigo.co_firstlineno))
+                frame = frame.f_back
+            self.muestras.append((perf_counter() - inicio, tuple(reversed(pila))))
+
+    def detener(self):
+        self._detener.set()
+        self.join()
+
+
+def _nombre_marco(marco):
+    funcion, archivo, linea = marco
+    return f"{funcion} ({os.path.basename(archivo)}:{linea})"
+
+
+def exportar_chrome_trace(muestras, ruta, hilo="procesamiento", origen=0, eventos_extra=()):
+    """
+    Convierte las pilas muestreadas en eventos de duración del formato Chrome trace
+
+    Cada función queda como un bloque desde la primera muestra en que aparece
+    en la pila hasta la primera en que ya no está, anidado bajo quien la llamó.
+
+    Args:
+        muestras: Lista de MuestreadorPilas.muestras
+        ruta: Archivo .json a escribir
+        hilo: Nombre del hilo en el visor
+        origen: Microsegundos (trazas.marca) del instante 0 de las muestras
+        eventos_extra: Otros eventos Chrome trace a incluir (p. ej. los tramos de las etapas)
+
+    Returns:
+        Cantidad de eventos escritos
+    """
+    # Las pilas van en su propia fila (tid 0) para no mezclarse con los tramos de trazas.py
+    eventos = [{"name": "thread_name", "ph": "M", "pid": os.getpid(), "tid": 0, "args": {"name": f"{hilo} (muestras)"}}]
+    eventos.extend(eventos_extra)
+    abiertos = []  # [(marco, inicio)] de la pila actual
+
+    def cerrar_hasta(profundidad, t):
+        while len(abiertos) > profundidad:
+            marco, inicio = abiertos.pop()
+            eventos.append({
+                "name": _nombre_marco(marco), "cat": "python", "ph": "X",
+                "ts": origen + round(inicio * 1e6), "dur": round((t - inicio) * 1e6),
+                "pid": os.getpid(), "tid": 0,
+                "args": {"archivo": marco[1], "linea": marco[2]},
+            })
+
+    t = 0.0
+    for t, pila in muestras:
+        comunes = 0
+        while comunes < min(len(abiertos), len(pila)) and abiertos[comunes][0] == pila[comunes]:
+            comunes += 1
+        cerrar_hasta(comunes, t)
+        abiertos.extend((marco, t) for marco in pila[comunes:])
+    cerrar_hasta(0, t)
+
+    with open(ruta, "w", encoding="utf-8") as f:
+        json.dump({"traceEvents": eventos, "displayTimeUnit": "ms"}, f, default=str)
+    return len(eventos) - 1
+
+
+def exportar_pilas_plegadas(muestras, ruta):
+    """
+    Escribe las pilas en formato plegado (una línea 'a;b;c cantidad' por pila distinta)
+
+    Returns:
+        Cantidad de pilas distintas
+    """
+    conteo = Counter(";".join(_nombre_marco(m) for m in pila) for _, pila in muestras)
+    with open(ruta, "w", encoding="utf-8") as f:
+        for pila, cantidad in conteo.most_common():
+            f.write(f"{pila} {cantidad}\n")
+    return len(conteo)
+
+
+def funciones_mas_lentas(stats, top=TOP_DEFAULT):
+    """
+    Funciones con más tiempo propio de un perfil de cProfile
+
+    Args:
+        stats: pstats.Stats
+        top: Cantidad de funciones
+
+    Returns:
+        Lista de dicts con funcion, archivo, linea, llamadas, tiempo_propio y tiempo_total
+    """
+    filas = [
+        {"funcion": funcion, "archivo": archivo, "linea": linea, "llamadas": llamadas,
+         "tiempo_propio": propio, "tiempo_total": total}
+        for (archivo, linea, funcion), (_, llamadas, propio, total, _) in stats.stats.items()
+    ]
+    filas.sort(key=lambda f: f["tiempo_propio"], reverse=True)
+    return filas[:top]
+
+
+@contextlib.contextmanager
+def perfilar(carpeta=CARPETA_PERFILES, nombre=None, top=TOP_DEFAULT, intervalo=INTERVALO_MUESTREO, log=print,
+             ruta_traza=None):
+    """
+    Perfila el bloque (cProfile + muestreo de pilas del hilo actual + tramos de
+    las etapas) y guarda los resultados
+
+    Los archivos se guardan aunque el bloque termine con una excepción, así
+    también se puede ver dónde estaba una corrida que falló.
+
+    Args:
+        carpeta: Carpeta de salida (se crea si no existe)
+        nombre: Nombre base de los archivos (default perfil_<fecha_hora>)
+        top: Funciones a mostrar en el log
+        intervalo: Segundos entre muestras de la pila
+        log: Función para los mensajes (print o el log de la interfaz)
+        ruta_traza: Guardar además solo los tramos de las etapas en este .json
+            (como trazar(ruta)); el .trace.json del perfil ya los incluye
+
+    Yields:
+        Dict que al salir tiene las rutas 'prof', 'trace' y 'folded'
+    """
+    os.makedirs(carpeta, exist_ok=True)
+    base = os.path.join(carpeta, nombre or f"perfil_{datetime.now().strftime('%Y%m%d_%H%M%S')}")
+    archivos = {}
+
+    log("🔬 Profiling this run...")
+    muestreador = MuestreadorPilas(threading.get_ident(), intervalo)
+    perfil = cProfile.Profile()
+    inicio = perf_counter()
+    with trazar(ruta_traza) as traza:
+        muestreador.start()
+        perfil.enable()
+        try:
+            yield archivos
+        finally:
+            perfil.disable()
+            muestreador.detener()
+            segundos = perf_counter() - inicio
+
+            archivos["prof"] = base + ".prof"
+            perfil.dump_stats(archivos["prof"])
+            archivos["trace"] = base + ".trace.json"
+            exportar_chrome_trace(muestreador.muestras, archivos["trace"], origen=muestreador.origen or 0,
+                                  eventos_extra=traza.eventos)
+            archivos["folded"] = base + ".folded"
+            exportar_pilas_plegadas(muestreador.muestras, archivos["folded"])
+
+            log(f"🔬 Profile: {segundos:.2f} s, {len(muestreador.muestras)} stack samples")
+            log(f"   {'self s':>9} {'total s':>9} {'calls':>10}  function")
+            for fila in funciones_mas_lentas(pstats.Stats(perfil), top):
+                log(f"   {fila['tiempo_propio']:>9.3f} {fila['tiempo_total']:>9.3f} {fila['llamadas']:>10}  "
+                    f"{fila['funcion']} ({os.path.basename(fila['archivo'])}:{fila['linea']})")
+            for ruta in archivos.values():
+                log(f"📁 {ruta}")
@@ -0,0 +1,267 @@
+"""
+Pipeline de Procesamiento sin Interfaz
+Creado por Lucas Gnemmi
+Versión: 1.0
+
+Ejecuta los mismos pasos que el botón PROCESAR de la interfaz (leer órdenes,
+validar SKUs, mapear proveedores, asignar fechas, consolidar y guardar) sin
+abrir la ventana. Con tamano_lote las órdenes se leen y procesan por lotes:
+cada lote se valida, mapea y fecha por separado y solo se guarda su versión
+preagrupada, de modo que la memoria depende del tamaño del lote y no del
+total de líneas de la consolidación.
+
+Uso:
+    python pipeline_procesamiento.py                 # Todo en memoria (igual que la interfaz)
+    python pipeline_procesamiento.py --lotes 50000   # Por lotes de 50.000 líneas
+    python pipeline_procesamiento.py --dividir       # Además, un Excel por proveedor
+    python pipeline_procesamiento.py --formatos csv,parquet   # Sin el Excel con formato
+    python pipeline_procesamiento.py --perfilar      # Perfil de la corrida en Salidas/profiles/
+    python pipeline_procesamiento.py --traza         # Línea de tiempo de las etapas (Chrome trace)
+"""
+
+import os
+import sys
+from datetime import datetime
+
+import pandas as pd
+
+from contexto_ejecucion import ContextoEjecucion
+from diferencias_corridas import registrar_corrida
+from esquema_pedidos import concatenar
+from escritores_salida import guardar_resultados, guardar_salidas, ESCRITORES, FORMATOS_DEFAULT
+from gestor_trabajos import verificar_cancelacion, reportar_progreso
+from perfilador import perfilar, TOP_DEFAULT as TOP_PERFIL
+from salida_por_proveedor import escribir_por_proveedor, PARTICIONES
+from trazas import trazar, trazado, tramo, iterar_con_tramos
+from procesamiento_v2 import (
+    procesar_pdfs, leer_ordenes_por_lotes, preparar_flujo, filas_validas,
+    separar_errores, marcar_skus_items, construir_indice_proveedores,
+    marcar_proveedor_por_sku, marcar_fechas_entrega, asignar_id_final,
+    ajustar_cantidades_formato_minimo, obtener_nombre_archivo_salida, TAMANO_LOTE_DEFAULT
+)
+
+
+REGION_DEFAULT = "119"
+
+# Columnas que identifican una línea del pedido final (ver asignar_id_final)
+COLUMNAS_AGRUPACION = ["LOCAL", "SKU", "PROVEEDOR", "FECHA_ENTREGA", "OBSERVACION"]
+
+
+@trazado("preagrupar_lote")
+def _preagrupar_lote(df_valid):
+    """
+    Suma las cantidades de un lote por línea de pedido y archivo de origen
+
+    El resultado tiene las columnas que usa asignar_id_final, así que la
+    consolidación final sobre todos los lotes da lo mismo que agrupar las
+    líneas originales (la suma de sumas es la suma, 'first' respeta el
+    orden de los lotes y _SRC_FILE se conserva por archivo).
+    """
+    return df_valid.groupby(COLUMNAS_AGRUPACION + ['_SRC_FILE'], sort=False, as_index=False, observed=True).agg({
+        'CANTIDAD': 'sum',
+        'CENTRO_COSTO': 'first',
+        'NOMBRE_LUGAR': 'first',
+    })
+
+
+@trazado("procesar_lote")
+def procesar_lote(df, contexto, indice_proveedores, fecha_pedido=None):
+    """
+    Valida, mapea y fecha un lote de items en el lugar
+
+    Las filas que fallan quedan marcadas con su etapa y motivo (ver
+    preparar_flujo); no se separan copias de válidos y errores.
+
+    Args:
+        df: DataFrame de items (procesar_pdfs o un lote de leer_ordenes_por_lotes)
+        contexto: ContextoEjecucion con los gestores de la corrida
+        indice_proveedores: Índice SKU -> proveedores de Full.xlsx
+        fecha_pedido: Fecha del pedido (opcional, fecha actual)
+
+    Returns:
+        Lista de mensajes para el log
+
+    Raises:
+        Cancelado: si se canceló el trabajo entre etapas (gestor_trabajos.py)
+    """
+    preparar_flujo(df)
+    warnings = marcar_skus_items(df, contexto.products_manager)
+    verificar_cancelacion()
+    warnings += marcar_proveedor_por_sku(df, indice_proveedores, rules_manager=contexto.rules_manager)
+    verificar_cancelacion()
+    marcar_fechas_entrega(df, agenda_manager=contexto.agenda_manager, fecha_pedido=fecha_pedido)
+    return warnings
+
+
+@trazado("procesamiento", "corrida")
+def ejecutar_pipeline(base_dir=None, region=REGION_DEFAULT, tamano_lote=None,
+                      archivo_salida=None, contexto=None, fecha_pedido=None, guardar=True,
+                      dividir_por=None, procesos=None, formatos=FORMATOS_DEFAULT,
+                      df_ordenes=None, indice_proveedores=None):
+    """
+    Ejecuta el procesamiento completo de las órdenes
+
+    Args:
+        base_dir: Carpeta del sistema (con Ordenes/, Full-Agenda/ y Salidas/).
+            Por defecto la carpeta de este módulo
+        region: Región de Full.xlsx a usar
+        tamano_lote: Líneas por lote; None procesa todo en memoria como la interfaz
+        archivo_salida: Ruta del Excel de salida (opcional, mismo nombre que la interfaz)
+        contexto: ContextoEjecucion a usar (opcional, crea uno con los archivos
+            de referencia de base_dir)
+        fecha_pedido: Fecha del pedido (opcional, fecha actual). Se fija al
+            inicio para que todos los lotes usen el mismo despacho
+        guardar: Si False, no escribe ningún archivo (solo devuelve los DataFrames)
+        dividir_por: "PROVEEDOR" o "ID PEDIDO" para escribir además un Excel por
+            partición (en una carpeta con el nombre del archivo de salida)
+        procesos: Procesos para escribir los archivos divididos (default: núcleos)
+        formatos: Formatos de salida (claves de escritores_salida.ESCRITORES).
+            CSV y Parquet usan el nombre de archivo_salida con su extensión
+        df_ordenes: Items ya leídos (opcional, en lugar de leer Ordenes/). Se
+            modifican en el lugar
+        indice_proveedores: Índice de Full.xlsx ya construido (opcional)
+
+    Returns:
+        Dict con 'df_final', 'df_errores', 'archivo_salida', 'archivos'
+        (formato -> ruta, más 'corrida' y 'diferencias' de diferencias_corridas.py),
+        'indice_division' (None si no se dividió) y 'warnings'
+
+    Raises:
+        Cancelado: si la corrida es un trabajo de GestorTrabajos y se canceló
+            (entre lotes o etapas, siempre antes de escribir la salida)
+    """
+    if base_dir is None:
+        base_dir = os.path.dirname(os.path.abspath(__file__))
+    ordenes_dir = os.path.join(base_dir, "Ordenes")
+    full_xlsx = os.path.join(base_dir, "Full-Agenda", "Full.xlsx")
+    if contexto is None:
+        contexto = ContextoEjecucion.desde_carpeta(base_dir)
+    if fecha_pedido is None:
+        fecha_pedido = datetime.now()
+
+    print("🚀 Starting order processing" + (f" in batches of {tamano_lote}" if tamano_lote else ""))
+
+    warnings = []
+    if indice_proveedores is None:
+        indice_proveedores = construir_indice_proveedores(full_xlsx, region, warnings)
+    if indice_proveedores is None:
+        raise RuntimeError(warnings[-1] if warnings else f"❌ Could not read {full_xlsx}")
+
+    if df_ordenes is not None:
+        lotes = [df_ordenes] if not df_ordenes.empty else []
+    elif tamano_lote:
+        lotes = iterar_con_tramos(leer_ordenes_por_lotes(ordenes_dir, tamano_lote), "leer_lote")
+    else:
+        df_pdfs = procesar_pdfs(ordenes_dir)
+        lotes = [df_pdfs] if not df_pdfs.empty else []
+
+    partes = []
+    for numero, df_lote in enumerate(lotes, start=1):
+        if tamano_lote:
+            print(f"📦 Batch {numero}: {len(df_lote)} records")
+            reportar_progreso("procesar_lote", numero)
+        warnings.extend(procesar_lote(df_lote, contexto, indice_proveedores, fecha_pedido))
+        if tamano_lote:
+            # De cada lote solo se conservan los errores y la versión consolidada de los válidos
+            validas = filas_validas(df_lote)
+            df_lote = pd.concat(
+                [_preagrupar_lote(df_lote.loc[validas]), df_lote.loc[~validas]], ignore_index=True
+            ).reindex(columns=df_lote.columns)
+        partes.append(df_lote)
+        del df_lote
+
+    if not partes:
+        print("⚠️ No records found in Excel files.")
+        return {'df_final': pd.DataFrame(), 'df_errores': pd.DataFrame(),
+                'archivo_salida': None, 'archivos': {}, 'indice_division': None, 'warnings': warnings}
+
+    verificar_cancelacion()
+    with tramo("consolidar", partes=len(partes)) as datos:
+        df = concatenar(partes)
+        datos["filas"] = len(df)
+    del partes
+
+    df_errores = separar_errores(df)
+    df_final = asignar_id_final(df.loc[filas_validas(df)])
+    del df
+    ajustar_cantidades_formato_minimo(df_final, products_manager=contexto.products_manager)
+
+    # Última revisión: una vez que se empieza a escribir la salida se termina
+    verificar_cancelacion()
+    archivos, indice_division = {}, None
+    if guardar:
+        if archivo_salida is None:
+            archivo_salida = _nombre_archivo_salida(base_dir)
+        archivos = guardar_salidas(df_final, df_errores, archivo_salida, formatos)
+        # Artefacto de la corrida y diferencias con la anterior (Salidas/corridas/)
+        archivos.update(registrar_corrida(df_final, df_errores, archivo_salida, region))
+        if dividir_por:
+            carpeta = os.path.splitext(archivo_salida)[0]
+            indice_division = escribir_por_proveedor(df_final, carpeta, dividir_por, procesos)
+
+    print(f"🎉 Processing completed: {len(df_final)} records, {len(df_errores)} errors")
+    return {'df_final': df_final, 'df_errores': df_errores, 'archivo_salida': archivo_salida,
+            'archivos': archivos, 'indice_division': indice_division, 'warnings': warnings}
+
+
+def _nombre_archivo_salida(base_dir):
+    """Mismo nombre de salida que usa la interfaz (con timestamp si falla)"""
+    os.makedirs(os.path.join(base_dir, "Salidas"), exist_ok=True)
+    try:
+        return obtener_nombre_archivo_salida(os.path.join(base_dir, "Full-Agenda", "Agenda.xlsm"), base_dir)
+    except Exception:
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        return os.path.join(base_dir, "Salidas", f"PEDIDOS_CD_OVIEDO_{timestamp}.xlsx")
+
+
+if __name__ == "__main__":
+    import argparse
+    import contextlib
+    import multiprocessing
+
+    # Necesario para el pool de procesos de --dividir en el ejecutable empaquetado
+    multiprocessing.freeze_support()
+
+    parser = argparse.ArgumentParser(description="Procesa las órdenes sin abrir la interfaz")
+    parser.add_argument("--base", default=None, help="Carpeta del sistema (default: la de este script)")
+    parser.add_argument("--region", default=REGION_DEFAULT, help="Región de Full.xlsx")
+    parser.add_argument("--lotes", type=int, nargs="?", const=TAMANO_LOTE_DEFAULT, default=None,
+                        help=f"Procesar por lotes de N líneas (default {TAMANO_LOTE_DEFAULT})")
+    parser.add_argument("--salida", default=None, help="Ruta del Excel de salida")
+    parser.add_argument("--dividir", nargs="?", const="PROVEEDOR", default=None, choices=PARTICIONES,
+                        help="Escribir además un Excel por PROVEEDOR (default) o por ID PEDIDO")
+    parser.add_argument("--procesos", type=int, default=None,
+                        help="Procesos para escribir los archivos divididos (default: núcleos)")
+    parser.add_argument("--formatos", default=",".join(FORMATOS_DEFAULT),
+                        help=f"Formatos de salida separados por coma: {', '.join(ESCRITORES)} (default xlsx)")
+    parser.add_argument("--perfilar", type=int, nargs="?", const=TOP_PERFIL, default=None, metavar="N",
+                        help=f"Perfilar la corrida (Salidas/profiles/) y mostrar las N funciones más lentas (default {TOP_PERFIL})")
+    parser.add_argument("--traza", nargs="?", const=True, default=None, metavar="RUTA",
+                        help="Guardar la línea de tiempo de las etapas en formato Chrome trace "
+                             "(default Salidas/profiles/traza_<fecha>.json)")
+    args = parser.parse_args()
+
+    base = args.base or os.path.dirname(os.path.abspath(__file__))
+    ruta_traza = None
+    if args.traza:
+        ruta_traza = args.traza if args.traza is not True else os.path.join(
+            base, "Salidas", "profiles", f"traza_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
+    perfil = contextlib.nullcontext()
+    if args.perfilar:
+        # El perfil ya incluye los tramos de las etapas en su .trace.json; con
+        # --traza se guardan también en esa ruta
+        perfil = perfilar(os.path.join(base, "Salidas", "profiles"), top=args.perfilar, ruta_traza=ruta_traza)
+    elif ruta_traza:
+        perfil = trazar(ruta_traza)
+
+    try:
+        with perfil:
+            resultado = ejecutar_pipeline(args.base, args.region, args.lotes, args.salida,
+                                          dividir_por=args.dividir, procesos=args.procesos,
+                                          formatos=[f.strip().lower() for f in args.formatos.split(",") if f.strip()])
+    except Exception as e:
+        print(f"❌ {e}")
+        sys.exit(1)
+    for archivo in resultado['archivos'].values():
+        if archivo:
+            print(f"📁 {archivo}")
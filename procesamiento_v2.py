@@ -22,12 +22,24 @@ if os.path.exists(libs_path) and libs_path not in sys.path:
 
 import re
 # import fitz  # PyMuPDF - NO NECESARIO, ya no procesamos PDFs
+import numpy as np
 import pandas as pd
 import xlwings as xw
 from datetime import datetime
 from openpyxl import load_workbook
 from openpyxl.styles import Font, Alignment, PatternFill, Border, Side
 
+from gestor_trabajos import Cancelado, reportar_progreso, CADA_FILAS
+from lector_excel import leer_excel
+from trazas import tramo, trazado
+from esquema_pedidos import (
+    COLUMNAS_CATEGORICAS, aplicar_esquema, columna_vacia, mapear_texto, asignar
+)
+from errores_pedidos import (
+    COLUMNA_ETAPA_ERROR, COLUMNA_MOTIVO_ERROR, agregar_columnas_error,
+    filas_validas, marcar_error, renderizar_observacion, separar_errores
+)
+
 # --- Utilidades y funciones auxiliares optimizadas ---
 
 def clean_qty(qtext):
@@ -139,6 +151,134 @@ def extract_items_from_text(text):
 
 # --- Procesamiento principal de PDFs optimizado ---
 
+def _extraer_item_orden(local_entrega, descr_centro, cod_material, cantidad, fname, fila=None):
+    """
+    Convierte una fila de la planilla de órdenes en un item del pedido
+
+    Args:
+        local_entrega, descr_centro, cod_material, cantidad: Valores de las columnas
+            LOCAL_ENTREGA_CTRPED, DESCR_CEN_CADCEN, COD_MAT_PEDCOM y QTDE_PEDIDA_PEDCOM
+        fname: Nombre del archivo de origen
+        fila: Número de fila en el Excel de origen (opcional)
+
+    Returns:
+        Tuple (item, razon): dict del item, o None y el motivo del rechazo
+    """
+    # Extraer datos de las columnas
+    centro_costo = str(local_entrega).strip()
+    nombre_lugar = str(descr_centro).strip()
+    sku = str(cod_material).strip().upper()
+    cantidad_raw = str(cantidad).strip()
+    
+    # Limpiar y validar cantidad
+    qty = clean_qty(cantidad_raw)
+    
+    # Validaciones más flexibles
+    sku_valido = sku and sku != 'NAN' and sku.lower() != 'nan' and len(sku) > 0
+    centro_valido = centro_costo and centro_costo != 'nan' and centro_costo.lower() != 'nan'
+    cantidad_valida = isinstance(qty, (int, float)) and qty > 0
+    
+    if not (sku_valido and cantidad_valida):
+        razon = []
+        if not sku_valido:
+            razon.append(f"SKU invalid: '{sku}'")
+        if not cantidad_valida:
+            razon.append(f"QTY invalid: '{cantidad_raw}' -> {qty}")
+        return None, '; '.join(razon)
+    
+    # Usar valores por defecto si faltan datos opcionales
+    if not centro_valido:
+        centro_costo = "UNKNOWN"
+    if not nombre_lugar or nombre_lugar == 'nan' or nombre_lugar.lower() == 'nan':
+        nombre_lugar = "UNKNOWN"
+    
+    return {
+        "LOCAL": "30797",
+        "SKU": sku,
+        "CANTIDAD": float(qty),  # Mantener como float para conservar decimales
+        "CENTRO_COSTO": centro_costo,
+        "NOMBRE_LUGAR": nombre_lugar,
+        "_SRC_FILE": fname,
+        "_SRC_ROW": fila
+    }, None
+
+
+def _leer_items_archivo(path, fname):
+    """
+    Lee una planilla de órdenes y extrae sus items
+
+    Returns:
+        Lista de items (dicts de _extraer_item_orden); vacía si el archivo no
+        se pudo leer, le faltan columnas o no tiene items válidos
+    """
+    required_columns = COLUMNAS_ORDENES
+    try:
+        with tramo(f"leer {fname}", "lectura", archivo=fname) as datos:
+            df_excel = leer_excel(path, columnas=required_columns)
+            datos["filas"] = len(df_excel)
+    except Exception as e:
+        print(f"❌ Error reading Excel file {fname}: {e}")
+        return []
+    
+    # Verificar que existan las columnas requeridas
+    missing_columns = [col for col in required_columns if col not in df_excel.columns]
+    
+    if missing_columns:
+        print(f"❌ Missing columns in {fname}: {missing_columns}")
+        print(f"📋 Available columns: {list(df_excel.columns)}")
+        return []
+    
+    # Procesar cada fila del Excel
+    rows = []
+    items_rechazados = 0
+    print(f"📋 Total rows in Excel: {len(df_excel)}")
+    
+    filas = df_excel[required_columns].itertuples(index=False, name=None)
+    for idx, valores in enumerate(filas):
+        if idx % CADA_FILAS == 0:
+            reportar_progreso(f"leer {fname}", idx, len(df_excel))
+        try:
+            # Fila del Excel: +1 por el encabezado y +1 porque idx empieza en 0
+            item, razon = _extraer_item_orden(*valores, fname, idx + 2)
+            if item is not None:
+                rows.append(item)
+            else:
+                items_rechazados += 1
+                print(f"⚠️ Row {idx+1} rejected: {razon}")
+                
+        except Exception as e:
+            items_rechazados += 1
+            print(f"⚠️ Error processing row {idx+1}: {e}")
+    
+    print(f"📊 Processing results for {fname}:")
+    print(f"   • Total rows: {len(df_excel)}")
+    print(f"   • Valid items: {len(rows)}")
+    print(f"   • Rejected items: {items_rechazados}")
+    
+    if rows:
+        print(f"✅ {fname}: {len(rows)} items extracted")
+    else:
+        print(f"❌ {fname}: No valid items found")
+    return rows
+
+
+def leer_archivo_ordenes(path):
+    """
+    Items de una sola planilla de órdenes (mismas columnas y validaciones que procesar_pdfs)
+
+    Permite leer solo los archivos nuevos o modificados y reutilizar los ya
+    leídos (ver vigilante_ordenes.py); concatenar() de varias planillas en
+    orden alfabético da el mismo resultado que procesar_pdfs.
+
+    Returns:
+        DataFrame con COLUMNAS_ITEMS (vacío si el archivo no tiene items válidos)
+    """
+    fname = os.path.basename(path)
+    print(f"📖 Processing: {fname}")
+    return aplicar_esquema(pd.DataFrame(_leer_items_archivo(path, fname), columns=COLUMNAS_ITEMS))
+
+
+@trazado("lectura_ordenes", "lectura")
 def procesar_pdfs(ordenes_dir):
     """
     Procesa archivo Excel en la carpeta de órdenes (anteriormente procesaba PDFs)
@@ -158,7 +298,7 @@ def procesar_pdfs(ordenes_dir):
     
     if not excel_files:
         print("⚠️ No Excel files found in orders folder")
-        return pd.DataFrame(columns=["LOCAL", "SKU", "CANTIDAD", "CENTRO_COSTO", "NOMBRE_LUGAR", "_SRC_FILE"])
+        return aplicar_esquema(pd.DataFrame(columns=COLUMNAS_ITEMS))
     
     print(f"📄 Found {len(excel_files)} Excel files to process")
     
@@ -167,96 +307,15 @@ def procesar_pdfs(ordenes_dir):
             path = os.path.join(ordenes_dir, fname)
             print(f"📖 Processing: {fname}")
             
-            # Leer archivo Excel
-            try:
-                df_excel = pd.read_excel(path, dtype=str)
-            except Exception as e:
-                try:
-                    df_excel = pd.read_excel(path, engine='openpyxl', dtype=str)
-                except Exception as e2:
-                    print(f"❌ Error reading Excel file {fname}: {e2}")
-                    archivos_con_errores += 1
-                    continue
-            
-            # Limpiar nombres de columnas
-            df_excel.columns = df_excel.columns.str.strip()
-            
-            # Verificar que existan las columnas requeridas
-            required_columns = ['LOCAL_ENTREGA_CTRPED', 'DESCR_CEN_CADCEN', 'COD_MAT_PEDCOM', 'QTDE_PEDIDA_PEDCOM']
-            missing_columns = [col for col in required_columns if col not in df_excel.columns]
-            
-            if missing_columns:
-                print(f"❌ Missing columns in {fname}: {missing_columns}")
-                print(f"📋 Available columns: {list(df_excel.columns)}")
-                archivos_con_errores += 1
-                continue
-            
-            # Procesar cada fila del Excel
-            items_procesados = 0
-            items_rechazados = 0
-            print(f"📋 Total rows in Excel: {len(df_excel)}")
-            
-            for idx, row in df_excel.iterrows():
-                try:
-                    # Extraer datos de las columnas
-                    centro_costo = str(row['LOCAL_ENTREGA_CTRPED']).strip()
-                    nombre_lugar = str(row['DESCR_CEN_CADCEN']).strip()
-                    sku = str(row['COD_MAT_PEDCOM']).strip().upper()
-                    cantidad_raw = str(row['QTDE_PEDIDA_PEDCOM']).strip()
-                    
-                    # Limpiar y validar cantidad
-                    qty = clean_qty(cantidad_raw)
-                    
-                    # Validaciones más flexibles
-                    sku_valido = sku and sku != 'NAN' and sku.lower() != 'nan' and len(sku) > 0
-                    centro_valido = centro_costo and centro_costo != 'nan' and centro_costo.lower() != 'nan'
-                    cantidad_valida = isinstance(qty, (int, float)) and qty > 0
-                    
-                    if sku_valido and cantidad_valida:
-                        # Usar valores por defecto si faltan datos opcionales
-                        if not centro_valido:
-                            centro_costo = "UNKNOWN"
-                        if not nombre_lugar or nombre_lugar == 'nan' or nombre_lugar.lower() == 'nan':
-                            nombre_lugar = "UNKNOWN"
-                        
-                        # Convertir cantidad a float para mantener decimales
-                        cantidad_final = float(qty)
-                        
-                        rows.append({
-                            "LOCAL": "30797",
-                            "SKU": sku,
-                            "CANTIDAD": cantidad_final,  # Mantener como float
-                            "CENTRO_COSTO": centro_costo,
-                            "NOMBRE_LUGAR": nombre_lugar,
-                            "_SRC_FILE": fname
-                        })
-                        items_procesados += 1
-                    else:
-                        items_rechazados += 1
-                        razon = []
-                        if not sku_valido:
-                            razon.append(f"SKU invalid: '{sku}'")
-                        if not cantidad_valida:
-                            razon.append(f"QTY invalid: '{cantidad_raw}' -> {qty}")
-                        
-                        print(f"⚠️ Row {idx+1} rejected: {'; '.join(razon)}")
-                        
-                except Exception as e:
-                    items_rechazados += 1
-                    print(f"⚠️ Error processing row {idx+1}: {e}")
-            
-            print(f"📊 Processing results for {fname}:")
-            print(f"   • Total rows: {len(df_excel)}")
-            print(f"   • Valid items: {items_procesados}")
-            print(f"   • Rejected items: {items_rechazados}")
-            
-            if items_procesados > 0:
-                print(f"✅ {fname}: {items_procesados} items extracted")
+            items = _leer_items_archivo(path, fname)
+            if items:
+                rows.extend(items)
                 archivos_procesados += 1
             else:
-                print(f"❌ {fname}: No valid items found")
                 archivos_con_errores += 1
                 
+        except Cancelado:
+            raise
         except Exception as e:
             print(f"❌ Error processing {fname}: {e}")
             archivos_con_errores += 1
@@ -266,25 +325,185 @@ def procesar_pdfs(ordenes_dir):
     print(f"   • Files with errors: {archivos_con_errores}")
     print(f"   • Total records extracted: {len(rows)}")
 
-    return pd.DataFrame(rows).reset_index(drop=True)
+    return aplicar_esquema(pd.DataFrame(rows).reset_index(drop=True))
+
+# Filas por lote al leer las órdenes en modo por lotes
+TAMANO_LOTE_DEFAULT = 50000
+
+COLUMNAS_ORDENES = ['LOCAL_ENTREGA_CTRPED', 'DESCR_CEN_CADCEN', 'COD_MAT_PEDCOM', 'QTDE_PEDIDA_PEDCOM']
+COLUMNAS_ITEMS = ["LOCAL", "SKU", "CANTIDAD", "CENTRO_COSTO", "NOMBRE_LUGAR", "_SRC_FILE", "_SRC_ROW"]
+
+
+def _valor_celda_texto(valor):
+    """Convierte una celda de openpyxl al mismo texto que produce pd.read_excel(dtype=str)"""
+    if valor is None:
+        return 'nan'
+    if isinstance(valor, float) and valor.is_integer():
+        return str(int(valor))
+    return str(valor)
+
+
+def _filas_excel(path, fname):
+    """
+    Recorre las filas de una planilla de órdenes sin cargarla entera
+
+    Los .xlsx se leen con openpyxl en modo read_only (una fila a la vez);
+    los .xls (máximo 65.536 filas) se leen con pandas.
+
+    Yields:
+        Tuple (numero_fila, valores) con los 4 valores de COLUMNAS_ORDENES
+    """
+    if fname.lower().endswith('.xls'):
+        df_excel = leer_excel(path, columnas=COLUMNAS_ORDENES)
+        faltantes = [col for col in COLUMNAS_ORDENES if col not in df_excel.columns]
+        if faltantes:
+            raise ValueError(f"Missing columns: {faltantes}")
+        for idx, valores in enumerate(df_excel[COLUMNAS_ORDENES].itertuples(index=False, name=None)):
+            yield idx + 1, valores
+        return
+
+    wb = load_workbook(path, read_only=True, data_only=True)
+    try:
+        filas = wb.worksheets[0].iter_rows(values_only=True)
+        encabezado = next(filas, None) or ()
+        columnas = [str(c).strip() if c is not None else "" for c in encabezado]
+        faltantes = [col for col in COLUMNAS_ORDENES if col not in columnas]
+        if faltantes:
+            raise ValueError(f"Missing columns: {faltantes}")
+        posiciones = [columnas.index(col) for col in COLUMNAS_ORDENES]
+
+        for idx, fila in enumerate(filas):
+            if not any(v is not None for v in fila):
+                continue  # Filas vacías (read_only suele reportar un rango de más)
+            yield idx + 1, [_valor_celda_texto(fila[p] if p < len(fila) else None) for p in posiciones]
+    finally:
+        wb.close()
+
+
+def leer_ordenes_por_lotes(ordenes_dir, tamano_lote=TAMANO_LOTE_DEFAULT):
+    """
+    Versión por lotes de procesar_pdfs para consolidaciones muy grandes
+
+    Lee las planillas fila a fila y entrega DataFrames de a lo sumo
+    tamano_lote items (mismas columnas y validaciones que procesar_pdfs),
+    de modo que la memoria usada depende del tamaño del lote y no del
+    total de líneas.
+
+    Args:
+        ordenes_dir: Carpeta con los archivos Excel de órdenes
+        tamano_lote: Cantidad máxima de items por lote
+
+    Yields:
+        DataFrame con columnas LOCAL, SKU, CANTIDAD, CENTRO_COSTO, NOMBRE_LUGAR, _SRC_FILE
+    """
+    if not os.path.exists(ordenes_dir):
+        raise FileNotFoundError(f"❌ Orders folder not found: {ordenes_dir}")
+
+    print(f"📂 Processing Excel files in batches of {tamano_lote} from: {ordenes_dir}")
+    excel_files = [f for f in sorted(os.listdir(ordenes_dir)) if f.lower().endswith(('.xlsx', '.xls'))]
+    if not excel_files:
+        print("⚠️ No Excel files found in orders folder")
+        return
+
+    rows = []
+    total_items = 0
+    for fname in excel_files:
+        print(f"📖 Processing: {fname}")
+        items_procesados = 0
+        items_rechazados = 0
+        try:
+            for idx, valores in _filas_excel(os.path.join(ordenes_dir, fname), fname):
+                if idx % CADA_FILAS == 0:
+                    reportar_progreso(f"leer {fname}", idx)
+                try:
+                    # Fila del Excel: +1 por el encabezado
+                    item, razon = _extraer_item_orden(*valores, fname, idx + 1)
+                except Exception as e:
+                    items_rechazados += 1
+                    print(f"⚠️ Error processing row {idx}: {e}")
+                    continue
+                if item is None:
+                    items_rechazados += 1
+                    print(f"⚠️ Row {idx} rejected: {razon}")
+                    continue
+
+                rows.append(item)
+                items_procesados += 1
+                if len(rows) >= tamano_lote:
+                    yield aplicar_esquema(pd.DataFrame(rows, columns=COLUMNAS_ITEMS))
+                    rows = []
+        except Cancelado:
+            raise
+        except Exception as e:
+            print(f"❌ Error processing {fname}: {e}")
+
+        total_items += items_procesados
+        print(f"📊 {fname}: {items_procesados} valid items, {items_rechazados} rejected")
+
+    if rows:
+        yield aplicar_esquema(pd.DataFrame(rows, columns=COLUMNAS_ITEMS))
+    print(f"   • Total records extracted: {total_items}")
+
+# --- Flujo sobre un único DataFrame ---
+# Las etapas (marcar_*) trabajan en el lugar sobre el mismo DataFrame: en vez de
+# separar copias de válidos y errores, marcan cada fila que falla con su etapa y
+# código de motivo (ver errores_pedidos.py). Las funciones clásicas
+# (validar_skus_items, mapear_proveedor_por_sku, ...) se mantienen como
+# envoltorios que devuelven los DataFrames separados de siempre.
+
+# Columnas que agregan las etapas, en el orden en que aparecen en la hoja Errors
+COLUMNAS_FLUJO = ["OBSERVACION", "PROVEEDOR", "_REGLA_ESPECIAL", "FECHA_ENTREGA"]
+
+
+def preparar_flujo(df):
+    """
+    Agrega (en el lugar) las columnas de estado que usan las etapas marcar_*
+
+    Args:
+        df: DataFrame de items (salida de procesar_pdfs o de un lote)
+
+    Returns:
+        El mismo DataFrame
+    """
+    if not df.index.is_unique:
+        df.reset_index(drop=True, inplace=True)
+    for col in COLUMNAS_FLUJO:
+        if col not in df.columns:
+            df[col] = columna_vacia(len(df)) if col in COLUMNAS_CATEGORICAS else None
+    agregar_columnas_error(df)
+    return aplicar_esquema(df)
+
+
+def _errores_renderizados(trabajo, mask, columnas):
+    """Filas con error de un envoltorio clásico, con la OBSERVACION histórica"""
+    df_err = trabajo.loc[mask, columnas]
+    df_err["OBSERVACION"] = renderizar_observacion(trabajo.loc[mask])
+    return df_err
+
 
 # --- Validación de SKUs optimizada ---
 
-def validar_skus_items(df, products_manager=None):
+@trazado("validar_skus")
+def marcar_skus_items(df, products_manager=None):
     """
-    Valida que los SKUs estén en la lista maestra de productos (compra calzada)
-    Ahora usa ProductsManager en lugar de Items.xlsx
+    Marca (en el lugar) las filas cuyo SKU no está en la lista maestra de productos
+
+    Args:
+        df: DataFrame del flujo (ver preparar_flujo)
+        products_manager: ProductsManager a usar (opcional, usa la instancia compartida)
+
+    Returns:
+        Lista de mensajes para el log
     """
+    from contexto_ejecucion import obtener_manager
     from products_manager import ProductsManager
     
-    df = df.copy()
-    df_err = pd.DataFrame(columns=df.columns.tolist() + ["OBSERVACION"])
     warnings = []
 
     try:
-        # Inicializar ProductsManager si no se proporciona
+        # Usar la instancia compartida si no se proporciona
         if products_manager is None:
-            products_manager = ProductsManager()
+            products_manager = obtener_manager(ProductsManager)
         
         print(f"🔍 Validating SKUs against Products Master List...")
         
@@ -294,289 +513,378 @@ def validar_skus_items(df, products_manager=None):
         if not skus_validos:
             warnings.append(f"⚠️ No products found in master list - validation skipped")
             warnings.append(f"💡 Use Products Manager to add products")
-            return df, df_err, warnings
+            return warnings
         
         warnings.append(f"✅ Products loaded: {len(skus_validos)} valid SKUs found")
         
         # Validar cada SKU
-        df_skus = df["SKU"].str.strip().str.upper()
+        validas = filas_validas(df)
+        df_skus = mapear_texto(df.loc[validas, "SKU"], lambda sku: str(sku).strip().upper())
         mask_no_en_items = ~df_skus.isin(skus_validos)
         
         if mask_no_en_items.any():
-            df_err_items = df.loc[mask_no_en_items].copy()
-            df_err_items["OBSERVACION"] = (
-                df_err_items["CENTRO_COSTO"].fillna("") + 
-                "//Falta Producto en Maestra C.Calzada//" + 
-                df_err_items["NOMBRE_LUGAR"].fillna("")
-            )
-            df_err = pd.concat([df_err, df_err_items], ignore_index=True)
+            indices = mask_no_en_items.index[mask_no_en_items.to_numpy()]
+            marcar_error(df, indices, "FALTA_PRODUCTO")
             
             # Mostrar algunos ejemplos de SKUs no encontrados
             skus_no_encontrados = df_skus[mask_no_en_items].unique()[:5]
-            warnings.append(f"⚠️ {len(df_err_items)} SKUs faltan en Maestra C.Calzada")
+            warnings.append(f"⚠️ {len(indices)} SKUs faltan en Maestra C.Calzada")
             warnings.append(f"📋 Examples: {list(skus_no_encontrados)}")
             warnings.append(f"💡 Add missing SKUs via Products Manager")
         
-        # Retornar solo los válidos
-        df_valid = df.loc[~mask_no_en_items].copy()
-        warnings.append(f"✅ Valid SKUs: {len(df_valid)}")
+        warnings.append(f"✅ Valid SKUs: {int((~mask_no_en_items).sum())}")
         
     except Exception as e:
-        warnings.append(f"❌ Error validating products: {e}")
-        df_valid = df.copy()  # Si hay error, continuar sin validación
+        warnings.append(f"❌ Error validating products: {e}")  # Si hay error, continuar sin validación
     
+    return warnings
+
+
+def validar_skus_items(df, products_manager=None):
+    """
+    Valida que los SKUs estén en la lista maestra de productos (compra calzada)
+    Ahora usa ProductsManager en lugar de Items.xlsx
+
+    Envoltorio de marcar_skus_items que devuelve (df_valid, df_err, warnings)
+    """
+    columnas = df.columns.tolist()
+    trabajo = preparar_flujo(df.copy())
+    warnings = marcar_skus_items(trabajo, products_manager)
+    
+    validas = filas_validas(trabajo)
+    df_valid = trabajo.loc[validas, columnas]
+    df_err = _errores_renderizados(trabajo, ~validas, columnas + ["OBSERVACION"]).reset_index(drop=True)
     return df_valid, df_err, warnings
 
 # --- Mapeo de proveedores optimizado ---
 
-def mapear_proveedor_por_sku(df, full_xlsx, region="099", apply_rules=True):
+# Esquema detectado de cada Full.xlsx: ruta -> (firma del archivo, esquema)
+_ESQUEMAS_FULL = {}
+
+
+def _detectar_columnas_full(columnas):
+    """Busca las columnas de SKU, proveedor y región por nombre"""
+    col_sku = None
+    col_proveedor = None
+    col_region = None
+
+    # Buscar columna SKU
+    for col in columnas:
+        if any(keyword in col.lower() for keyword in ['sku', 'codigo', 'code', 'artículo', 'articulo']):
+            col_sku = col
+            break
+
+    # Buscar columna proveedor
+    for col in columnas:
+        if any(keyword in col.lower() for keyword in ['proveedor', 'supplier', 'vendor']):
+            col_proveedor = col
+            break
+
+    # Buscar columna región - primero por nombre exacto
+    possible_region_columns = ['Región', 'Region', 'region', 'REGION', 'zona', 'Zona', 'ZONA']
+    for col_name in possible_region_columns:
+        if col_name in columnas:
+            col_region = col_name
+            break
+
+    if not col_region:
+        # Buscar por coincidencia parcial
+        for col in columnas:
+            if any(keyword in col.lower() for keyword in ['region', 'zona', 'area']):
+                col_region = col
+                break
+
+    return col_sku, col_proveedor, col_region
+
+
+def detectar_esquema_full(full_xlsx):
     """
-    Mapea proveedores por SKU desde Full.xlsx
-    Versión optimizada con mejor manejo de datos y logging
-    
+    Detecta las columnas de SKU, proveedor y región de Full.xlsx leyendo solo el encabezado
+
+    El resultado se guarda por archivo y se reutiliza mientras el archivo no
+    cambie (misma firma: inodo, fecha de modificación y tamaño).
+
+    Args:
+        full_xlsx: Ruta al archivo Full.xlsx
+
+    Returns:
+        Dict con 'columnas' (todas) y 'sku', 'proveedor', 'region' (None si no se encontró)
+    """
+    from almacenamiento import firma_archivo
+
+    ruta = os.path.abspath(full_xlsx)
+    firma = firma_archivo(ruta)
+    guardado = _ESQUEMAS_FULL.get(ruta)
+    if guardado is not None and guardado[0] == firma:
+        return guardado[1]
+
+    columnas = list(leer_excel(full_xlsx, nrows=0).columns)
+    col_sku, col_proveedor, col_region = _detectar_columnas_full(columnas)
+    esquema = {'columnas': columnas, 'sku': col_sku, 'proveedor': col_proveedor, 'region': col_region}
+    _ESQUEMAS_FULL[ruta] = (firma, esquema)
+    return esquema
+
+
+@trazado("indice_full", "lectura")
+def construir_indice_proveedores(full_xlsx, region="099", warnings=None):
+    """
+    Construye el índice SKU -> lista de proveedores desde Full.xlsx
+
+    Se separa de mapear_proveedor_por_sku para que el procesamiento por lotes
+    lea Full.xlsx una sola vez y reutilice el índice en todos los lotes.
+
     Args:
-        df: DataFrame con datos a procesar
         full_xlsx: Ruta al archivo Full.xlsx
         region: Región a filtrar (default "099")
-        apply_rules: Si True, aplica reglas especiales (default True)
+        warnings: Lista donde agregar los mensajes (opcional)
+
+    Returns:
+        Dict SKU -> lista de proveedores, o None si Full.xlsx no se pudo usar
     """
-    print(f"🔍 Mapping suppliers from: {full_xlsx}")
-    print(f"📍 Using region: {region}")
-    
-    df = df.copy()
-    df_err = pd.DataFrame(columns=df.columns.tolist() + ["OBSERVACION"])
-    warnings = []
-    
-    # Cargar reglas especiales si están habilitadas
-    rules_manager = None
-    if apply_rules:
-        try:
-            from rules_manager import RulesManager
-            rules_manager = RulesManager()
-            stats = rules_manager.get_stats()
-            if stats['active_local_rules'] > 0 or stats['active_stock_blocks'] > 0:
-                warnings.append(f"⚙️ Special rules loaded: {stats['active_local_rules']} LOCAL rules, {stats['active_stock_blocks']} stock blocks")
-                print(f"⚙️ Applying special rules: {stats['active_local_rules']} LOCAL rules, {stats['active_stock_blocks']} stock blocks")
-            else:
-                rules_manager = None  # No hay reglas activas
-        except Exception as e:
-            warnings.append(f"⚠️ Could not load special rules: {e}")
-            rules_manager = None
+    if warnings is None:
+        warnings = []
+
+    # Verificar que el archivo exista
+    if not os.path.exists(full_xlsx):
+        warnings.append(f"❌ Full.xlsx not found: {full_xlsx}")
+        return None
 
+    # Columnas a usar (solo encabezado, cacheado por archivo)
     try:
-        # Verificar que el archivo exista
-        if not os.path.exists(full_xlsx):
-            warnings.append(f"❌ Full.xlsx not found: {full_xlsx}")
-            return df, df_err, warnings
+        esquema = detectar_esquema_full(full_xlsx)
+    except Exception as e:
+        warnings.append(f"❌ Error reading Full.xlsx: {e}")
+        return None
 
-        # Leer Full.xlsx
-        try:
-            df_full = pd.read_excel(full_xlsx, dtype=str)
-        except Exception as e:
-            try:
-                df_full = pd.read_excel(full_xlsx, engine='openpyxl', dtype=str)
-            except Exception as e2:
-                warnings.append(f"❌ Error reading Full.xlsx: {e2}")
-                return df, df_err, warnings
-        
-        # Limpiar nombres de columnas
-        df_full.columns = df_full.columns.str.strip()
-        warnings.append(f"📊 Full.xlsx loaded: {len(df_full)} records")
-        warnings.append(f"📋 Columns: {list(df_full.columns)}")
-        
-        # Buscar columnas necesarias
-        col_sku_full = None
-        col_proveedor = None
-        
-        # Buscar columna SKU
-        for col in df_full.columns:
-            if any(keyword in col.lower() for keyword in ['sku', 'codigo', 'code', 'artículo', 'articulo']):
-                col_sku_full = col
-                break
-        
-        # Buscar columna proveedor
-        for col in df_full.columns:
-            if any(keyword in col.lower() for keyword in ['proveedor', 'supplier', 'vendor']):
-                col_proveedor = col
-                break
-        
-        if not col_sku_full:
-            warnings.append(f"❌ SKU column not found in Full.xlsx")
-            return df, df_err, warnings
-            
-        if not col_proveedor:
-            warnings.append(f"❌ Supplier column not found in Full.xlsx")
-            return df, df_err, warnings
-        
-        warnings.append(f"✅ Using SKU column: {col_sku_full}")
-        warnings.append(f"✅ Using supplier column: {col_proveedor}")
-        
-        # Filtrar por región - buscar columna específicamente
-        col_region = None
-        possible_region_columns = ['Región', 'Region', 'region', 'REGION', 'zona', 'Zona', 'ZONA']
-        
-        for col_name in possible_region_columns:
-            if col_name in df_full.columns:
-                col_region = col_name
-                break
-        
-        if not col_region:
-            # Buscar por coincidencia parcial
-            for col in df_full.columns:
-                if any(keyword in col.lower() for keyword in ['region', 'zona', 'area']):
-                    col_region = col
-                    break
-        
-        if col_region:
-            # Filtrar por región específica
-            mask_region = df_full[col_region].astype(str).str.strip() == str(region)
-            df_region = df_full[mask_region].copy()
+    warnings.append(f"📋 Columns: {esquema['columnas']}")
+    col_sku_full = esquema['sku']
+    col_proveedor = esquema['proveedor']
+    col_region = esquema['region']
+
+    if not col_sku_full:
+        warnings.append(f"❌ SKU column not found in Full.xlsx")
+        return None
+
+    if not col_proveedor:
+        warnings.append(f"❌ Supplier column not found in Full.xlsx")
+        return None
+
+    warnings.append(f"✅ Using SKU column: {col_sku_full}")
+    warnings.append(f"✅ Using supplier column: {col_proveedor}")
+
+    # Leer Full.xlsx (solo las columnas detectadas)
+    try:
+        df_full = leer_excel(full_xlsx, columnas=[c for c in (col_sku_full, col_proveedor, col_region) if c])
+    except Exception as e:
+        warnings.append(f"❌ Error reading Full.xlsx: {e}")
+        return None
+    warnings.append(f"📊 Full.xlsx loaded: {len(df_full)} records")
+
+    if col_region:
+        # Filtrar por región específica
+        mask_region = df_full[col_region].astype(str).str.strip() == str(region)
+        df_region = df_full[mask_region].copy()
+
+        # Mostrar información de filtrado
+        total_regions = df_full[col_region].astype(str).str.strip().unique()
+        warnings.append(f"🌍 Found region column: {col_region}")
+        warnings.append(f"📊 Available regions: {sorted(total_regions)}")
+        warnings.append(f"� Filtered by region '{region}': {len(df_region)} records (from {len(df_full)} total)")
+
+        if len(df_region) == 0:
+            warnings.append(f"⚠️ No records found for region '{region}', using all records")
+            df_region = df_full.copy()
+    else:
+        df_region = df_full.copy()
+        warnings.append(f"⚠️ No region column found, using all records")
+
+    # Crear diccionario de mapeo SKU -> Lista de Proveedores (puede haber múltiples)
+    df_region_clean = df_region.dropna(subset=[col_sku_full, col_proveedor])
+    sku_to_proveedores = {}  # SKU -> lista de proveedores disponibles
+
+    for _, row in df_region_clean.iterrows():
+        sku = str(row[col_sku_full]).strip().upper()
+        proveedor = str(row[col_proveedor]).strip()
+        # Normalizar código de proveedor eliminando .0 si existe
+        proveedor = proveedor.replace('.0', '') if proveedor.endswith('.0') else proveedor
+
+        if sku and proveedor and sku != 'NAN' and proveedor != 'NAN':
+            if sku not in sku_to_proveedores:
+                sku_to_proveedores[sku] = []
+            if proveedor not in sku_to_proveedores[sku]:
+                sku_to_proveedores[sku].append(proveedor)
+
+    warnings.append(f"📋 Created mapping for {len(sku_to_proveedores)} SKUs")
+
+    # Mostrar SKUs con múltiples proveedores
+    multi_prov = {sku: provs for sku, provs in sku_to_proveedores.items() if len(provs) > 1}
+    if multi_prov:
+        warnings.append(f"🔀 {len(multi_prov)} SKUs have multiple suppliers:")
+        for sku, provs in list(multi_prov.items())[:3]:  # Mostrar solo 3 ejemplos
+            warnings.append(f"   • {sku}: {len(provs)} suppliers → {provs}")
+
+    return sku_to_proveedores
+
+
+def _cargar_reglas_activas(apply_rules, rules_manager, warnings):
+    """
+    Resuelve el RulesManager a usar (None si no hay reglas activas)
+
+    Args:
+        apply_rules: Si False, no se aplican reglas
+        rules_manager: RulesManager a usar (opcional, usa la instancia compartida)
+        warnings: Lista donde agregar los mensajes
+    """
+    if not apply_rules:
+        return None
+    try:
+        if rules_manager is None:
+            from contexto_ejecucion import obtener_manager
+            from rules_manager import RulesManager
+            rules_manager = obtener_manager(RulesManager)
+        stats = rules_manager.get_stats()
+        if stats['active_local_rules'] > 0 or stats['active_stock_blocks'] > 0:
+            warnings.append(f"⚙️ Special rules loaded: {stats['active_local_rules']} LOCAL rules, {stats['active_stock_blocks']} stock blocks")
+            print(f"⚙️ Applying special rules: {stats['active_local_rules']} LOCAL rules, {stats['active_stock_blocks']} stock blocks")
+            return rules_manager
+        return None  # No hay reglas activas
+    except Exception as e:
+        warnings.append(f"⚠️ Could not load special rules: {e}")
+        return None
+
+
+def _normalizar_proveedor(codigo):
+    """Normaliza un código de proveedor eliminando .0 final si existe"""
+    return codigo.replace('.0', '') if codigo.endswith('.0') else codigo
+
+
+def _decidir_proveedor(local, sku, proveedores_disponibles, rules_manager, warnings):
+    """
+    Aplica las reglas especiales a un par LOCAL + SKU
+
+    Returns:
+        Tuple (proveedor, motivo, tipo_regla, tiene_regla_especial): proveedor
+        asignado, o el proveedor involucrado con el código de motivo del error
+        (ver errores_pedidos.MOTIVOS_ERROR); tipo_regla es 'local', 'bloqueo'
+        o None según la regla que se aplicó
+    """
+    proveedores_disponibles = list(proveedores_disponibles)
+    
+    # REGLA 1: Verificar si hay regla de LOCAL + SKU → Proveedor forzado
+    # MÁXIMA PRIORIDAD - Esta regla sobrescribe todo lo demás
+    proveedor_forzado = rules_manager.get_proveedor_for_local_sku(local, sku)
+    if proveedor_forzado:
+        # Normalizar código de proveedor forzado (eliminar .0 si existe)
+        proveedor_forzado_norm = _normalizar_proveedor(proveedor_forzado)
+        
+        # Verificar si el proveedor forzado existe en los disponibles
+        if proveedor_forzado_norm in proveedores_disponibles:
+            # FORZAR este proveedor ignorando todo lo demás
+            print(f"   ⚙️ LOCAL+SKU rule applied: LOCAL {local} + SKU {sku} → Proveedor {proveedor_forzado_norm} (FORCED)")
+            return proveedor_forzado_norm, None, 'local', True
+        
+        # El proveedor forzado NO está en Full.xlsx para este SKU
+        # NO SE PUEDE CUMPLIR LA REGLA → No debe surtirse de ningún otro proveedor
+        # (cuenta como regla aplicada aunque falló)
+        print(f"   ❌ LOCAL+SKU rule FAILED: LOCAL {local} + SKU {sku} → Proveedor {proveedor_forzado_norm} NOT in Full.xlsx")
+        return proveedor_forzado_norm, "REGLA_NO_EN_FULL", 'local', True
+    
+    # REGLA 2: Aplicar bloqueos por quiebre de stock
+    # Solo si NO hay regla LOCAL+SKU forzada
+    if len(proveedores_disponibles) > 1:
+        # Solo aplicar bloqueos si hay más de 1 proveedor
+        proveedores_bloqueados = rules_manager.get_blocked_proveedores_for_sku(sku)
+        
+        if proveedores_bloqueados:
+            # Normalizar proveedores bloqueados
+            proveedores_bloqueados_norm = [_normalizar_proveedor(p) for p in proveedores_bloqueados]
             
-            # Mostrar información de filtrado
-            total_regions = df_full[col_region].astype(str).str.strip().unique()
-            warnings.append(f"🌍 Found region column: {col_region}")
-            warnings.append(f"📊 Available regions: {sorted(total_regions)}")
-            warnings.append(f"� Filtered by region '{region}': {len(df_region)} records (from {len(df_full)} total)")
+            # Filtrar proveedores bloqueados
+            proveedores_filtrados = [p for p in proveedores_disponibles if p not in proveedores_bloqueados_norm]
             
-            if len(df_region) == 0:
-                warnings.append(f"⚠️ No records found for region '{region}', using all records")
-                df_region = df_full.copy()
-        else:
-            df_region = df_full.copy()
-            warnings.append(f"⚠️ No region column found, using all records")
+            if proveedores_filtrados:
+                # Hay proveedores alternativos, usar los no bloqueados
+                print(f"   🚫 Stock block applied: SKU {sku} - blocked {proveedores_bloqueados_norm}, using {proveedores_filtrados}")
+                return proveedores_filtrados[0], None, 'bloqueo', False
+            # Todos los proveedores están bloqueados, mantener original
+            warnings.append(f"⚠️ All suppliers blocked for SKU {sku}, keeping all: {proveedores_disponibles}")
+    
+    elif rules_manager.is_blocked(sku, proveedores_disponibles[0]):
+        # Solo 1 proveedor disponible, bloqueado y sin regla forzada → NO generar orden
+        print(f"   🚫 Order blocked: SKU {sku} + Proveedor {proveedores_disponibles[0]} (only supplier, blocked by stock rule)")
+        return proveedores_disponibles[0], "BLOQUEO_STOCK", 'bloqueo', False
+    
+    return proveedores_disponibles[0], None, None, False
+
+
+@trazado("mapear_proveedores")
+def marcar_proveedor_por_sku(df, indice_proveedores, apply_rules=True, rules_manager=None):
+    """
+    Asigna (en el lugar) PROVEEDOR y _REGLA_ESPECIAL a las filas válidas
+
+    Las reglas especiales se evalúan una vez por par LOCAL + SKU distinto,
+    no por fila.
+
+    Args:
+        df: DataFrame del flujo (ver preparar_flujo)
+        indice_proveedores: Índice SKU -> proveedores (construir_indice_proveedores)
+        apply_rules: Si True, aplica reglas especiales (default True)
+        rules_manager: RulesManager a usar (opcional, usa la instancia compartida)
+
+    Returns:
+        Lista de mensajes para el log
+    """
+    warnings = []
+    rules_manager = _cargar_reglas_activas(apply_rules, rules_manager, warnings)
+    validas = filas_validas(df)
+    
+    try:
+        skus = mapear_texto(df.loc[validas, "SKU"], lambda sku: str(sku).strip().upper())
+        centros = mapear_texto(df.loc[validas, "CENTRO_COSTO"], str)
         
-        # Crear diccionario de mapeo SKU -> Lista de Proveedores (puede haber múltiples)
-        df_region_clean = df_region.dropna(subset=[col_sku_full, col_proveedor])
-        sku_to_proveedores = {}  # SKU -> lista de proveedores disponibles
+        # SKU no encontrado en Full.xlsx
+        con_precio = skus.isin(indice_proveedores.keys())
+        sin_precio = con_precio.index[~con_precio.to_numpy()]
+        marcar_error(df, sin_precio, "SIN_PRECIO")
         
-        for _, row in df_region_clean.iterrows():
-            sku = str(row[col_sku_full]).strip().upper()
-            proveedor = str(row[col_proveedor]).strip()
-            # Normalizar código de proveedor eliminando .0 si existe
-            proveedor = proveedor.replace('.0', '') if proveedor.endswith('.0') else proveedor
-            
-            if sku and proveedor and sku != 'NAN' and proveedor != 'NAN':
-                if sku not in sku_to_proveedores:
-                    sku_to_proveedores[sku] = []
-                if proveedor not in sku_to_proveedores[sku]:
-                    sku_to_proveedores[sku].append(proveedor)
-        
-        warnings.append(f"📋 Created mapping for {len(sku_to_proveedores)} SKUs")
-        
-        # Mostrar SKUs con múltiples proveedores
-        multi_prov = {sku: provs for sku, provs in sku_to_proveedores.items() if len(provs) > 1}
-        if multi_prov:
-            warnings.append(f"🔀 {len(multi_prov)} SKUs have multiple suppliers:")
-            for sku, provs in list(multi_prov.items())[:3]:  # Mostrar solo 3 ejemplos
-                warnings.append(f"   • {sku}: {len(provs)} suppliers → {provs}")
-        
-        # Aplicar mapeo con reglas especiales
-        df_mapped = []
-        df_errors = []
+        skus = skus[con_precio]
+        centros = centros[con_precio]
         reglas_aplicadas_local = 0
         reglas_aplicadas_bloqueo = 0
         
-        for _, row in df.iterrows():
-            sku = str(row["SKU"]).strip().upper()
-            local = str(row.get("CENTRO_COSTO", "")).strip()
-            
-            # Verificar si el SKU existe en el mapeo
-            if sku not in sku_to_proveedores:
-                # SKU no encontrado en Full.xlsx
-                row_error = row.copy()
-                row_error["OBSERVACION"] = (
-                    str(row.get("CENTRO_COSTO", "")) + 
-                    "//No tiene Precio//" + 
-                    str(row.get("NOMBRE_LUGAR", ""))
-                )
-                df_errors.append(row_error)
-                continue
-            
-            # Obtener proveedores disponibles para este SKU
-            proveedores_disponibles = sku_to_proveedores[sku].copy()
-            
-            # REGLA 1: Verificar si hay regla de LOCAL + SKU → Proveedor forzado
-            # MÁXIMA PRIORIDAD - Esta regla sobrescribe todo lo demás
-            proveedor_forzado = None
-            tiene_regla_especial = False
-            if rules_manager:
-                proveedor_forzado = rules_manager.get_proveedor_for_local_sku(local, sku)
-                if proveedor_forzado:
-                    tiene_regla_especial = True
-                    # Normalizar código de proveedor forzado (eliminar .0 si existe)
-                    proveedor_forzado_norm = proveedor_forzado.replace('.0', '') if proveedor_forzado.endswith('.0') else proveedor_forzado
-                    
-                    # Verificar si el proveedor forzado existe en los disponibles
-                    if proveedor_forzado_norm in proveedores_disponibles:
-                        # FORZAR este proveedor ignorando todo lo demás
-                        proveedores_disponibles = [proveedor_forzado_norm]
-                        reglas_aplicadas_local += 1
-                        print(f"   ⚙️ LOCAL+SKU rule applied: LOCAL {local} + SKU {sku} → Proveedor {proveedor_forzado_norm} (FORCED)")
-                    else:
-                        # El proveedor forzado NO está en Full.xlsx para este SKU
-                        # NO SE PUEDE CUMPLIR LA REGLA → No debe surtirse de ningún otro proveedor
-                        row_error = row.copy()
-                        row_error["OBSERVACION"] = (
-                            str(row.get("CENTRO_COSTO", "")) + 
-                            f"//REGLA ESPECIAL NO CUMPLIDA: Proveedor {proveedor_forzado_norm} no existe en Full.xlsx para SKU {sku}//" + 
-                            str(row.get("NOMBRE_LUGAR", ""))
-                        )
-                        df_errors.append(row_error)
-                        reglas_aplicadas_local += 1  # Contar como regla aplicada (aunque falló)
-                        print(f"   ❌ LOCAL+SKU rule FAILED: LOCAL {local} + SKU {sku} → Proveedor {proveedor_forzado_norm} NOT in Full.xlsx")
-                        continue
-            
-            # REGLA 2: Aplicar bloqueos por quiebre de stock
-            # Solo si NO hay regla LOCAL+SKU forzada (si proveedor_forzado existe, ya se aplicó)
-            if rules_manager and not proveedor_forzado and len(proveedores_disponibles) > 1:
-                # Solo aplicar bloqueos si hay más de 1 proveedor
-                proveedores_bloqueados = rules_manager.get_blocked_proveedores_for_sku(sku)
-                
-                if proveedores_bloqueados:
-                    # Normalizar proveedores bloqueados
-                    proveedores_bloqueados_norm = [p.replace('.0', '') if p.endswith('.0') else p for p in proveedores_bloqueados]
-                    
-                    # Filtrar proveedores bloqueados
-                    proveedores_filtrados = [p for p in proveedores_disponibles if p not in proveedores_bloqueados_norm]
-                    
-                    if proveedores_filtrados:
-                        # Hay proveedores alternativos, usar los no bloqueados
-                        proveedores_disponibles = proveedores_filtrados
-                        reglas_aplicadas_bloqueo += 1
-                        print(f"   🚫 Stock block applied: SKU {sku} - blocked {proveedores_bloqueados_norm}, using {proveedores_filtrados}")
-                    else:
-                        # Todos los proveedores están bloqueados, mantener original
-                        warnings.append(f"⚠️ All suppliers blocked for SKU {sku}, keeping all: {proveedores_disponibles}")
+        if rules_manager is None:
+            # Sin reglas: el primer proveedor disponible de cada SKU
+            primero = {sku: provs[0] for sku, provs in indice_proveedores.items()}
+            asignar(df, skus.index, "PROVEEDOR", skus.map(primero))
+            df.loc[skus.index, "_REGLA_ESPECIAL"] = False
+        else:
+            pares = pd.DataFrame({"LOCAL": centros.str.strip(), "SKU": skus})
+            decisiones = {}
+            unicos = pares.drop_duplicates()
+            for numero, (local, sku) in enumerate(unicos.itertuples(index=False, name=None)):
+                if numero % CADA_FILAS == 0:
+                    reportar_progreso("mapear_proveedores", numero, len(unicos))
+                decisiones[(local, sku)] = _decidir_proveedor(local, sku, indice_proveedores[sku], rules_manager, warnings)
             
-            elif rules_manager and not proveedor_forzado and len(proveedores_disponibles) == 1:
-                # Solo 1 proveedor disponible y NO hay regla forzada - verificar si está bloqueado
-                if rules_manager.is_blocked(sku, proveedores_disponibles[0]):
-                    # Proveedor bloqueado y es el único → NO generar orden
-                    row_error = row.copy()
-                    row_error["OBSERVACION"] = (
-                        str(row.get("CENTRO_COSTO", "")) + 
-                        "//Bloqueado por Quiebre de Stock//" + 
-                        str(row.get("NOMBRE_LUGAR", ""))
-                    )
-                    df_errors.append(row_error)
-                    reglas_aplicadas_bloqueo += 1
-                    print(f"   🚫 Order blocked: SKU {sku} + Proveedor {proveedores_disponibles[0]} (only supplier, blocked by stock rule)")
-                    continue
+            resultado = pd.DataFrame(
+                [decisiones[par] for par in zip(pares["LOCAL"], pares["SKU"])],
+                index=pares.index, columns=["PROVEEDOR", "MOTIVO", "TIPO", "_REGLA_ESPECIAL"]
+            )
+            reglas_aplicadas_local = int((resultado["TIPO"] == 'local').sum())
+            reglas_aplicadas_bloqueo = int((resultado["TIPO"] == 'bloqueo').sum())
             
-            # Asignar proveedor (tomar el primero de los disponibles)
-            proveedor_final = proveedores_disponibles[0]
+            con_error = resultado["MOTIVO"].notna().to_numpy()
+            for motivo, filas in resultado[con_error].groupby("MOTIVO").groups.items():
+                marcar_error(df, filas, motivo, proveedor=resultado.loc[filas, "PROVEEDOR"])
             
-            row_mapped = row.copy()
-            row_mapped["PROVEEDOR"] = proveedor_final
             # Marcar si viene de regla especial para errores posteriores
-            row_mapped["_REGLA_ESPECIAL"] = tiene_regla_especial
-            df_mapped.append(row_mapped)
-        
-        df_mapped = pd.DataFrame(df_mapped) if df_mapped else pd.DataFrame(columns=df.columns.tolist() + ["PROVEEDOR"])
-        df_errors = pd.DataFrame(df_errors) if df_errors else pd.DataFrame(columns=df.columns.tolist() + ["OBSERVACION"])
+            asignados = resultado.index[~con_error]
+            asignar(df, asignados, "PROVEEDOR", resultado.loc[asignados, "PROVEEDOR"])
+            df.loc[asignados, "_REGLA_ESPECIAL"] = resultado.loc[asignados, "_REGLA_ESPECIAL"]
         
-        warnings.append(f"✅ Successfully mapped: {len(df_mapped)} records")
-        warnings.append(f"⚠️ Sin precios/Bloqueados: {len(df_errors)} registros")
+        errores = int((df.loc[validas, COLUMNA_ETAPA_ERROR] == "proveedor").sum())
+        warnings.append(f"✅ Successfully mapped: {int(validas.sum()) - errores} records")
+        warnings.append(f"⚠️ Sin precios/Bloqueados: {errores} registros")
         
         # Resumen de reglas aplicadas
         if rules_manager and (reglas_aplicadas_local > 0 or reglas_aplicadas_bloqueo > 0):
@@ -586,12 +894,58 @@ def mapear_proveedor_por_sku(df, full_xlsx, region="099", apply_rules=True):
             if reglas_aplicadas_bloqueo > 0:
                 warnings.append(f"   • Stock block rules: {reglas_aplicadas_bloqueo} records")
         
+    except Cancelado:
+        raise
     except Exception as e:
         warnings.append(f"❌ Error mapping suppliers: {e}")
-        df_mapped = df.copy()
-        df_mapped["PROVEEDOR"] = "ERROR"
-        df_errors = pd.DataFrame(columns=df.columns.tolist() + ["OBSERVACION"])
+        asignar(df, validas[validas].index, "PROVEEDOR", "ERROR")
+        asignar(df, validas[validas].index, "OBSERVACION", "")
+        df.loc[validas, [COLUMNA_ETAPA_ERROR, COLUMNA_MOTIVO_ERROR]] = None
+    
+    return warnings
+
+
+def mapear_proveedor_por_sku(df, full_xlsx, region="099", apply_rules=True, rules_manager=None,
+                             indice_proveedores=None):
+    """
+    Mapea proveedores por SKU desde Full.xlsx
+    Versión optimizada con mejor manejo de datos y logging
+
+    Envoltorio de marcar_proveedor_por_sku que devuelve (df_mapped, df_errors, warnings)
+    
+    Args:
+        df: DataFrame con datos a procesar
+        full_xlsx: Ruta al archivo Full.xlsx
+        region: Región a filtrar (default "099")
+        apply_rules: Si True, aplica reglas especiales (default True)
+        rules_manager: RulesManager a usar (opcional, usa la instancia compartida)
+        indice_proveedores: Índice SKU -> proveedores ya construido con
+            construir_indice_proveedores (opcional, evita releer Full.xlsx)
+    """
+    print(f"🔍 Mapping suppliers from: {full_xlsx}")
+    print(f"📍 Using region: {region}")
+    
+    columnas = df.columns.tolist()
+    df_err = pd.DataFrame(columns=columnas + ["OBSERVACION"])
+    warnings = []
     
+    if indice_proveedores is None:
+        try:
+            indice_proveedores = construir_indice_proveedores(full_xlsx, region, warnings)
+        except Exception as e:
+            warnings.append(f"❌ Error mapping suppliers: {e}")
+            df_mapped = df.copy()
+            df_mapped["PROVEEDOR"] = "ERROR"
+            return df_mapped, df_err, warnings
+        if indice_proveedores is None:
+            return df, df_err, warnings
+    
+    trabajo = preparar_flujo(df.copy())
+    warnings.extend(marcar_proveedor_por_sku(trabajo, indice_proveedores, apply_rules, rules_manager))
+    
+    validas = filas_validas(trabajo)
+    df_mapped = trabajo.loc[validas, columnas + ["PROVEEDOR", "_REGLA_ESPECIAL"]]
+    df_errors = _errores_renderizados(trabajo, ~validas, columnas + ["OBSERVACION"])
     return df_mapped, df_errors, warnings
 
 # --- Procesamiento de fechas optimizado ---
@@ -653,22 +1007,24 @@ def _fallback_fecha_processing(df, agenda_xlsm):
         df["OBSERVACION"] = df.get("OBSERVACION", "") + f"//Error processing agenda, using {fecha_fallback}//"
         return df, pd.DataFrame(columns=df.columns.tolist() + ["OBSERVACION"] if "OBSERVACION" not in df.columns else df.columns)
 
-def rellenar_fecha_entrega_y_observacion_con_agenda_manager(df, fecha_pedido=None):
+@trazado("fechas_entrega")
+def marcar_fechas_entrega(df, agenda_manager=None, fecha_pedido=None):
     """
-    Rellena fecha de entrega y observación usando AgendaManager (sistema nuevo)
+    Asigna (en el lugar) FECHA_ENTREGA y OBSERVACION a las filas válidas usando AgendaManager
     
     Args:
-        df: DataFrame con columnas PROVEEDOR, CENTRO_COSTO, NOMBRE_LUGAR
+        df: DataFrame del flujo con PROVEEDOR asignado (ver marcar_proveedor_por_sku)
+        agenda_manager: AgendaManager a usar (opcional, usa la instancia compartida)
         fecha_pedido: Fecha del pedido (opcional, usa fecha actual si no se proporciona)
-    
-    Returns:
-        Tuple (df_valid, df_err): DataFrames con registros válidos y con errores
     """
+    validas = filas_validas(df)
+    indices = validas.index[validas.to_numpy()]
     try:
         from agenda_manager import AgendaManager
+        from contexto_ejecucion import obtener_manager
         
         print("📅 Processing dates with new AgendaManager system...")
-        manager = AgendaManager()
+        manager = agenda_manager if agenda_manager is not None else obtener_manager(AgendaManager)
         
         # Usar fecha actual si no se proporciona
         if fecha_pedido is None:
@@ -689,86 +1045,78 @@ def rellenar_fecha_entrega_y_observacion_con_agenda_manager(df, fecha_pedido=Non
         print(f"📅 Order Date: {fecha_pedido.strftime('%d-%m-%Y')}")
         print(f"📅 Dispatch Date: {fecha_despacho.strftime('%d-%m-%Y')} (adding {manager.dias_despacho} days)")
         
-        df = df.copy()
-        df['FECHA_ENTREGA'] = None
-        df['OBSERVACION'] = ''
-        
-        df_err = pd.DataFrame(columns=df.columns.tolist())
-        df_valid_list = []
-        df_err_list = []
-        
-        # Procesar cada registro
-        proveedores_sin_config = set()
-        
-        for idx, row in df.iterrows():
-            codigo_prov = str(row.get('PROVEEDOR', '')).strip()
+        # Fecha de entrega de todos los proveedores, calculada una sola vez para este despacho
+        fechas_texto = {
+            codigo: fecha.strftime("%d-%m-%Y")
+            for codigo, fecha in manager.tabla_fechas_entrega(fecha_despacho).items() if fecha
+        }
+        
+        # Normalizar código (eliminar .0 si existe)
+        codigos = mapear_texto(df.loc[indices, "PROVEEDOR"], lambda c: str(c).strip().replace('.0', ''))
+        fechas = codigos.map(fechas_texto)
+        centros = mapear_texto(df.loc[indices, "CENTRO_COSTO"], lambda c: str(c).strip())
+        nombres = df.loc[indices, "NOMBRE_LUGAR"]
+        
+        # Proveedor configurado - registro válido
+        ok = fechas.notna().to_numpy()
+        con_fecha = indices[ok]
+        nombres_limpios = mapear_texto(nombres[con_fecha], lambda nombre: limpiar_nombre_lugar(str(nombre)))
+        asignar(df, con_fecha, "FECHA_ENTREGA", fechas[con_fecha])
+        asignar(df, con_fecha, "OBSERVACION", centros[con_fecha] + f"//{dd_mm}//" + nombres_limpios)
+        
+        # Sin código de proveedor - va a errores
+        sin_codigo = (codigos == "").to_numpy()
+        marcar_error(df, indices[sin_codigo], "SIN_PROVEEDOR")
+        
+        # Proveedor no configurado - va a errores (distinguiendo si viene de regla especial)
+        sin_config = indices[~ok & ~sin_codigo]
+        if len(sin_config):
+            tiene_regla = df.loc[sin_config, "_REGLA_ESPECIAL"].fillna(False).astype(bool).to_numpy()
+            marcar_error(df, sin_config[~tiene_regla], "FALTA_AGENDA", proveedor=codigos[sin_config[~tiene_regla]])
+            marcar_error(df, sin_config[tiene_regla], "REGLA_SIN_AGENDA", proveedor=codigos[sin_config[tiene_regla]])
             
-            # Normalizar código (eliminar .0 si existe)
-            codigo_prov = codigo_prov.replace('.0', '')
-            
-            if codigo_prov:
-                fecha_entrega = manager.calcular_fecha_entrega(codigo_prov, fecha_despacho)
-                
-                if fecha_entrega:
-                    # Proveedor configurado - registro válido
-                    row_copy = row.copy()
-                    row_copy['FECHA_ENTREGA'] = fecha_entrega.strftime("%d-%m-%Y")
-                    
-                    # Generar observación
-                    centro_costo = str(row.get('CENTRO_COSTO', '')).strip()
-                    nombre_lugar = limpiar_nombre_lugar(str(row.get('NOMBRE_LUGAR', '')))
-                    row_copy['OBSERVACION'] = f"{centro_costo}//{dd_mm}//{nombre_lugar}"
-                    
-                    df_valid_list.append(row_copy)
-                else:
-                    # Proveedor no configurado - va a errores
-                    proveedores_sin_config.add(codigo_prov)
-                    row_copy = row.copy()
-                    centro_costo = str(row.get('CENTRO_COSTO', '')).strip()
-                    nombre_lugar = str(row.get('NOMBRE_LUGAR', '')).strip()
-                    
-                    # Verificar si viene de regla especial
-                    tiene_regla = row.get('_REGLA_ESPECIAL', False)
-                    if tiene_regla:
-                        row_copy['OBSERVACION'] = f"{centro_costo}//REGLA ESPECIAL NO CUMPLIDA: Proveedor {codigo_prov} no está configurado en Agenda//{nombre_lugar}"
-                    else:
-                        row_copy['OBSERVACION'] = f"{centro_costo}//Falta Agenda//{nombre_lugar}"
-                    df_err_list.append(row_copy)
-            else:
-                # Sin código de proveedor - va a errores
-                row_copy = row.copy()
-                row_copy['OBSERVACION'] = "//Sin código de proveedor//"
-                df_err_list.append(row_copy)
-        
-        if proveedores_sin_config:
+            proveedores_sin_config = sorted(codigos[sin_config].unique())
             print(f"⚠️ Suppliers not configured in agenda ({len(proveedores_sin_config)}):")
-            for prov in sorted(proveedores_sin_config):
+            for prov in proveedores_sin_config:
                 print(f"   • {prov}")
         
-        # Crear DataFrames de resultados con índices únicos
-        if df_valid_list:
-            df_valid = pd.DataFrame(df_valid_list).reset_index(drop=True)
-            print(f"✅ {len(df_valid)} records with valid delivery dates")
-        else:
-            df_valid = pd.DataFrame(columns=df.columns.tolist() + ['FECHA_ENTREGA', 'OBSERVACION'])
-        
-        if df_err_list:
-            df_err = pd.DataFrame(df_err_list).reset_index(drop=True)
-            print(f"⚠️ {len(df_err)} records with errors (no agenda config)")
-        else:
-            df_err = pd.DataFrame(columns=df.columns.tolist() + ['OBSERVACION'])
-        
-        return df_valid, df_err
+        if len(con_fecha):
+            print(f"✅ {len(con_fecha)} records with valid delivery dates")
+        if len(indices) - len(con_fecha):
+            print(f"⚠️ {len(indices) - len(con_fecha)} records with errors (no agenda config)")
         
     except Exception as e:
         print(f"❌ Error using AgendaManager: {e}")
-        # Retornar todos como errores
-        df_err = df.copy()
-        df_err['OBSERVACION'] = "//Error en sistema de agenda//"
-        return pd.DataFrame(columns=df.columns.tolist() + ['FECHA_ENTREGA', 'OBSERVACION']), df_err
+        # Marcar todos como errores
+        marcar_error(df, indices, "ERROR_AGENDA")
+
+
+def rellenar_fecha_entrega_y_observacion_con_agenda_manager(df, fecha_pedido=None, agenda_manager=None):
+    """
+    Rellena fecha de entrega y observación usando AgendaManager (sistema nuevo)
+
+    Envoltorio de marcar_fechas_entrega que devuelve los DataFrames separados
+    
+    Args:
+        df: DataFrame con columnas PROVEEDOR, CENTRO_COSTO, NOMBRE_LUGAR
+        fecha_pedido: Fecha del pedido (opcional, usa fecha actual si no se proporciona)
+        agenda_manager: AgendaManager a usar (opcional, usa la instancia compartida)
+    
+    Returns:
+        Tuple (df_valid, df_err): DataFrames con registros válidos y con errores
+    """
+    columnas = [c for c in df.columns if c not in ("FECHA_ENTREGA", "OBSERVACION")]
+    columnas += ["FECHA_ENTREGA", "OBSERVACION"]
+    trabajo = preparar_flujo(df.copy())
+    marcar_fechas_entrega(trabajo, agenda_manager=agenda_manager, fecha_pedido=fecha_pedido)
+    
+    validas = filas_validas(trabajo)
+    df_valid = trabajo.loc[validas, columnas].reset_index(drop=True)
+    df_err = _errores_renderizados(trabajo, ~validas, columnas).reset_index(drop=True)
+    return df_valid, df_err
 
 
-def rellenar_fecha_entrega_y_observacion(df, agenda_xlsm=None):
+def rellenar_fecha_entrega_y_observacion(df, agenda_xlsm=None, agenda_manager=None, fecha_pedido=None):
     """
     Rellena fecha de entrega y observación usando el nuevo sistema AgendaManager
     
@@ -781,6 +1129,8 @@ def rellenar_fecha_entrega_y_observacion(df, agenda_xlsm=None):
     Args:
         df: DataFrame con columnas PROVEEDOR, CENTRO_COSTO, NOMBRE_LUGAR
         agenda_xlsm: Parámetro legacy para compatibilidad (ya no se usa)
+        agenda_manager: AgendaManager a usar (opcional, usa la instancia compartida)
+        fecha_pedido: Fecha del pedido (opcional, usa fecha actual si no se proporciona)
     
     Returns:
         Tuple (df_valid, df_err): DataFrames con registros válidos y con errores
@@ -792,7 +1142,9 @@ def rellenar_fecha_entrega_y_observacion(df, agenda_xlsm=None):
     
     # Usar directamente el nuevo sistema
     try:
-        df_valid, df_err = rellenar_fecha_entrega_y_observacion_con_agenda_manager(df)
+        df_valid, df_err = rellenar_fecha_entrega_y_observacion_con_agenda_manager(
+            df, fecha_pedido=fecha_pedido, agenda_manager=agenda_manager
+        )
         return df_valid, df_err
     except Exception as e:
         print(f"❌ Error in AgendaManager: {e}")
@@ -1198,6 +1550,7 @@ def _crear_ruta_salida(base_dir, fecha_str):
 
 # --- Asignación de IDs optimizada ---
 
+@trazado("asignar_id")
 def asignar_id_final(df):
     """
     Asigna IDs finales consolidando duplicados
@@ -1205,8 +1558,6 @@ def asignar_id_final(df):
     """
     print("🏷️ Assigning final IDs and consolidating duplicates...")
     
-    df = df.copy()
-    
     # NO eliminar _REGLA_ESPECIAL aquí - se necesita para errores de agenda
     # Se eliminará justo antes de guardar el Excel
     
@@ -1216,8 +1567,7 @@ def asignar_id_final(df):
     
     if columnas_faltantes:
         print(f"⚠️ Missing columns: {columnas_faltantes}")
-        for col in columnas_faltantes:
-            df[col] = ""
+        df = df.assign(**{col: "" for col in columnas_faltantes})
     
     print(f"📊 Input records: {len(df)}")
     
@@ -1226,7 +1576,7 @@ def asignar_id_final(df):
     
     try:
         # Agrupar y sumar cantidades
-        df_consolidado = df.groupby(columnas_agrupacion, as_index=False).agg({
+        df_consolidado = df.groupby(columnas_agrupacion, as_index=False, observed=True).agg({
             'CANTIDAD': 'sum',
             'CENTRO_COSTO': 'first',
             'NOMBRE_LUGAR': 'first',
@@ -1243,20 +1593,9 @@ def asignar_id_final(df):
     # Asignar IDs por proveedor y observación
     df = df.sort_values(["PROVEEDOR", "OBSERVACION", "SKU"]).reset_index(drop=True)
     
-    ids = []
-    next_id = 1
-    last_pair = (None, None)
-    
-    for _, row in df.iterrows():
-        current_pair = (row["PROVEEDOR"], row["OBSERVACION"])
-        if current_pair != last_pair:
-            ids.append(next_id)
-            last_pair = current_pair
-            next_id += 1
-        else:
-            ids.append(next_id - 1)
-    
-    df["ID PEDIDO"] = ids
+    # Un ID nuevo cada vez que cambia el par (PROVEEDOR, OBSERVACION)
+    nuevo_par = (df["PROVEEDOR"] != df["PROVEEDOR"].shift()) | (df["OBSERVACION"] != df["OBSERVACION"].shift())
+    df["ID PEDIDO"] = nuevo_par.cumsum().astype("int64")
     
     # Verificar distribución de IDs
     id_counts = df["ID PEDIDO"].value_counts().sort_index()
@@ -1279,6 +1618,7 @@ def asignar_id_final(df):
 
 # --- Formateo de Excel optimizado ---
 
+@trazado("formatear_excel", "escritura")
 def formatear_excel_salida(archivo_excel):
     """
     Formatea el archivo Excel con estilos profesionales DHL
@@ -1587,16 +1927,18 @@ if __name__ == "__main__":
     print("📝 This module contains optimized functions for order processing")
 
 
-def ajustar_cantidades_formato_minimo(df):
+@trazado("formato_minimo")
+def ajustar_cantidades_formato_minimo(df, products_manager=None):
     """
     Ajusta las cantidades según el formato de empaque definido en cada SKU
     Calcula múltiplos del formato (ej: formato 60, pido 100 = 2*60 = 120)
     
     Args:
         df: DataFrame con columnas SKU y CANTIDAD
+        products_manager: ProductsManager a usar (opcional, usa la instancia compartida)
         
     Returns:
-        DataFrame con cantidades ajustadas y registro de cambios
+        El mismo DataFrame, con las cantidades ajustadas en el lugar
     """
     print("🔧 Applying packaging format adjustments...")
     
@@ -1605,49 +1947,43 @@ def ajustar_cantidades_formato_minimo(df):
         print("⚠️ SKU or CANTIDAD columns not found, skipping format adjustment")
         return df
     
-    # Importar ProductsManager
-    try:
-        from products_manager import ProductsManager
-    except ImportError:
-        print("⚠️ ProductsManager not available, skipping format adjustment")
-        return df
-    
-    # Inicializar ProductsManager
-    products_manager = ProductsManager()
-    df_adjusted = df.copy()
-    adjustments_count = 0
-    
-    import math
-    
-    for index, row in df_adjusted.iterrows():
-        sku = str(row['SKU']).strip().upper()
-        cantidad_original = row['CANTIDAD']
-        
+    # Usar la instancia compartida si no se proporciona
+    if products_manager is None:
         try:
-            # Verificar si el SKU tiene formato de empaque
-            formato_empaque = products_manager.get_formato_minimo(sku)
-            
-            if formato_empaque is not None and formato_empaque > 0:
-                # Convertir cantidad a float para cálculo
-                cantidad_float = float(cantidad_original)
-                
-                # Calcular formatos necesarios y cantidad final
-                formatos_necesarios = math.ceil(cantidad_float / formato_empaque)
-                cantidad_ajustada = formatos_necesarios * formato_empaque
-                
-                # Aplicar ajuste si es diferente
-                if cantidad_ajustada != cantidad_float:
-                    df_adjusted.at[index, 'CANTIDAD'] = cantidad_ajustada
-                    adjustments_count += 1
-                    print(f"   📦 SKU {sku}: {cantidad_original} → {cantidad_ajustada} ({formatos_necesarios} x {formato_empaque})")
-                    
-        except (ValueError, TypeError) as e:
-            print(f"   ⚠️ Error processing SKU {sku}: {e}")
-            continue
+            from contexto_ejecucion import obtener_manager
+            from products_manager import ProductsManager
+        except ImportError:
+            print("⚠️ ProductsManager not available, skipping format adjustment")
+            return df
+        products_manager = obtener_manager(ProductsManager)
+    
+    # Formato de empaque por SKU distinto (no por fila)
+    skus = mapear_texto(df['SKU'], lambda sku: str(sku).strip().upper())
+    formatos = {sku: products_manager.get_formato_minimo(sku) for sku in skus.unique()}
+    formato_empaque = pd.to_numeric(skus.map(formatos), errors='coerce')
+    cantidad = pd.to_numeric(df['CANTIDAD'], errors='coerce')
+    
+    con_formato = formato_empaque.notna() & (formato_empaque > 0)
+    for sku in skus[con_formato & cantidad.isna()].unique():
+        print(f"   ⚠️ Error processing SKU {sku}: invalid quantity")
+    
+    # Calcular formatos necesarios y cantidad final (ej: formato 60, pido 100 = 2*60 = 120)
+    formatos_necesarios = np.ceil(cantidad / formato_empaque)
+    cantidad_ajustada = formatos_necesarios * formato_empaque
+    
+    # Aplicar ajuste (en el lugar) solo donde es diferente
+    ajustar = con_formato & cantidad.notna() & (cantidad_ajustada != cantidad)
+    adjustments_count = int(ajustar.sum())
+    for sku, original, ajustada, n, formato in zip(
+        skus[ajustar], df.loc[ajustar, 'CANTIDAD'], cantidad_ajustada[ajustar],
+        formatos_necesarios[ajustar], formato_empaque[ajustar]
+    ):
+        print(f"   📦 SKU {sku}: {original} → {ajustada:g} ({int(n)} x {formato:g})")
+    df.loc[ajustar, 'CANTIDAD'] = cantidad_ajustada[ajustar]
     
     if adjustments_count > 0:
         print(f"✅ Applied {adjustments_count} packaging format adjustments")
     else:
         print("✅ No format adjustments needed")
     
-    return df_adjusted
+    return df
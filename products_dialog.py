@@ -12,6 +12,9 @@ from tkinter import ttk, messagebox, filedialog
 from products_manager import ProductsManager
 import os
 
+# Cada cuánto se revisa si otro usuario cambió el archivo (ms)
+INTERVALO_VIGILANCIA_MS = 5000
+
 
 class ProductsDialog:
     """Ventana de diálogo para gestionar lista maestra de productos"""
@@ -69,6 +72,9 @@ class ProductsDialog:
         
         self.setup_ui()
         self.refresh_products()
+        
+        # Revisar periódicamente si otro usuario modificó la maestra
+        self.window.after(INTERVALO_VIGILANCIA_MS, self.vigilar_cambios_externos)
     
     def configure_table_style(self):
         """Configura el estilo de la tabla EXACTO de agenda_dialog.py"""
@@ -747,6 +753,17 @@ class ProductsDialog:
         # Actualizar stats
         self.update_stats(len(products))
     
+    def vigilar_cambios_externos(self):
+        """Recarga la tabla si otro usuario modificó la maestra"""
+        try:
+            if not self.window.winfo_exists():
+                return
+            if self.products_manager.recargar_si_cambio():
+                self.search_products()
+            self.window.after(INTERVALO_VIGILANCIA_MS, self.vigilar_cambios_externos)
+        except tk.TclError:
+            pass  # Ventana cerrada
+    
     def update_stats(self, count=None):
         """Actualiza las estadísticas"""
         if count is None:
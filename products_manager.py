@@ -3,31 +3,59 @@ Gestor de Lista Maestra de Productos
 Creado por Lucas Gnemmi
 Versión: 1.0
 
-Maneja la lista maestra de productos (SKU + DESCRIPCION) en formato JSON.
+Maneja la lista maestra de productos (SKU + DESCRIPCION) en JSON o SQLite.
 Reemplaza la dependencia del archivo Items.xlsx
 """
 
-import json
 import os
 from datetime import datetime
 
+from almacenamiento import crear_backend, resolver_ruta_almacen, transaccional
+
+
+# Nombres de columna aceptados en la importación desde Excel
+COLUMNAS_SKU = ['SKU', 'CODIGO', 'CODE']
+COLUMNAS_DESCRIPCION = ['DESCRIPCION', 'DESCRIPTION', 'DESC', 'NOMBRE', 'NAME']
+COLUMNAS_FORMATO = ['FORMATO_MINIMO', 'FORMATO', 'MIN_QTY', 'MINIMO']
+COLUMNAS_IMPORTACION = COLUMNAS_SKU + COLUMNAS_DESCRIPCION + COLUMNAS_FORMATO
+
 
 class ProductsManager:
     """Gestiona la lista maestra de productos (SKU + DESCRIPCION)"""
     
-    def __init__(self, products_file="products.json"):
+    def __init__(self, products_file=None, compacto=None):
         """
         Inicializa el gestor de productos
         
         Args:
-            products_file: Nombre del archivo JSON que almacena los productos
+            products_file: Archivo que almacena los productos (.json o base SQLite .db).
+                           Por defecto products.json, o datos_referencia.db si fue migrado.
+            compacto: Formato del JSON al guardar (None = el del archivo existente)
         """
+        if products_file is None:
+            products_file = resolver_ruta_almacen("products.json")
         self.products_file = products_file
+        self.backend = crear_backend(products_file, "products", compacto)
+        self._firma = self.backend.firma()
+        self.products = self.load_products()
+    
+    def recargar_si_cambio(self):
+        """
+        Recarga los productos solo si otro proceso modificó el almacenamiento
+        
+        Returns:
+            bool: True si se recargaron
+        """
+        firma = self.backend.firma()
+        if firma == self._firma:
+            return False
+        self._firma = firma
         self.products = self.load_products()
+        return True
     
     def load_products(self):
-        """Carga los productos desde el archivo JSON"""
-        if not os.path.exists(self.products_file):
+        """Carga los productos desde el almacenamiento"""
+        if not self.backend.existe():
             # Crear archivo por defecto vacío
             default_products = {
                 "products": [],
@@ -41,10 +69,12 @@ class ProductsManager:
             return default_products
         
         try:
-            with open(self.products_file, 'r', encoding='utf-8') as f:
-                return json.load(f)
+            return self.backend.cargar()
         except Exception as e:
             print(f"Error loading products: {e}")
+            respaldo = self.backend.respaldar_ilegible()
+            if respaldo:
+                print(f"Copia del archivo ilegible guardada en {respaldo}")
             return {
                 "products": [],
                 "metadata": {
@@ -55,7 +85,7 @@ class ProductsManager:
             }
     
     def save_products(self, products_data=None):
-        """Guarda los productos en el archivo JSON"""
+        """Guarda todos los productos en el almacenamiento"""
         if products_data is None:
             products_data = self.products
         
@@ -64,13 +94,40 @@ class ProductsManager:
         products_data["metadata"]["last_updated"] = datetime.now().isoformat()
         
         try:
-            with open(self.products_file, 'w', encoding='utf-8') as f:
-                json.dump(products_data, f, indent=2, ensure_ascii=False)
+            with self.backend.bloqueo:
+                self.backend.guardar(products_data)
+                self._firma = self.backend.firma()
+            return True
+        except Exception as e:
+            print(f"Error saving products: {e}")
+            return False
+    
+    def _save_product_change(self, product=None, removed_sku=None):
+        """
+        Persiste el cambio de un solo producto
+        
+        En SQLite actualiza solo la fila afectada; en JSON reescribe el archivo.
+        """
+        if not self.backend.incremental:
+            return self.save_products()
+        
+        metadata = self.products["metadata"]
+        metadata["total_count"] = len(self.products["products"])
+        metadata["last_updated"] = datetime.now().isoformat()
+        
+        try:
+            with self.backend.bloqueo:
+                if product is not None:
+                    self.backend.upsert("products", product, metadata)
+                if removed_sku is not None:
+                    self.backend.eliminar("products", {"sku": removed_sku}, metadata)
+                self._firma = self.backend.firma()
             return True
         except Exception as e:
             print(f"Error saving products: {e}")
             return False
     
+    @transaccional
     def add_product(self, sku, descripcion, formato_minimo=None):
         """
         Agrega un nuevo producto
@@ -110,9 +167,10 @@ class ProductsManager:
                 pass  # Ignorar valores inválidos
         
         self.products["products"].append(product)
-        self.save_products()
+        self._save_product_change(product=product)
         return True
     
+    @transaccional
     def update_product(self, sku, nueva_descripcion, formato_minimo=None):
         """
         Actualiza un producto existente
@@ -145,11 +203,12 @@ class ProductsManager:
                         # Remover formato_minimo si es inválido
                         product.pop("formato_minimo", None)
                 
-                self.save_products()
+                self._save_product_change(product=product)
                 return True
         
         return False
     
+    @transaccional
     def remove_product(self, sku):
         """
         Elimina un producto
@@ -169,7 +228,7 @@ class ProductsManager:
         ]
         
         if len(self.products["products"]) < initial_count:
-            self.save_products()
+            self._save_product_change(removed_sku=sku)
             return True
         
         return False
@@ -340,9 +399,11 @@ class ProductsManager:
         try:
             import pandas as pd
             
-            # Leer Excel
-            df = pd.read_excel(excel_path, dtype=str)
-            df.columns = df.columns.str.strip().str.upper()
+            from lector_excel import leer_excel
+            
+            # Leer Excel (solo las columnas que se pueden usar)
+            df = leer_excel(excel_path, columnas=COLUMNAS_IMPORTACION)
+            df.columns = df.columns.str.upper()
             
             # Buscar columnas SKU, DESCRIPCION y FORMATO_MINIMO
             sku_col = None
@@ -350,11 +411,11 @@ class ProductsManager:
             formato_col = None
             
             for col in df.columns:
-                if col in ['SKU', 'CODIGO', 'CODE']:
+                if col in COLUMNAS_SKU:
                     sku_col = col
-                if col in ['DESCRIPCION', 'DESCRIPTION', 'DESC', 'NOMBRE', 'NAME']:
+                if col in COLUMNAS_DESCRIPCION:
                     desc_col = col
-                if col in ['FORMATO_MINIMO', 'FORMATO', 'MIN_QTY', 'MINIMO']:
+                if col in COLUMNAS_FORMATO:
                     formato_col = col
             
             if not sku_col or not desc_col:
@@ -384,6 +445,7 @@ class ProductsManager:
                 "errors": [f"Error importing from Excel: {str(e)}"]
             }
     
+    @transaccional
     def clear_all(self):
         """Elimina todos los productos (con confirmación)"""
         self.products["products"] = []
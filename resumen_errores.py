@@ -0,0 +1,177 @@
+"""
+Resumen de Errores del Procesamiento
+Creado por Lucas Gnemmi
+Versión: 1.0
+
+Arma, a partir de la hoja Errors, tablas resumen por motivo, proveedor, SKU y
+centro de costo, y las listas de proveedores y SKUs faltantes listas para
+copiar a los diálogos de Agenda y Productos. Todo se calcula con groupby
+sobre las columnas estructuradas de errores_pedidos.py.
+"""
+
+import pandas as pd
+from openpyxl.styles import Font, PatternFill, Alignment
+
+from errores_pedidos import COLUMNA_MOTIVO_ERROR, COLUMNA_PROVEEDOR_ERROR
+from esquema_pedidos import como_texto
+from trazas import trazado
+
+
+HOJA_RESUMEN = "Resumen Errores"
+HOJA_FALTANTES = "Faltantes"
+
+# Cantidad de filas de las tablas de principales ofensores
+TOP_DEFAULT = 10
+
+# Nombre corto de cada motivo para las tablas
+ETIQUETAS_MOTIVO = {
+    "FALTA_PRODUCTO": "Falta Producto en Maestra",
+    "SIN_PRECIO": "No tiene Precio",
+    "REGLA_NO_EN_FULL": "Regla especial: proveedor no está en Full",
+    "BLOQUEO_STOCK": "Bloqueado por Quiebre de Stock",
+    "FALTA_AGENDA": "Falta Agenda",
+    "REGLA_SIN_AGENDA": "Regla especial: proveedor sin Agenda",
+    "SIN_PROVEEDOR": "Sin código de proveedor",
+    "ERROR_AGENDA": "Error en sistema de agenda",
+}
+
+# Motivos que se resuelven agregando el proveedor en Agenda / el SKU en Productos
+MOTIVOS_FALTA_AGENDA = ("FALTA_AGENDA", "REGLA_SIN_AGENDA")
+MOTIVOS_FALTA_PRODUCTO = ("FALTA_PRODUCTO",)
+MOTIVOS_FALTA_PRECIO = ("SIN_PRECIO",)
+
+SIN_DATO = "-"
+
+
+def _base_resumen(df_errores):
+    """Columnas que usan las tablas: MOTIVO, PROVEEDOR, SKU, CENTRO_COSTO y CANTIDAD"""
+    motivos = df_errores[COLUMNA_MOTIVO_ERROR]
+    # El proveedor involucrado en el error (reglas, agenda) o el ya asignado
+    proveedor = como_texto(df_errores[COLUMNA_PROVEEDOR_ERROR])
+    if "PROVEEDOR" in df_errores.columns:
+        proveedor = proveedor.fillna(como_texto(df_errores["PROVEEDOR"]))
+    return pd.DataFrame({
+        "MOTIVO": como_texto(motivos).map(ETIQUETAS_MOTIVO),
+        "CODIGO": como_texto(motivos),
+        "PROVEEDOR": proveedor.fillna(SIN_DATO).astype(str),
+        "SKU": como_texto(df_errores["SKU"]).fillna(SIN_DATO).astype(str).str.strip().str.upper(),
+        "CENTRO_COSTO": como_texto(df_errores["CENTRO_COSTO"]).fillna(SIN_DATO).astype(str).str.strip(),
+        "CANTIDAD": pd.to_numeric(df_errores["CANTIDAD"], errors="coerce").fillna(0),
+    })
+
+
+def _contar(base, columnas):
+    """Líneas y cantidad total por columnas, de mayor a menor cantidad de líneas"""
+    tabla = base.groupby(columnas, sort=False).agg(
+        LINEAS=("CANTIDAD", "size"), CANTIDAD=("CANTIDAD", "sum")
+    ).reset_index()
+    return tabla.sort_values(["LINEAS", "CANTIDAD"] + columnas, ascending=[False, False] + [True] * len(columnas),
+                             kind="stable", ignore_index=True)
+
+
+def resumen_errores(df_errores, top=TOP_DEFAULT):
+    """
+    Tablas resumen de los errores
+
+    Args:
+        df_errores: Hoja Errors (salida de separar_errores)
+        top: Filas de las tablas de principales ofensores
+
+    Returns:
+        Dict titulo -> DataFrame, en el orden en que se escriben
+    """
+    if df_errores.empty or COLUMNA_MOTIVO_ERROR not in df_errores.columns:
+        return {}
+    base = _base_resumen(df_errores)
+
+    tablas = {
+        "Errores por motivo": _contar(base, ["MOTIVO"]),
+        f"Top {top} proveedores": _contar(base[base["PROVEEDOR"] != SIN_DATO], ["PROVEEDOR"]).head(top),
+        f"Top {top} SKUs": _contar(base, ["SKU"]).head(top),
+        f"Top {top} centros de costo": _contar(base, ["CENTRO_COSTO"]).head(top),
+        "Motivo x Proveedor": _contar(base, ["MOTIVO", "PROVEEDOR"]),
+        "Motivo x SKU": _contar(base, ["MOTIVO", "SKU"]),
+        "Motivo x Centro de costo": _contar(base, ["MOTIVO", "CENTRO_COSTO"]),
+    }
+    return {titulo: tabla for titulo, tabla in tablas.items() if not tabla.empty}
+
+
+def listas_faltantes(df_errores):
+    """
+    Proveedores y SKUs faltantes, uno por fila, listos para copiar
+
+    Args:
+        df_errores: Hoja Errors (salida de separar_errores)
+
+    Returns:
+        DataFrame con una columna por lista (vacío si no hay faltantes)
+    """
+    if df_errores.empty or COLUMNA_MOTIVO_ERROR not in df_errores.columns:
+        return pd.DataFrame()
+    base = _base_resumen(df_errores)
+
+    def distintos(motivos, columna):
+        valores = base.loc[base["CODIGO"].isin(motivos), columna]
+        return sorted(set(valores) - {SIN_DATO})
+
+    listas = {
+        "PROVEEDORES SIN AGENDA": distintos(MOTIVOS_FALTA_AGENDA, "PROVEEDOR"),
+        "SKUS FALTANTES EN MAESTRA": distintos(MOTIVOS_FALTA_PRODUCTO, "SKU"),
+        "SKUS SIN PRECIO EN FULL": distintos(MOTIVOS_FALTA_PRECIO, "SKU"),
+    }
+    return pd.DataFrame({titulo: pd.Series(valores, dtype=object) for titulo, valores in listas.items()})
+
+
+@trazado("resumen_errores", "escritura")
+def escribir_resumen_errores(writer, df_errores, top=TOP_DEFAULT):
+    """
+    Agrega las hojas "Resumen Errores" y "Faltantes" a un ExcelWriter (openpyxl)
+
+    Las tablas del resumen van una debajo de otra, cada una con su título.
+
+    Args:
+        writer: pd.ExcelWriter abierto con engine="openpyxl"
+        df_errores: Hoja Errors (salida de separar_errores)
+        top: Filas de las tablas de principales ofensores
+    """
+    tablas = resumen_errores(df_errores, top)
+    if not tablas:
+        return
+
+    titulos = []
+    fila = 0
+    for titulo, tabla in tablas.items():
+        tabla.to_excel(writer, sheet_name=HOJA_RESUMEN, index=False, startrow=fila + 1)
+        titulos.append(fila + 1)
+        fila += len(tabla) + 4
+    _formatear_hoja_resumen(writer.sheets[HOJA_RESUMEN], titulos, list(tablas))
+
+    faltantes = listas_faltantes(df_errores)
+    if not faltantes.empty:
+        faltantes.to_excel(writer, sheet_name=HOJA_FALTANTES, index=False)
+        _formatear_encabezados(writer.sheets[HOJA_FALTANTES], [1])
+        for columna in "ABC":
+            writer.sheets[HOJA_FALTANTES].column_dimensions[columna].width = 28
+
+
+def _formatear_encabezados(ws, filas):
+    """Encabezados en el mismo estilo que la hoja Errors"""
+    header_font = Font(bold=True, color="FFFFFF", size=11)
+    header_fill = PatternFill(start_color="E74C3C", end_color="E74C3C", fill_type="solid")
+    header_alignment = Alignment(horizontal="center", vertical="center")
+    for fila in filas:
+        for cell in ws[fila]:
+            if cell.value is not None:
+                cell.font = header_font
+                cell.fill = header_fill
+                cell.alignment = header_alignment
+
+
+def _formatear_hoja_resumen(ws, filas_titulo, titulos):
+    """Títulos de cada tabla, encabezados y anchos de la hoja de resumen"""
+    for fila, titulo in zip(filas_titulo, titulos):
+        celda = ws.cell(row=fila, column=1, value=titulo)
+        celda.font = Font(bold=True, size=12, color="D40511")
+    _formatear_encabezados(ws, [fila + 1 for fila in filas_titulo])
+    for columna, ancho in {'A': 40, 'B': 25, 'C': 12, 'D': 12}.items():
+        ws.column_dimensions[columna].width = ancho
@@ -8,6 +8,9 @@ from tkinter import ttk, messagebox, filedialog
 from rules_manager import RulesManager
 import pandas as pd
 
+# Cada cuánto se revisa si otro usuario cambió el archivo (ms)
+INTERVALO_VIGILANCIA_MS = 5000
+
 class RulesDialog:
     """Ventana simple para gestionar reglas especiales"""
     
@@ -74,6 +77,9 @@ class RulesDialog:
         # antes de hacer el primer refresh
         self.window.update()
         self.window.after(200, self.refresh_all)
+        
+        # Revisar periódicamente si otro usuario modificó las reglas
+        self.window.after(INTERVALO_VIGILANCIA_MS, self.vigilar_cambios_externos)
     
     def _show_message(self, msg_type, title, message):
         """Helper para mostrar messageboxes que SIEMPRE aparezcan al frente"""
@@ -788,6 +794,17 @@ class RulesDialog:
         self.refresh_local_rules()
         self.refresh_stock_blocks()
     
+    def vigilar_cambios_externos(self):
+        """Recarga las tablas si otro usuario modificó las reglas"""
+        try:
+            if not self.window.winfo_exists():
+                return
+            if self.rules_manager.recargar_si_cambio():
+                self.refresh_all()
+            self.window.after(INTERVALO_VIGILANCIA_MS, self.vigilar_cambios_externos)
+        except tk.TclError:
+            pass  # Ventana cerrada
+    
     def import_from_excel(self):
         """Importa reglas desde un archivo Excel"""
         filename = filedialog.askopenfilename(
@@ -12,17 +12,44 @@ import json
 import os
 from datetime import datetime
 
+from almacenamiento import crear_backend, resolver_ruta_almacen, transaccional
+
 class RulesManager:
     """Gestiona las reglas especiales del sistema"""
     
-    def __init__(self, rules_file="rules.json"):
-        """Inicializa el gestor de reglas"""
+    def __init__(self, rules_file=None, compacto=None):
+        """
+        Inicializa el gestor de reglas
+        
+        Args:
+            rules_file: Archivo de reglas (.json o base SQLite .db).
+                        Por defecto rules.json, o datos_referencia.db si fue migrado.
+            compacto: Formato del JSON al guardar (None = el del archivo existente)
+        """
+        if rules_file is None:
+            rules_file = resolver_ruta_almacen("rules.json")
         self.rules_file = rules_file
+        self.backend = crear_backend(rules_file, "rules", compacto)
+        self._firma = self.backend.firma()
         self.rules = self.load_rules()
+    
+    def recargar_si_cambio(self):
+        """
+        Recarga las reglas solo si otro proceso modificó el almacenamiento
+        
+        Returns:
+            bool: True si se recargaron
+        """
+        firma = self.backend.firma()
+        if firma == self._firma:
+            return False
+        self._firma = firma
+        self.rules = self.load_rules()
+        return True
         
     def load_rules(self):
-        """Carga las reglas desde el archivo JSON"""
-        if not os.path.exists(self.rules_file):
+        """Carga las reglas desde el almacenamiento"""
+        if not self.backend.existe():
             # Crear archivo con estructura inicial
             default_rules = {
                 "local_rules": [],
@@ -36,10 +63,12 @@ class RulesManager:
             return default_rules
         
         try:
-            with open(self.rules_file, 'r', encoding='utf-8') as f:
-                return json.load(f)
+            return self.backend.cargar()
         except Exception as e:
             print(f"❌ Error loading rules: {e}")
+            respaldo = self.backend.respaldar_ilegible()
+            if respaldo:
+                print(f"💾 Copia del archivo ilegible guardada en {respaldo}")
             return {
                 "local_rules": [],
                 "stock_blocks": [],
@@ -47,26 +76,54 @@ class RulesManager:
             }
     
     def save_rules(self, rules=None):
-        """Guarda las reglas en el archivo JSON y recarga"""
+        """Guarda todas las reglas en el almacenamiento y recarga"""
         if rules is None:
             rules = self.rules
         
         try:
             rules["metadata"]["last_updated"] = datetime.now().isoformat()
             
-            with open(self.rules_file, 'w', encoding='utf-8') as f:
-                json.dump(rules, f, indent=4, ensure_ascii=False)
+            with self.backend.bloqueo:
+                self.backend.guardar(rules)
+                
+                print(f"✅ Rules saved successfully to {self.rules_file}")
+                
+                # Recargar para asegurar que self.rules está actualizado
+                if self.backend.existe():
+                    try:
+                        self.rules = self.backend.cargar()
+                    except:
+                        pass
+                self._firma = self.backend.firma()
             
+            return True
+        except Exception as e:
+            print(f"❌ Error saving rules: {e}")
+            return False
+    
+    def _save_rule_change(self, coleccion, rule=None, removed_key=None):
+        """
+        Persiste el cambio de una sola regla
+        
+        En SQLite actualiza solo la fila afectada; en JSON reescribe el archivo.
+        
+        Args:
+            coleccion: 'local_rules' o 'stock_blocks'
+            rule: Regla agregada o modificada
+            removed_key: Clave de la regla eliminada ({local, sku} o {sku, proveedor})
+        """
+        if not self.backend.incremental:
+            return self.save_rules()
+        
+        try:
+            self.rules["metadata"]["last_updated"] = datetime.now().isoformat()
+            with self.backend.bloqueo:
+                if rule is not None:
+                    self.backend.upsert(coleccion, rule, self.rules["metadata"])
+                if removed_key is not None:
+                    self.backend.eliminar(coleccion, removed_key, self.rules["metadata"])
+                self._firma = self.backend.firma()
             print(f"✅ Rules saved successfully to {self.rules_file}")
-            
-            # Recargar para asegurar que self.rules está actualizado
-            if os.path.exists(self.rules_file):
-                try:
-                    with open(self.rules_file, 'r', encoding='utf-8') as f:
-                        self.rules = json.load(f)
-                except:
-                    pass
-            
             return True
         except Exception as e:
             print(f"❌ Error saving rules: {e}")
@@ -74,6 +131,7 @@ class RulesManager:
     
     # --- REGLAS DE LOCAL + SKU → PROVEEDOR ---
     
+    @transaccional
     def add_local_rule(self, local_code, sku, proveedor_code, descripcion=""):
         """
         Agrega una regla: LOCAL + SKU específico solo usa PROVEEDOR específico
@@ -100,10 +158,11 @@ class RulesManager:
         }
         
         self.rules["local_rules"].append(new_rule)
-        self.save_rules()
+        self._save_rule_change("local_rules", rule=new_rule)
         print(f"✅ LOCAL rule added: LOCAL {local_code} + SKU {sku} → Proveedor {proveedor_code}")
         return True
     
+    @transaccional
     def remove_local_rule(self, local_code, sku):
         """Elimina una regla de LOCAL + SKU"""
         initial_count = len(self.rules["local_rules"])
@@ -113,7 +172,7 @@ class RulesManager:
         ]
         
         if len(self.rules["local_rules"]) < initial_count:
-            self.save_rules()
+            self._save_rule_change("local_rules", removed_key={"local": str(local_code), "sku": str(sku).upper()})
             print(f"✅ LOCAL rule removed: LOCAL {local_code} + SKU {sku}")
             return True
         
@@ -144,6 +203,7 @@ class RulesManager:
     
     # --- REGLAS DE BLOQUEO POR QUIEBRE DE STOCK ---
     
+    @transaccional
     def add_stock_block(self, sku, proveedor_code, motivo="Quiebre de stock"):
         """
         Agrega un bloqueo: SKU + Proveedor no debe generar orden
@@ -168,10 +228,11 @@ class RulesManager:
         }
         
         self.rules["stock_blocks"].append(new_block)
-        self.save_rules()
+        self._save_rule_change("stock_blocks", rule=new_block)
         print(f"✅ Stock block added: SKU {sku} + Proveedor {proveedor_code}")
         return True
     
+    @transaccional
     def remove_stock_block(self, sku, proveedor_code):
         """Elimina un bloqueo de stock"""
         initial_count = len(self.rules["stock_blocks"])
@@ -181,7 +242,7 @@ class RulesManager:
         ]
         
         if len(self.rules["stock_blocks"]) < initial_count:
-            self.save_rules()
+            self._save_rule_change("stock_blocks", removed_key={"sku": str(sku).upper(), "proveedor": str(proveedor_code)})
             print(f"✅ Stock block removed: SKU {sku} + Proveedor {proveedor_code}")
             return True
         
@@ -233,6 +294,7 @@ class RulesManager:
             "active_stock_blocks": len([b for b in stock_blocks if b.get("active", True)])
         }
     
+    @transaccional
     def clear_all_rules(self):
         """Limpia todas las reglas (con confirmación)"""
         self.rules["local_rules"] = []
@@ -251,6 +313,7 @@ class RulesManager:
             print(f"❌ Error exporting rules: {e}")
             return False
     
+    @transaccional
     def import_rules(self, filename):
         """Importa reglas desde un archivo"""
         try:
@@ -327,6 +390,7 @@ class RulesManager:
             print(f"❌ Error exporting to Excel: {e}")
             return False
     
+    @transaccional(si_bloqueado=lambda e: {"error": str(e)})
     def import_from_excel(self, filename, merge=True):
         """
         Importa reglas desde un archivo Excel
@@ -340,6 +404,7 @@ class RulesManager:
         """
         try:
             import pandas as pd
+            from lector_excel import leer_excel
             
             stats = {
                 "local_rules_added": 0,
@@ -351,13 +416,13 @@ class RulesManager:
             
             # Leer Excel
             try:
-                df_local = pd.read_excel(filename, sheet_name='LOCAL_SKU_Rules')
+                df_local = leer_excel(filename, sheet_name='LOCAL_SKU_Rules', dtype=None)
             except:
                 df_local = pd.DataFrame()
                 stats["errors"].append("No se encontró hoja 'LOCAL_SKU_Rules'")
             
             try:
-                df_stock = pd.read_excel(filename, sheet_name='Stock_Blocks')
+                df_stock = leer_excel(filename, sheet_name='Stock_Blocks', dtype=None)
             except:
                 df_stock = pd.DataFrame()
                 stats["errors"].append("No se encontró hoja 'Stock_Blocks'")
@@ -0,0 +1,139 @@
+"""
+Salida Dividida por Proveedor
+Creado por Lucas Gnemmi
+Versión: 1.0
+
+Divide el pedido final (PEDIDOS_CD) en un Excel por proveedor (o por ID
+PEDIDO) y los escribe en paralelo con un pool de procesos, más un archivo
+INDICE.xlsx con el detalle de cada archivo generado. Cada libro lleva el
+mismo formato que la hoja PEDIDOS_CD del archivo completo.
+"""
+
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+from esquema_pedidos import es_categorica
+from trazas import activa, marca, trazado
+
+
+# Columnas por las que se puede dividir la salida
+PARTICIONES = ("PROVEEDOR", "ID PEDIDO")
+
+ARCHIVO_INDICE = "INDICE.xlsx"
+
+
+def _nombre_seguro(valor):
+    """Valor de la partición apto para nombre de archivo"""
+    texto = re.sub(r'[<>:"/\\|?*\s]+', "_", str(valor).strip())
+    return texto or "SIN_VALOR"
+
+
+def _escribir_particion(df_parte, archivo):
+    """
+    Escribe un libro con la hoja PEDIDOS_CD formateada (se ejecuta en el pool)
+
+    Returns:
+        (ruta del archivo, inicio, fin, pid): el tiempo y el proceso que lo
+        escribió, para la traza de la corrida
+    """
+    from procesamiento_v2 import _formatear_hoja_pedidos
+
+    inicio = marca()
+    with pd.ExcelWriter(archivo, engine="openpyxl") as writer:
+        df_parte.to_excel(writer, sheet_name="PEDIDOS_CD", index=False)
+        _formatear_hoja_pedidos(writer.sheets["PEDIDOS_CD"])
+    return archivo, inicio, marca(), os.getpid()
+
+
+def particionar(df_final, por="PROVEEDOR", prefijo="PEDIDOS_CD"):
+    """
+    Divide el pedido final en partes, una por valor de la columna indicada
+
+    Args:
+        df_final: Pedido consolidado (salida de asignar_id_final)
+        por: Columna de PARTICIONES
+        prefijo: Inicio del nombre de cada archivo
+
+    Returns:
+        Lista de (valor, nombre_archivo, DataFrame) en el orden de los IDs.
+        Si dos valores quedan con el mismo nombre de archivo (p. ej. "A/B" y
+        "A B", o distinto uso de mayúsculas en Windows), los siguientes
+        llevan el sufijo _2, _3, ...
+    """
+    if por not in PARTICIONES:
+        raise ValueError(f"Partición no soportada: {por} (usar {', '.join(PARTICIONES)})")
+
+    # Las categóricas pasan a texto: cada parte viaja al proceso solo con sus valores
+    df_final = df_final.astype({c: object for c in df_final.columns if es_categorica(df_final[c])})
+
+    partes = []
+    usados = set()
+    for valor, df_parte in df_final.groupby(por, sort=False):
+        base = f"{prefijo}_{_nombre_seguro(valor)}"
+        nombre, numero = f"{base}.xlsx", 1
+        while nombre.lower() in usados:
+            numero += 1
+            nombre = f"{base}_{numero}.xlsx"
+        usados.add(nombre.lower())
+        partes.append((valor, nombre, df_parte.reset_index(drop=True)))
+    return partes
+
+
+@trazado("dividir", "escritura")
+def escribir_por_proveedor(df_final, carpeta_salida, por="PROVEEDOR", procesos=None, prefijo="PEDIDOS_CD"):
+    """
+    Escribe un Excel por proveedor (o por ID PEDIDO) en paralelo, más INDICE.xlsx
+
+    Args:
+        df_final: Pedido consolidado (salida de asignar_id_final)
+        carpeta_salida: Carpeta donde se crean los archivos (se crea si no existe)
+        por: Columna de PARTICIONES por la que se divide
+        procesos: Cantidad de procesos del pool (default: núcleos disponibles).
+            Con 1 se escribe en el proceso actual
+        prefijo: Inicio del nombre de cada archivo
+
+    Returns:
+        DataFrame del índice (una fila por archivo)
+    """
+    os.makedirs(carpeta_salida, exist_ok=True)
+    partes = particionar(df_final, por, prefijo)
+    if not partes:
+        print("⚠️ No records to split")
+        return pd.DataFrame()
+
+    rutas = [os.path.join(carpeta_salida, nombre) for _, nombre, _ in partes]
+    procesos = min(procesos or os.cpu_count() or 1, len(partes))
+    print(f"📂 Writing {len(partes)} files by {por} with {procesos} process(es)...")
+
+    escritos = None
+    if procesos > 1:
+        try:
+            with ProcessPoolExecutor(max_workers=procesos) as pool:
+                escritos = list(pool.map(_escribir_particion, [df for _, _, df in partes], rutas, chunksize=4))
+        except Exception as e:
+            # p. ej. ejecutable empaquetado sin soporte de multiprocessing
+            print(f"⚠️ Parallel write failed ({e}), writing sequentially")
+    if escritos is None:
+        escritos = [_escribir_particion(df_parte, ruta) for (_, _, df_parte), ruta in zip(partes, rutas)]
+
+    traza = activa()
+    if traza is not None:
+        # Un tramo por archivo, en la fila del proceso que lo escribió
+        for (_, nombre, df_parte), (_, inicio, fin, pid) in zip(partes, escritos):
+            traza.registrar(nombre, inicio, fin, "escritura", pid=pid, tid=pid if pid != os.getpid() else None,
+                            args={"archivo": nombre, "filas": len(df_parte)})
+
+    indice = pd.DataFrame([{
+        por: valor,
+        "ARCHIVO": nombre,
+        "PEDIDOS": df_parte["ID PEDIDO"].nunique(),
+        "LINEAS": len(df_parte),
+        "CANTIDAD": df_parte["CANTIDAD"].sum(),
+    } for valor, nombre, df_parte in partes])
+    indice.to_excel(os.path.join(carpeta_salida, ARCHIVO_INDICE), index=False)
+
+    print(f"✅ {len(partes)} files written to: {carpeta_salida}")
+    return indice
@@ -0,0 +1,497 @@
+"""
+Servicio Local de Procesamiento (HTTP/JSON)
+Creado por Lucas Gnemmi
+Versión: 1.0
+
+Cada copia de la interfaz paga por cargar pandas y leer Full.xlsx. Este
+servicio opcional se deja corriendo en un equipo y mantiene en memoria el
+índice de proveedores, productos, reglas y agenda (motor_procesamiento.py):
+cada pedido solo lee las planillas nuevas y procesa.
+
+Endpoints:
+    GET  /estado      Estado del servicio (cola, corridas y trabajos recientes con su progreso)
+    POST /procesar    JSON {"rutas": [...]} o {"carpeta": "..."} (default Ordenes/),
+                      con "region", "guardar", "archivo_salida", "formatos" y
+                      "respuesta" ("json", "xlsx" o "csv") opcionales
+    POST /procesar?nombre=Pedido.xlsx&region=119&respuesta=json
+                      El cuerpo es la planilla subida (de otro equipo)
+    POST /cancelar?id=T0003
+                      Cancela un trabajo en cola o en curso (sin id, todos)
+
+La respuesta JSON trae "pedidos" y "errores" (filas de PEDIDOS_CD y Errors),
+los totales, los archivos escritos y los segundos. Con "respuesta": "xlsx"
+o "csv" se devuelve directamente el archivo de salida.
+
+Los pedidos entran a una cola de tamaño fijo que atiende un grupo de hilos
+de trabajo (gestor_trabajos.py); con la cola llena se responde 503 para que
+el cliente reintente. Los pedidos que guardan en el mismo archivo de salida
+se procesan de a uno.
+procesar_remoto() y subir_planilla() son el cliente (lo usa la interfaz con
+la opción "Usar servicio local").
+
+Uso:
+    python servicio_procesamiento.py                         # http://127.0.0.1:8765
+    python servicio_procesamiento.py --puerto 9000 --trabajadores 2 --cola 16
+"""
+
+import json
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pandas as pd
+
+from escritores_salida import ESCRITORES, FORMATOS_DEFAULT, escribir_csv, guardar_resultados
+from gestor_trabajos import GestorTrabajos, ColaLlena, Cancelado, TERMINADO, FALLIDO
+from motor_procesamiento import MotorIncremental, es_planilla_ordenes
+
+
+HOST_DEFAULT = "127.0.0.1"
+PUERTO_DEFAULT = 8765
+URL_DEFAULT = f"http://{HOST_DEFAULT}:{PUERTO_DEFAULT}"
+
+# Hilos que procesan pedidos y pedidos que pueden esperar en la cola
+TRABAJADORES_DEFAULT = 2
+COLA_MAXIMA = 8
+
+# Tamaño máximo de una planilla subida
+MAX_BYTES_SUBIDA = 200 * 1024 * 1024
+
+RESPUESTAS = ("json", "xlsx", "csv")
+
+# Valores de texto aceptados para "guardar" (parámetro de la URL o JSON)
+VERDADEROS = ("1", "true", "si", "sí")
+FALSOS = ("0", "false", "no", "")
+
+TIPO_XLSX = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+
+
+def _formatos_pedido(formatos):
+    """
+    Formatos de salida de un pedido como lista
+
+    Acepta una lista (JSON) o un texto separado por comas (parámetro de la
+    URL o JSON escrito a mano, p. ej. "xlsx,csv").
+
+    Raises:
+        ValueError: si no es lista ni texto, o trae formatos desconocidos
+    """
+    if not formatos:
+        return list(FORMATOS_DEFAULT)
+    if isinstance(formatos, str):
+        formatos = formatos.split(",")
+    elif not isinstance(formatos, (list, tuple)) or not all(isinstance(f, str) for f in formatos):
+        raise ValueError("\"formatos\" debe ser una lista o un texto separado por comas")
+    formatos = [f.strip().lower() for f in formatos if f.strip()]
+    desconocidos = [f for f in formatos if f not in ESCRITORES]
+    if desconocidos:
+        raise ValueError(f"Formato de salida no soportado: {', '.join(desconocidos)} "
+                         f"(usar {', '.join(ESCRITORES)})")
+    return formatos or list(FORMATOS_DEFAULT)
+
+
+def _texto_opcional(pedido, campo):
+    """Campo de texto del pedido (None si falta); ValueError si no es texto"""
+    valor = pedido.get(campo)
+    if valor is None:
+        return None
+    if not isinstance(valor, str) or not valor.strip():
+        raise ValueError(f"\"{campo}\" debe ser un texto")
+    return valor.strip()
+
+
+def _guardar_pedido(guardar):
+    """
+    "guardar" como bool: acepta true/false de JSON o "1"/"true"/"si" y
+    "0"/"false"/"no" (parámetro de la URL o JSON escrito a mano)
+    """
+    if guardar is None or isinstance(guardar, bool):
+        return bool(guardar)
+    if isinstance(guardar, str) and guardar.strip().lower() in VERDADEROS + FALSOS:
+        return guardar.strip().lower() in VERDADEROS
+    raise ValueError("\"guardar\" debe ser true o false")
+
+
+def validar_pedido(pedido, base_dir):
+    """
+    Controla los campos de un pedido y los normaliza antes de encolarlo
+
+    - rutas: lista de textos (una ruta sola se rechaza en lugar de recorrerla
+      letra por letra)
+    - carpeta, region, archivo_salida, respuesta: textos
+    - guardar: bool (ver _guardar_pedido)
+    - formatos: lista (ver _formatos_pedido)
+    - archivo_salida: solo dentro de <base>/Salidas, así un cliente de la red
+      no puede escribir en cualquier carpeta del equipo; una ruta relativa se
+      toma desde esa carpeta
+
+    Args:
+        pedido: Dict del JSON o de los parámetros de la URL
+        base_dir: Carpeta del sistema del servicio
+
+    Returns:
+        Dict normalizado
+
+    Raises:
+        ValueError: con el campo que no es válido (el servicio responde 400)
+    """
+    if not isinstance(pedido, dict):
+        raise ValueError("El pedido debe ser un objeto JSON")
+    normalizado = dict(pedido)
+
+    rutas = pedido.get("rutas")
+    if rutas is not None:
+        if not isinstance(rutas, list) or not all(isinstance(r, str) and r.strip() for r in rutas):
+            raise ValueError("\"rutas\" debe ser una lista de rutas de planillas")
+        normalizado["rutas"] = [r.strip() for r in rutas]
+
+    for campo in ("carpeta", "archivo_salida"):
+        normalizado[campo] = _texto_opcional(pedido, campo)
+    region = pedido.get("region")
+    if region is not None:
+        if isinstance(region, bool) or not isinstance(region, (str, int)):
+            raise ValueError("\"region\" debe ser un texto")
+        region = str(region).strip() or None
+    normalizado["region"] = region
+
+    respuesta = pedido.get("respuesta", "json")
+    if respuesta not in RESPUESTAS:
+        raise ValueError(f"Respuesta no soportada: {respuesta} (usar {', '.join(RESPUESTAS)})")
+    normalizado["respuesta"] = respuesta
+
+    normalizado["guardar"] = _guardar_pedido(pedido.get("guardar"))
+    normalizado["formatos"] = _formatos_pedido(pedido.get("formatos"))
+
+    if normalizado["archivo_salida"]:
+        salidas = os.path.realpath(os.path.join(base_dir, "Salidas"))
+        archivo = os.path.realpath(os.path.join(salidas, normalizado["archivo_salida"]))
+        if os.path.commonpath([archivo, salidas]) != salidas or archivo == salidas:
+            raise ValueError(f"\"archivo_salida\" debe estar dentro de {salidas}")
+        normalizado["archivo_salida"] = archivo
+    return normalizado
+
+
+def _filas_json(df):
+    """DataFrame -> texto JSON de una lista de filas (sin columnas internas)"""
+    if df is None or df.empty:
+        return "[]"
+    columnas = [c for c in df.columns if not str(c).startswith("_")]
+    return df[columnas].to_json(orient="records", force_ascii=False)
+
+
+class ServicioProcesamiento:
+    """Motor en memoria + cola de pedidos atendida por un grupo de hilos"""
+
+    def __init__(self, base_dir, region="119", trabajadores=TRABAJADORES_DEFAULT, cola_maxima=COLA_MAXIMA,
+                 contexto_kwargs=None):
+        self.motor = MotorIncremental(base_dir, region, contexto_kwargs)
+        self.trabajadores = trabajadores
+        self.cola_maxima = cola_maxima
+        self.atendidos = 0
+        self.fallidos = 0
+        self.inicio = time.time()
+        self.trabajos = GestorTrabajos(trabajadores, cola_maxima, al_terminar=self._al_terminar, nombre="Trabajador")
+        self._lock = threading.Lock()
+
+    def calentar(self):
+        """Carga índice de Full.xlsx, productos, reglas y agenda antes del primer pedido"""
+        inicio = time.perf_counter()
+        warnings = []
+        if self.motor.indice_proveedores(warnings) is None:
+            print(warnings[-1] if warnings else f"⚠️ Could not read {self.motor.full_xlsx}")
+        self.motor.contexto().cargar()
+        print(f"🔥 Engine warmed up in {time.perf_counter() - inicio:.1f} s")
+
+    def detener(self):
+        """Cancela los pedidos pendientes y en curso y espera a los hilos"""
+        self.trabajos.detener()
+
+    def _al_terminar(self, trabajo):
+        with self._lock:
+            if trabajo.estado == TERMINADO:
+                self.atendidos += 1
+            elif trabajo.estado == FALLIDO:
+                self.fallidos += 1
+
+    def enviar(self, pedido, subida=None):
+        """
+        Encola un pedido
+
+        Los pedidos que guardan en el mismo archivo no corren a la vez.
+
+        Returns:
+            Trabajo (trabajo.esperar() devuelve el resultado de procesar)
+
+        Raises:
+            ColaLlena: si ya hay cola_maxima pedidos esperando
+            ValueError: si algún campo del pedido no es válido (ver validar_pedido)
+        """
+        pedido = validar_pedido(pedido, self.motor.base_dir)
+        clave = None
+        if pedido["guardar"]:
+            clave = pedido["archivo_salida"] or os.path.abspath(os.path.join(self.motor.base_dir, "Salidas"))
+        return self.trabajos.enviar("procesar", self.procesar, (pedido, subida), clave=clave)
+
+    def cancelar(self, id=None):
+        """Cancela un trabajo por id (o todos); devuelve cuántos se cancelaron"""
+        if id is None:
+            return self.trabajos.cancelar_todos()
+        return int(self.trabajos.cancelar(id))
+
+    def estado(self):
+        return {
+            "base_dir": self.motor.base_dir,
+            "region": self.motor.region,
+            "trabajadores": self.trabajadores,
+            "en_cola": self.trabajos.en_cola(),
+            "cola_maxima": self.cola_maxima,
+            "atendidos": self.atendidos,
+            "fallidos": self.fallidos,
+            "segundos_activo": round(time.time() - self.inicio),
+            "trabajos": [t.como_dict() for t in self.trabajos.trabajos()[:10]],
+        }
+
+    def procesar(self, pedido, subida=None):
+        """
+        Atiende un pedido (se ejecuta en un hilo de trabajo)
+
+        Args:
+            pedido: Dict de validar_pedido (rutas/carpeta, region, guardar,
+                archivo_salida, formatos y respuesta)
+            subida: (nombre, bytes) de una planilla subida, en lugar de rutas
+
+        Returns:
+            (tipo de contenido, bytes de la respuesta)
+        """
+        inicio = time.perf_counter()
+        respuesta = pedido["respuesta"]
+
+        temporal = tempfile.mkdtemp(prefix="servicio_")
+        try:
+            if subida is not None:
+                nombre, contenido = subida
+                rutas = [os.path.join(temporal, os.path.basename(nombre))]
+                with open(rutas[0], "wb") as f:
+                    f.write(contenido)
+            elif pedido.get("rutas"):
+                rutas = pedido["rutas"]
+            else:
+                rutas = self.motor.planillas(pedido.get("carpeta"))
+
+            resultado = self.motor.procesar(
+                rutas, region=pedido["region"], guardar=pedido["guardar"],
+                formatos=pedido["formatos"], archivo_salida=pedido["archivo_salida"],
+                cachear=subida is None,
+            )
+            df_final = resultado['df_final'] if resultado else pd.DataFrame()
+            df_errores = resultado['df_errores'] if resultado else pd.DataFrame()
+
+            if respuesta == "xlsx":
+                archivo = os.path.join(temporal, "PEDIDOS_CD.xlsx")
+                guardar_resultados(df_final, df_errores, archivo)
+                with open(archivo, "rb") as f:
+                    return TIPO_XLSX, f.read()
+            if respuesta == "csv":
+                archivo = escribir_csv(df_final, df_errores, os.path.join(temporal, "PEDIDOS_CD"))
+                with open(archivo, "rb") as f:
+                    return "text/csv; charset=utf-8", f.read()
+
+            cuerpo = (
+                '{"pedidos": ' + _filas_json(df_final)
+                + ', "errores": ' + _filas_json(df_errores)
+                + ', "resumen": ' + json.dumps({
+                    "lineas": len(df_final),
+                    "errores": len(df_errores),
+                    "planillas": len(rutas),
+                    "archivo_salida": resultado['archivo_salida'] if resultado else None,
+                    "archivos": resultado['archivos'] if resultado else {},
+                    "warnings": resultado['warnings'] if resultado else [],
+                    "segundos": round(time.perf_counter() - inicio, 3),
+                }, ensure_ascii=False)
+                + '}'
+            )
+            return "application/json; charset=utf-8", cuerpo.encode("utf-8")
+        finally:
+            shutil.rmtree(temporal, ignore_errors=True)
+
+
+class _Manejador(BaseHTTPRequestHandler):
+    """Traduce las peticiones HTTP a tareas del servicio"""
+
+    servicio = None  # ServicioProcesamiento (se asigna al crear el servidor)
+
+    def log_message(self, formato, *args):
+        print(f"🌐 {self.address_string()} {formato % args}")
+
+    def _responder(self, codigo, tipo, cuerpo):
+        self.send_response(codigo)
+        self.send_header("Content-Type", tipo)
+        self.send_header("Content-Length", str(len(cuerpo)))
+        self.end_headers()
+        self.wfile.write(cuerpo)
+
+    def _responder_json(self, codigo, datos):
+        self._responder(codigo, "application/json; charset=utf-8",
+                        json.dumps(datos, ensure_ascii=False).encode("utf-8"))
+
+    def do_GET(self):
+        if urllib.parse.urlparse(self.path).path == "/estado":
+            self._responder_json(200, self.servicio.estado())
+        else:
+            self._responder_json(404, {"error": "Ruta no encontrada"})
+
+    def do_POST(self):
+        url = urllib.parse.urlparse(self.path)
+        if url.path == "/cancelar":
+            id = urllib.parse.parse_qs(url.query).get("id", [None])[-1]
+            self._responder_json(200, {"cancelados": self.servicio.cancelar(id)})
+            return
+        if url.path != "/procesar":
+            self._responder_json(404, {"error": "Ruta no encontrada"})
+            return
+
+        largo = int(self.headers.get("Content-Length") or 0)
+        if largo > MAX_BYTES_SUBIDA:
+            self._responder_json(413, {"error": f"Archivo de más de {MAX_BYTES_SUBIDA // 1024 // 1024} MB"})
+            return
+        cuerpo = self.rfile.read(largo)
+        parametros = {k: v[-1] for k, v in urllib.parse.parse_qs(url.query).items()}
+
+        try:
+            if self.headers.get("Content-Type", "").startswith("application/json"):
+                pedido, subida = json.loads(cuerpo or b"{}"), None
+            else:
+                nombre = parametros.get("nombre", "Pedido.xlsx")
+                if not es_planilla_ordenes(nombre):
+                    raise ValueError(f"Nombre de planilla no válido: {nombre}")
+                pedido = parametros
+                subida = (nombre, cuerpo)
+            trabajo = self.servicio.enviar(pedido, subida)
+        except ColaLlena as e:
+            self._responder_json(503, {"error": str(e)})
+            return
+        except (ValueError, json.JSONDecodeError) as e:
+            self._responder_json(400, {"error": str(e)})
+            return
+
+        try:
+            tipo, datos = trabajo.esperar()
+        except Cancelado as e:
+            self._responder_json(409, {"error": f"{trabajo.id}: {e}"})
+            return
+        except (ValueError, FileNotFoundError) as e:
+            self._responder_json(400, {"error": str(e)})
+            return
+        except Exception as e:
+            self._responder_json(500, {"error": str(e)})
+            return
+        self._responder(200, tipo, datos)
+
+
+def crear_servidor(servicio, host=HOST_DEFAULT, puerto=PUERTO_DEFAULT):
+    """Servidor HTTP (un hilo por conexión) que atiende con el servicio indicado"""
+    manejador = type("Manejador", (_Manejador,), {"servicio": servicio})
+    return ThreadingHTTPServer((host, puerto), manejador)
+
+
+# --- Cliente ---
+
+def servicio_disponible(url=URL_DEFAULT, timeout=0.5):
+    """Estado del servicio, o None si no responde"""
+    try:
+        with urllib.request.urlopen(f"{url}/estado", timeout=timeout) as r:
+            return json.loads(r.read().decode("utf-8"))
+    except (OSError, ValueError):
+        return None
+
+
+def _leer_respuesta(peticion, timeout):
+    try:
+        with urllib.request.urlopen(peticion, timeout=timeout) as r:
+            tipo, cuerpo = r.headers.get("Content-Type", ""), r.read()
+    except urllib.error.HTTPError as e:
+        try:
+            mensaje = json.loads(e.read().decode("utf-8"))["error"]
+        except (ValueError, KeyError):
+            mensaje = e.reason
+        raise RuntimeError(f"Servicio de procesamiento ({e.code}): {mensaje}") from None
+    if not tipo.startswith("application/json"):
+        return cuerpo
+    datos = json.loads(cuerpo.decode("utf-8"))
+    return {
+        "df_final": pd.DataFrame(datos["pedidos"]),
+        "df_errores": pd.DataFrame(datos["errores"]),
+        **datos["resumen"],
+    }
+
+
+def procesar_remoto(url=URL_DEFAULT, rutas=None, carpeta=None, region=None, guardar=False,
+                    archivo_salida=None, formatos=None, respuesta="json", timeout=None):
+    """
+    Procesa planillas accesibles desde el equipo del servicio
+
+    Returns:
+        Con respuesta "json": dict con df_final, df_errores, lineas, errores,
+        archivo_salida, archivos, warnings y segundos. Con "xlsx" o "csv": los bytes del archivo
+
+    Raises:
+        RuntimeError: si el servicio responde con error (503 = cola llena)
+    """
+    pedido = {k: v for k, v in {
+        "rutas": rutas, "carpeta": carpeta, "region": region, "guardar": guardar,
+        "archivo_salida": archivo_salida, "formatos": formatos, "respuesta": respuesta,
+    }.items() if v is not None}
+    peticion = urllib.request.Request(f"{url}/procesar", data=json.dumps(pedido).encode("utf-8"),
+                                      headers={"Content-Type": "application/json"})
+    return _leer_respuesta(peticion, timeout)
+
+
+def subir_planilla(ruta, url=URL_DEFAULT, region=None, respuesta="json", timeout=None):
+    """Sube una planilla de órdenes al servicio y devuelve el resultado (como procesar_remoto)"""
+    parametros = {"nombre": os.path.basename(ruta), "respuesta": respuesta}
+    if region:
+        parametros["region"] = region
+    with open(ruta, "rb") as f:
+        contenido = f.read()
+    peticion = urllib.request.Request(f"{url}/procesar?{urllib.parse.urlencode(parametros)}", data=contenido,
+                                      headers={"Content-Type": TIPO_XLSX})
+    return _leer_respuesta(peticion, timeout)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Servicio HTTP local de procesamiento de órdenes")
+    parser.add_argument("--base", default=None, help="Carpeta del sistema (default: la de este script)")
+    parser.add_argument("--region", default="119", help="Región de Full.xlsx por defecto")
+    parser.add_argument("--host", default=HOST_DEFAULT,
+                        help="Dirección donde escuchar (default 127.0.0.1, solo este equipo)")
+    parser.add_argument("--puerto", type=int, default=PUERTO_DEFAULT, help=f"Puerto (default {PUERTO_DEFAULT})")
+    parser.add_argument("--trabajadores", type=int, default=TRABAJADORES_DEFAULT,
+                        help=f"Hilos que procesan pedidos (default {TRABAJADORES_DEFAULT})")
+    parser.add_argument("--cola", type=int, default=COLA_MAXIMA,
+                        help=f"Pedidos que pueden esperar en la cola (default {COLA_MAXIMA})")
+    args = parser.parse_args()
+
+    servicio = ServicioProcesamiento(args.base or os.path.dirname(os.path.abspath(__file__)), args.region,
+                                     args.trabajadores, args.cola)
+    servicio.calentar()
+    servidor = crear_servidor(servicio, args.host, args.puerto)
+    print(f"🚀 Processing service listening on http://{args.host}:{args.puerto} "
+          f"({args.trabajadores} worker(s), queue of {args.cola})")
+    try:
+        servidor.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        servidor.server_close()
+        servicio.detener()
+        print("🛑 Service stopped")
+        sys.exit(0)
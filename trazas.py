@@ -0,0 +1,174 @@
+"""
+Trazas de las Etapas del Procesamiento
+Creado por Lucas Gnemmi
+Versión: 1.0
+
+Registra un tramo (inicio, duración, etapa, archivo, filas) por cada etapa
+del procesamiento: lectura de cada planilla de órdenes, índice de Full.xlsx,
+validación de SKUs, mapeo de proveedores, fechas, consolidación, escritura,
+formato y cada archivo escrito por los procesos de --dividir. El resultado
+es un JSON en formato Chrome trace que se abre en chrome://tracing o en
+https://ui.perfetto.dev y muestra en una línea de tiempo qué etapas se
+superponen y cuáles esperan a otras.
+
+Mientras no haya una traza activa, tramo() y @trazado no registran nada.
+
+Uso:
+    with trazar("Salidas/profiles/traza.json"):
+        ejecutar_pipeline(...)
+"""
+
+import contextlib
+import functools
+import json
+import os
+import threading
+import time
+
+
+class Traza:
+    """Eventos de una corrida en formato Chrome trace"""
+
+    def __init__(self):
+        self.eventos = []
+        self._hilos = {}
+        self._lock = threading.Lock()
+
+    def _tid(self, hilo_id, nombre):
+        """Número corto por hilo (el visor los muestra como filas)"""
+        with self._lock:
+            if hilo_id not in self._hilos:
+                self._hilos[hilo_id] = len(self._hilos) + 1
+                self.eventos.append({"name": "thread_name", "ph": "M", "pid": os.getpid(),
+                                     "tid": self._hilos[hilo_id], "args": {"name": nombre}})
+            return self._hilos[hilo_id]
+
+    def registrar(self, nombre, inicio, fin, cat="etapa", pid=None, tid=None, args=None):
+        """
+        Agrega un tramo ya medido
+
+        Args:
+            nombre: Nombre del tramo
+            inicio, fin: Microsegundos de marca()
+            cat: Categoría (etapa, lectura, escritura, ...)
+            pid: Proceso (default el actual; los de --dividir informan el suyo)
+            tid: Hilo (default el hilo actual)
+            args: Dict con datos adicionales (archivo, filas, ...)
+        """
+        if tid is None:
+            hilo = threading.current_thread()
+            tid = self._tid(hilo.ident, hilo.name)
+        self.eventos.append({
+            "name": nombre, "cat": cat, "ph": "X", "ts": inicio, "dur": max(fin - inicio, 0),
+            "pid": pid or os.getpid(), "tid": tid, "args": args or {},
+        })
+
+    def guardar(self, ruta):
+        with open(ruta, "w", encoding="utf-8") as f:
+            json.dump({"traceEvents": self.eventos, "displayTimeUnit": "ms"}, f, default=str)
+
+
+# Traza de la corrida en curso (None = no se registra nada)
+_activa = None
+
+
+def marca():
+    """Instante actual en microsegundos (reloj de pared, comparable entre procesos)"""
+    return time.time_ns() // 1000
+
+
+def activa():
+    """Traza de la corrida en curso, o None"""
+    return _activa
+
+
+@contextlib.contextmanager
+def tramo(nombre, cat="etapa", **args):
+    """
+    Mide el bloque como un tramo de la traza activa
+
+    Yields:
+        Dict de argumentos del tramo, para completar dentro del bloque
+        (p. ej. args["filas"] = len(df))
+    """
+    if _activa is None:
+        yield args
+        return
+    traza = _activa
+    inicio = marca()
+    try:
+        yield args
+    finally:
+        traza.registrar(nombre, inicio, marca(), cat, args=args)
+
+
+def _filas(valor):
+    return len(valor) if hasattr(valor, "columns") else None
+
+
+def trazado(nombre=None, cat="etapa"):
+    """
+    Decorador: registra cada llamada a la función como un tramo
+
+    Si el primer argumento es un DataFrame se guardan sus filas de entrada,
+    y si el resultado es un DataFrame, sus filas de salida.
+    """
+    def decorador(funcion):
+        etiqueta = nombre or funcion.__name__
+
+        @functools.wraps(funcion)
+        def envoltura(*args, **kwargs):
+            if _activa is None:
+                return funcion(*args, **kwargs)
+            with tramo(etiqueta, cat) as datos:
+                if args and _filas(args[0]) is not None:
+                    datos["filas_entrada"] = _filas(args[0])
+                resultado = funcion(*args, **kwargs)
+                if _filas(resultado) is not None:
+                    datos["filas_salida"] = _filas(resultado)
+                return resultado
+        return envoltura
+    return decorador
+
+
+def iterar_con_tramos(iterable, nombre, cat="lectura"):
+    """
+    Recorre un iterable (p. ej. los lotes de leer_ordenes_por_lotes) midiendo
+    cuánto tarda en producir cada elemento
+    """
+    iterador = iter(iterable)
+    numero = 0
+    while True:
+        numero += 1
+        with tramo(f"{nombre} {numero}", cat) as datos:
+            try:
+                elemento = next(iterador)
+            except StopIteration:
+                return
+            datos["filas"] = _filas(elemento)
+        yield elemento
+
+
+@contextlib.contextmanager
+def trazar(ruta=None):
+    """
+    Activa el registro de tramos durante el bloque
+
+    Args:
+        ruta: Archivo .json donde guardar la traza al salir (None = no se guarda,
+            p. ej. cuando la usa el perfilador)
+
+    Yields:
+        La Traza
+    """
+    global _activa
+    anterior, _activa = _activa, Traza()
+    traza = _activa
+    try:
+        yield traza
+    finally:
+        _activa = anterior
+        if ruta:
+            os.makedirs(os.path.dirname(os.path.abspath(ruta)), exist_ok=True)
+            traza.guardar(ruta)
+            print(f"🧵 Trace saved: {ruta} ({len(traza.eventos)} events)")
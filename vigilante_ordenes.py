@@ -0,0 +1,233 @@
+"""
+Vigilante de la Carpeta de Órdenes
+Creado por Lucas Gnemmi
+Versión: 1.0
+
+Modo sin interfaz que vigila Ordenes/ y regenera la salida en Salidas/
+pocos segundos después de que llega (o cambia, o se quita) una planilla,
+sin que nadie tenga que abrir la interfaz y presionar PROCESAR.
+
+- Detecta los cambios con watchdog (inotify en Linux, notificaciones nativas
+  en Windows) si está instalado; si no, revisando la carpeta cada segundo.
+- Espera a que los archivos dejen de cambiar antes de leerlos (una planilla
+  que se está copiando o guardando no se procesa a medias).
+- Mantiene en memoria las órdenes ya leídas (por archivo, mientras no
+  cambien) y el índice de Full.xlsx (motor_procesamiento.py), así cada
+  corrida solo lee lo nuevo. Los gestores de productos, reglas y agenda se
+  recargan solos si su archivo cambia (contexto_ejecucion.py).
+- Un único hilo procesa: los avisos que llegan durante una corrida se juntan
+  en una sola corrida siguiente. Cada corrida es un trabajo de
+  gestor_trabajos.py, así detener() la cancela entre etapas en lugar de
+  esperar a que termine.
+
+Uso:
+    python vigilante_ordenes.py                       # Vigila la carpeta del sistema
+    python vigilante_ordenes.py --formatos xlsx,csv --espera 5
+"""
+
+import os
+import sys
+import threading
+import time
+from datetime import datetime
+
+from almacenamiento import firma_archivo
+from escritores_salida import FORMATOS_DEFAULT, ESCRITORES
+from gestor_trabajos import GestorTrabajos, Cancelado
+from motor_procesamiento import MotorIncremental, es_planilla_ordenes
+
+try:
+    from watchdog.observers import Observer
+    from watchdog.events import FileSystemEventHandler
+except ImportError:
+    Observer = None
+    FileSystemEventHandler = object
+
+
+# Segundos que un archivo debe quedar sin cambios para darlo por terminado
+ESPERA_ESTABLE = 2.0
+
+# Segundos entre revisiones de la carpeta cuando no hay watchdog
+INTERVALO_SONDEO = 1.0
+
+
+def _se_puede_abrir(ruta):
+    """False mientras otro programa tiene el archivo bloqueado (Excel guardando, copia en curso en Windows)"""
+    try:
+        with open(ruta, "rb"):
+            return True
+    except OSError:
+        return False
+
+
+class _AvisoCambios(FileSystemEventHandler):
+    """Handler de watchdog: cualquier cambio en una planilla dispara una corrida"""
+
+    def __init__(self, disparar):
+        self.disparar = disparar
+
+    def on_any_event(self, event):
+        rutas = [getattr(event, "src_path", ""), getattr(event, "dest_path", "")]
+        if not event.is_directory and any(es_planilla_ordenes(r) for r in rutas if r):
+            self.disparar()
+
+
+class VigilanteOrdenes:
+    """
+    Vigila Ordenes/ y procesa cuando llegan planillas nuevas
+
+    Todos los avisos (watchdog, sondeo o disparar()) activan un evento que
+    atiende un único hilo de trabajo: nunca hay dos corridas a la vez y los
+    avisos que llegan mientras se procesa se juntan en la corrida siguiente.
+    """
+
+    def __init__(self, base_dir, region="119", formatos=FORMATOS_DEFAULT, espera=ESPERA_ESTABLE,
+                 sondeo=INTERVALO_SONDEO, forzar_sondeo=False, contexto_kwargs=None):
+        """
+        Args:
+            base_dir: Carpeta del sistema (con Ordenes/, Full-Agenda/ y Salidas/)
+            region: Región de Full.xlsx
+            formatos: Formatos de salida (claves de escritores_salida.ESCRITORES)
+            espera: Segundos sin cambios para considerar terminados los archivos
+            sondeo: Segundos entre revisiones de la carpeta sin watchdog
+            forzar_sondeo: Revisar la carpeta aunque watchdog esté instalado
+                (carpetas de red, donde las notificaciones no siempre llegan)
+            contexto_kwargs: Rutas para ContextoEjecucion (products_file, rules_file, agenda_file)
+        """
+        self.motor = MotorIncremental(base_dir, region, contexto_kwargs)
+        self.formatos = formatos
+        self.espera = espera
+        self.sondeo = sondeo
+        self.usar_watchdog = Observer is not None and not forzar_sondeo
+        self.corridas = 0
+        self.trabajos = GestorTrabajos(nombre="CorridaVigilante")
+        self._disparo = threading.Event()
+        self._detener = threading.Event()
+        self._firmas_procesadas = None
+        self._observer = None
+        self._hilo = None
+
+    def _firmas(self):
+        """Firma de cada planilla de Ordenes/ (para saber si algo cambió)"""
+        firmas = {}
+        for nombre in os.listdir(self.motor.ordenes_dir):
+            if es_planilla_ordenes(nombre):
+                firmas[nombre] = firma_archivo(os.path.join(self.motor.ordenes_dir, nombre))
+        return firmas
+
+    def disparar(self):
+        """Pide una corrida (se junta con cualquier otra pendiente)"""
+        self._disparo.set()
+
+    def _esperar_estables(self):
+        """
+        Espera hasta que ninguna planilla cambie durante `espera` segundos y
+        todas se puedan abrir
+
+        Returns:
+            Firmas de las planillas estables, o None si se pidió detener
+        """
+        anteriores = self._firmas()
+        while not self._detener.wait(self.espera):
+            actuales = self._firmas()
+            abiertas = all(_se_puede_abrir(os.path.join(self.motor.ordenes_dir, n)) for n in actuales)
+            if actuales == anteriores and abiertas:
+                return actuales
+            anteriores = actuales
+        return None
+
+    def _bucle(self):
+        while not self._detener.is_set():
+            if self.usar_watchdog:
+                self._disparo.wait()
+            elif not self._disparo.wait(self.sondeo) and self._firmas() == self._firmas_procesadas:
+                continue
+            self._disparo.clear()
+            if self._detener.is_set():
+                break
+
+            firmas = self._esperar_estables()
+            if firmas is None:
+                break
+            # Los avisos que llegaron mientras se esperaba quedan incluidos en esta corrida
+            self._disparo.clear()
+            if firmas == self._firmas_procesadas:
+                continue
+
+            self.corridas += 1
+            print(f"🔔 Run #{self.corridas} at {datetime.now().strftime('%H:%M:%S')} "
+                  f"({len(firmas)} workbook(s) in Ordenes/)")
+            inicio = time.perf_counter()
+            try:
+                trabajo = self.trabajos.enviar("procesar", self.motor.procesar, kwargs={"formatos": self.formatos})
+                resultado = trabajo.esperar()
+                self._firmas_procesadas = firmas
+                if resultado is not None:
+                    for archivo in resultado['archivos'].values():
+                        if archivo:
+                            print(f"📁 {archivo}")
+                print(f"⏱️ Run #{self.corridas} finished in {time.perf_counter() - inicio:.1f} s")
+            except Cancelado:
+                print(f"⛔ Run #{self.corridas} cancelled")
+            except Exception as e:
+                # p. ej. el Excel de salida está abierto: se reintenta en el próximo cambio
+                self._firmas_procesadas = firmas
+                print(f"❌ Run #{self.corridas} failed: {e}")
+
+    def iniciar(self):
+        """Empieza a vigilar (procesa una vez al inicio con lo que ya hay en la carpeta)"""
+        os.makedirs(self.motor.ordenes_dir, exist_ok=True)
+        if self.usar_watchdog:
+            self._observer = Observer()
+            self._observer.schedule(_AvisoCambios(self.disparar), self.motor.ordenes_dir, recursive=False)
+            self._observer.start()
+        modo = "watchdog" if self.usar_watchdog else f"polling every {self.sondeo:g} s"
+        print(f"👀 Watching {self.motor.ordenes_dir} ({modo}, {self.espera:g} s debounce)")
+        self._hilo = threading.Thread(target=self._bucle, name="VigilanteOrdenes", daemon=True)
+        self._hilo.start()
+        self.disparar()
+
+    def detener(self):
+        """Deja de vigilar y cancela la corrida en curso (sin dejar la salida a medio escribir)"""
+        self._detener.set()
+        self._disparo.set()
+        if self._observer is not None:
+            self._observer.stop()
+            self._observer.join()
+        self.trabajos.detener()
+        if self._hilo is not None:
+            self._hilo.join()
+        print("🛑 Watcher stopped")
+
+
+if __name__ == "__main__":
+    import argparse
+    import multiprocessing
+
+    multiprocessing.freeze_support()
+
+    parser = argparse.ArgumentParser(description="Vigila Ordenes/ y procesa las planillas a medida que llegan")
+    parser.add_argument("--base", default=None, help="Carpeta del sistema (default: la de este script)")
+    parser.add_argument("--region", default="119", help="Región de Full.xlsx")
+    parser.add_argument("--formatos", default=",".join(FORMATOS_DEFAULT),
+                        help=f"Formatos de salida separados por coma: {', '.join(ESCRITORES)} (default xlsx)")
+    parser.add_argument("--espera", type=float, default=ESPERA_ESTABLE,
+                        help=f"Segundos sin cambios antes de procesar (default {ESPERA_ESTABLE:g})")
+    parser.add_argument("--sondeo", action="store_true",
+                        help="Revisar la carpeta periódicamente aunque watchdog esté instalado (carpetas de red)")
+    args = parser.parse_args()
+
+    vigilante = VigilanteOrdenes(
+        args.base or os.path.dirname(os.path.abspath(__file__)), args.region,
+        formatos=[f.strip().lower() for f in args.formatos.split(",") if f.strip()],
+        espera=args.espera, forzar_sondeo=args.sondeo,
+    )
+    if Observer is None:
+        print("💡 watchdog is not installed (pip install watchdog), polling the folder instead")
+    vigilante.iniciar()
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        vigilante.detener()
+        sys.exit(0)